@@ -0,0 +1,76 @@
+"""Benchmarks of the cleaning stages on adversarial long lines.
+
+Each generator builds garbage lines of growing length aimed at the risky rules found by the
+static audit in canto_subtitle_cleaner/guard.py. For each one, the time of the full pipeline and of
+the safe stages is reported per length, with the growth exponent between the two longest lengths:
+about 1 for linear rules, about 2 for quadratic ones.
+
+usage: python benchmarks/bench_adversarial.py [--lengths 250,500,1000,2000,4000] [--audit]
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import warnings
+import contextlib
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from canto_subtitle_cleaner.clean import CLEAN_STAGES, iter_clean_subtitle, warm_up
+from canto_subtitle_cleaner.guard import SAFE_STAGES, audit_rules, format_audit
+
+DEFAULT_LENGTHS = [250, 500, 1000, 2000, 4000]
+
+# Lines that make each kind of risky rule scan to the end of the line from many start positions
+GENERATORS = {
+    "係 without 前": lambda n, rng: "係" * n,
+    "不如 without 啊": lambda n, rng: "不如" * (n // 2),
+    "即係 without 啫": lambda n, rng: "即係" * (n // 2),
+    "repeated pairs": lambda n, rng: "".join(rng.choice("大佬細路") for i in range(n)),
+    "喂， repeated": lambda n, rng: "喂，" * (n // 2) + "x",
+    "random speech": lambda n, rng: "".join(rng.choice("我你佢係唔好嘅咗喺嚟啲咁噉呢啦喇嘛前即啫不如啊，") for i in range(n)),
+}
+
+@contextlib.contextmanager
+def quiet():
+    """Discard diagnostics printed by the pipeline, which are not part of the report."""
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+def clean_time(text, stages):
+    start = time.perf_counter()
+    for stage, text in iter_clean_subtitle(text, 21, stages):
+        pass
+    return time.perf_counter() - start
+
+def growth(times, lengths):
+    return math.log(times[-1] / times[-2]) / math.log(lengths[-1] / lengths[-2])
+
+def main():
+    lengths = DEFAULT_LENGTHS
+    if "--lengths" in sys.argv:
+        lengths = [int(n) for n in sys.argv[sys.argv.index("--lengths") + 1].split(",")]
+
+    if "--audit" in sys.argv:
+        print(format_audit(audit_rules()))
+        print()
+
+    with quiet():
+        warm_up()
+
+    print(f"{'line':18s} {'stages':6s} " + " ".join(f"{n:>9d}" for n in lengths) + "   growth")
+    for name, generator in GENERATORS.items():
+        rng = random.Random(0)
+        lines = [generator(n, rng) for n in lengths]
+
+        for label, stages in (("full", CLEAN_STAGES), ("safe", SAFE_STAGES)):
+            with quiet():
+                times = [clean_time(line, stages) for line in lines]
+            print(f"{name:18s} {label:6s} " + " ".join(f"{t * 1000:7.1f}ms" for t in times) + f"   {growth(times, lengths):5.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Benchmarks for each stage of the cleaning pipeline.
+
+Runs on tests/Doraemon_517-518.srt and on synthetic tracks of real lines scaled to each size, and
+records throughput (blocks/s) per stage, peak memory of the full pipeline and package import time.
+
+usage: python benchmarks/bench_pipeline.py [--sizes 1000,10000,100000,1000000] [--repeat N]
+                                           [--save <baseline.json>] [--compare <baseline.json>] [--threshold 0.25]
+
+--save writes the results as a JSON baseline. --compare exits with status 1 if any throughput
+dropped, or any memory or import time grew, by more than the threshold relative to the baseline.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import platform
+import warnings
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from canto_subtitle_cleaner import Cleaner
+from canto_subtitle_cleaner.srt import srt_to_list, list_to_srt, text_to_list
+from canto_subtitle_cleaner.clean import CLEAN_STAGES, trim_subtitle, warm_up
+from canto_subtitle_cleaner.format import linebreak, adjust_subtitle_breaks, magnetize_endings
+
+REAL_CORPUS = os.path.join(ROOT_DIRECTORY, "tests", "Doraemon_517-518.srt")
+DEFAULT_SIZES = [1000]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+DAY_MS = 24 * 60 * 60 * 1000 - 1000   # timecodes are times of day, so a track must fit in 24 hours
+
+def format_ms(ms):
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+def synthetic_srt(lines, size):
+    """Build SRT text of `size` blocks by cycling through real lines, spread evenly over one day."""
+    spacing = min(2000, DAY_MS // size)
+    blocks = []
+
+    for i in range(size):
+        start = i * spacing
+        blocks.append(f"{i + 1}\n{format_ms(start)} --> {format_ms(start + spacing * 4 // 5)}\n{lines[i % len(lines)]}")
+
+    return "\n\n".join(blocks)
+
+@contextlib.contextmanager
+def quiet():
+    """Discard diagnostics printed by the pipeline, which are not part of the report."""
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def best_time(function, setup, repeat):
+    """Return the fastest of `repeat` runs of function(setup()), excluding setup time."""
+    best = None
+
+    for _ in range(repeat):
+        argument = setup()
+        with quiet():
+            start = time.perf_counter()
+            function(argument)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def bench_corpus(content, repeat):
+    """Return blocks/s for every pipeline stage on one corpus, and peak memory of the full pipeline."""
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "input.srt")
+        output_path = os.path.join(directory, "output.srt")
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+        with quiet():
+            blocks = len(srt_to_list(input_path))
+            cleaned = Cleaner(cache_size=0).clean_track(text_to_list(content))
+
+        def throughput(name, function, setup=lambda: None):
+            results[name] = round(blocks / best_time(function, setup, repeat), 1)
+
+        throughput("srt_to_list", lambda _: srt_to_list(input_path))
+        throughput("adjust_subtitle_breaks", adjust_subtitle_breaks, lambda: text_to_list(content))
+        throughput("magnetize_endings", magnetize_endings, lambda: text_to_list(content))
+
+        # Each text stage runs on the output of the stages before it, as in clean_subtitle
+        texts = [text for timecode, text in text_to_list(content)]
+        for stage in CLEAN_STAGES:
+            throughput(stage.__name__, lambda texts: [stage(text) for text in texts], lambda: texts)
+            texts = [stage(text) for text in texts]
+
+        throughput("linebreak", lambda texts: [linebreak(text) for text in texts], lambda: texts)
+        with quiet():
+            texts = [linebreak(text) for text in texts]
+        throughput("trim_subtitle", lambda texts: [trim_subtitle(text) for text in texts], lambda: texts)
+
+        throughput("list_to_srt", lambda subtitle_list: list_to_srt(subtitle_list, output_path), lambda: list(cleaned))
+
+        # Caching is disabled so that repeated synthetic lines are really cleaned each time
+        def pipeline(_):
+            list_to_srt(Cleaner(cache_size=0).clean_track(srt_to_list(input_path)), output_path)
+
+        throughput("pipeline", pipeline)
+
+        tracemalloc.start()
+        with quiet():
+            pipeline(None)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return blocks, results, round(peak_memory / (1 << 20), 2)
+
+def import_time_ms(module="canto_subtitle_cleaner.__main__"):
+    """Return the cumulative import time of a module in a fresh interpreter, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT_DIRECTORY, capture_output=True, text=True, check=True)
+
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*(\S+)$', line)
+        if match and match.group(2) == module:
+            return round(int(match.group(1)) / 1000, 1)
+
+    raise RuntimeError(f"Import time of {module} not found in -X importtime output.")
+
+def run(sizes, repeat):
+    with open(REAL_CORPUS, encoding="utf-8") as f:
+        real_content = f.read()
+    real_lines = [text.replace("\n", " ") for timecode, text in text_to_list(real_content)]
+
+    corpora = [("doraemon", real_content)] + [(f"synthetic_{size}", synthetic_srt(real_lines, size)) for size in sizes]
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "import_time_ms": import_time_ms(),
+        "throughput": {},
+        "peak_memory_mb": {},
+    }
+
+    for name, content in corpora:
+        blocks, results, peak_memory = bench_corpus(content, repeat)
+        report["throughput"][name] = results
+        report["peak_memory_mb"][name] = peak_memory
+
+        print(f"{name} ({blocks} blocks, peak memory {peak_memory} MB)")
+        for stage, blocks_per_second in results.items():
+            print(f"  {stage:<34}{blocks_per_second:>14,.1f} blocks/s")
+
+    print(f"import canto_subtitle_cleaner.__main__: {report['import_time_ms']} ms")
+    return report
+
+def compare(report, baseline, threshold):
+    """Return a list of regressions beyond `threshold` relative to the baseline."""
+    regressions = []
+
+    for corpus, results in baseline.get("throughput", {}).items():
+        for stage, expected in results.items():
+            actual = report["throughput"].get(corpus, {}).get(stage)
+            if actual is not None and actual < expected * (1 - threshold):
+                regressions.append(f"{corpus} {stage}: {actual:,.1f} blocks/s, baseline {expected:,.1f}")
+
+    for corpus, expected in baseline.get("peak_memory_mb", {}).items():
+        actual = report["peak_memory_mb"].get(corpus)
+        if actual is not None and actual > expected * (1 + threshold):
+            regressions.append(f"{corpus} peak memory: {actual} MB, baseline {expected} MB")
+
+    expected = baseline.get("import_time_ms")
+    if expected and report["import_time_ms"] > expected * (1 + threshold):
+        regressions.append(f"import time: {report['import_time_ms']} ms, baseline {expected} ms")
+
+    return regressions
+
+def option(name, default=None):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+        print(f"Error: Missing value for {name} argument.")
+        sys.exit(2)
+    return default
+
+def main():
+    sizes = [int(size) for size in option("--sizes", ",".join(map(str, DEFAULT_SIZES))).split(",") if size]
+    repeat = int(option("--repeat", DEFAULT_REPEAT))
+    threshold = float(option("--threshold", DEFAULT_THRESHOLD))
+    save_path = option("--save")
+    compare_path = option("--compare")
+
+    warnings.simplefilter("ignore")
+    with quiet():
+        warm_up()
+
+    report = run(sizes, repeat)
+
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Baseline saved to {save_path}.")
+
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), threshold)
+
+        if regressions:
+            print(f"Regressions beyond {threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+        print(f"No regressions beyond {threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
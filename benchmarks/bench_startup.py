@@ -0,0 +1,130 @@
+"""Start-up time of the command line, per mode.
+
+Runs `python -X importtime -m canto_subtitle_cleaner` with the arguments of each mode, in a fresh
+interpreter, and reports the total import time, the wall time of the whole command and which of the
+heavy modules (the segmenter, the rules, the server, the work queue, worker processes) were loaded.
+Each mode should load only the heavy modules it uses.
+
+usage: python benchmarks/bench_startup.py [--repeat N] [--budget <ms>]
+
+--budget exits with status 1 if any mode loads a heavy module it does not use, or if the import
+time of a mode that never cleans a line is over the budget.
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT_DIRECTORY, "tests", "Doraemon_517-518.srt")
+DEFAULT_REPEAT = 5
+
+HEAVY_MODULES = ["pycantonese", "canto_subtitle_cleaner.clean", "canto_subtitle_cleaner.guard",
+                 "http.server", "sqlite3", "multiprocessing"]
+
+# Mode name -> (arguments, heavy modules the mode uses). Cleaning uses all of them: pycantonese starts
+# worker processes of its own.
+MODES = {
+    "help": (["--help"], []),
+    "no_clean": (["in.srt", "--no_clean"], []),
+    "queue_status": (["--queue-status", "queue.db"], ["sqlite3"]),
+    "clean": (["in.srt"], HEAVY_MODULES),
+}
+
+def parse_importtime(stderr):
+    """Return (total import time in ms, names of the modules imported) from -X importtime output."""
+    total_us = 0
+    modules = set()
+
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s*\d+\s*\|\s*(\d+)\s*\| (\s*)(\S+)$', line)
+        if not match:
+            continue
+        modules.add(match.group(3))
+        # Nested imports are already counted in the cumulative time of the top-level import
+        if not match.group(2):
+            total_us += int(match.group(1))
+
+    return total_us / 1000, modules
+
+def run_mode(args, directory):
+    """Run the command once. Returns (import time in ms, wall time in ms, modules imported)."""
+    environment = dict(os.environ, PYTHONPATH=ROOT_DIRECTORY)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "canto_subtitle_cleaner"] + args,
+                            cwd=directory, env=environment, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    import_ms, modules = parse_importtime(result.stderr)
+    return import_ms, wall_ms, modules
+
+def run(repeat):
+    report = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copy(CORPUS, os.path.join(directory, "in.srt"))
+        # An empty queue, so that --queue-status has a file to open
+        from canto_subtitle_cleaner.workqueue import job_queue
+        job_queue(os.path.join(directory, "queue.db")).close()
+
+        for name, (args, uses) in MODES.items():
+            runs = [run_mode(args, directory) for i in range(repeat)]
+            heavy = [module for module in HEAVY_MODULES if any(module in modules for _, _, modules in runs)]
+            report[name] = {
+                "import_ms": round(statistics.median(import_ms for import_ms, _, _ in runs), 1),
+                "wall_ms": round(statistics.median(wall_ms for _, wall_ms, _ in runs), 1),
+                "heavy_modules": heavy,
+                "unused_modules": [module for module in heavy if module not in uses],
+                "cleans": "pycantonese" in uses,
+            }
+
+            print(f"{name:<14}imports {report[name]['import_ms']:>7.1f} ms   wall {report[name]['wall_ms']:>7.1f} ms"
+                  f"   heavy modules: {', '.join(heavy) or 'none'}")
+
+    return report
+
+def over_budget(report, budget_ms):
+    """Return a list of the modes that load heavy modules they do not use, or never clean a line but are over the budget."""
+    problems = []
+
+    for name, result in report.items():
+        if result["unused_modules"]:
+            problems.append(f"{name}: loads {', '.join(result['unused_modules'])}, which it does not use")
+        if not result["cleans"] and result["import_ms"] > budget_ms:
+            problems.append(f"{name}: imports take {result['import_ms']} ms, budget {budget_ms} ms")
+
+    return problems
+
+def option(name, default=None):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+        print(f"Error: Missing value for {name} argument.")
+        sys.exit(2)
+    return default
+
+def main():
+    repeat = int(option("--repeat", DEFAULT_REPEAT))
+    budget = option("--budget")
+
+    sys.path.insert(0, ROOT_DIRECTORY)
+    report = run(repeat)
+
+    if budget is not None:
+        problems = over_budget(report, float(budget))
+        if problems:
+            print("Over the start-up budget:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+
+        print(f"All modes that never clean a line start within {float(budget):g} ms.")
+
+if __name__ == "__main__":
+    main()
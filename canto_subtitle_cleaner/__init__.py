@@ -1 +1,4 @@
-# Empty for now
\ No newline at end of file
+"""Clean and standardize AI-generated Cantonese subtitles."""
+
+from canto_subtitle_cleaner.cleaner import Cleaner
+from canto_subtitle_cleaner.srt import load, loads, dump, dumps
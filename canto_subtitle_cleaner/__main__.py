@@ -2,108 +2,415 @@
 
 import sys
 import os
+import io
+import time
 import traceback
+import contextlib
 from datetime import datetime
-from canto_subtitle_cleaner.srt import srt_to_list, list_to_srt, timecode as srt_timecode
-from canto_subtitle_cleaner.clean import clean_subtitle
-from canto_subtitle_cleaner.format import adjust_subtitle_breaks, magnetize_endings
+from canto_subtitle_cleaner.srt import iter_srt_blocks
+from canto_subtitle_cleaner.cleaner import Cleaner, init_worker, call_in_worker, clean_text_task, LONG_LINE_LENGTH
+from canto_subtitle_cleaner.library import find_srt_files, manifest
+from canto_subtitle_cleaner.retime import retimer, parse_time_ms, parse_fps, parse_anchor
+from canto_subtitle_cleaner.overlap import TRIM, POLICIES, iter_resolve_overlaps
+from canto_subtitle_cleaner.variants import describe_variants
+from canto_subtitle_cleaner.writers import WRITERS
+from canto_subtitle_cleaner.archive import COMPRESSORS, is_archive, plain_name, iter_members, output_archive, open_text
+from canto_subtitle_cleaner.metrics import METRICS_INTERVAL, metrics_writer
 
 PACKAGE_NAME = 'canto_subtitle_cleaner'
-DEBUG_MODE = False  # Set to True for debugging output
 OUTPUT_PREFIX = "output_"  # Default prefix added to the output filename
-ADD_OFFSET = None
 
-# Take a list of (timecode, subtitle text), clean up all the text, and return it
-def clean_subtitle_list(subtitle_list, add_offset=None, add_duration=None):
-    new_subtitle_list = []
+# The modules of the other modes (the server, the watcher, the work queue, the engine verifier and the
+# rule tools) are imported in the functions and branches that use them, and the rules and the segmenter
+# on the first line cleaned, so that --help, --no_clean and the queue commands start quickly.
 
-    adjust_subtitle_breaks(subtitle_list)
-    magnetize_endings(subtitle_list)
+# Clean up subtitles from an input stream and write them to an output stream block by block.
+# Progress messages go to stderr, so that the output stream only contains the subtitles, in the cleaner's first format.
+def process_stream(input_stream, output_stream, cleaner=None):
+    cleaner = cleaner or Cleaner()
 
-    for timecode, text in subtitle_list:
-        if not isinstance(timecode, srt_timecode):
-            raise TypeError("Expected timecode to be of type srt.timecode")
+    try:
+        with contextlib.redirect_stdout(sys.stderr), cleaner.trace_file("<stdin>"):
+            subtitle_blocks = iter_srt_blocks(input_stream, cleaner.count)
+            subtitles = iter_resolve_overlaps(cleaner.clean_stream(subtitle_blocks), cleaner.overlap_policy)
+            WRITERS[cleaner.formats[0]](subtitles, output_stream, flush=True)
+        return True
+
+    except Exception as e:
+        print(f"Error cleaning SRT stream: {e}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return False
 
-        original_time_start = timecode.start
-        block_cleaned_text = clean_subtitle(text).strip()
+# Derive the output file name for an input file. Compressed inputs give plain outputs unless --compress is used.
+def output_path(input_file, output_directory="", output_prefix=""):
+    return os.path.join(output_directory, f"{output_prefix}{os.path.basename(plain_name(input_file))}")
+
+# Clean up subtitles in an input SRT file, then output with a prefix added on the filename.
+# With jobs > 1, the lines of a large file are cleaned in chunks across worker processes.
+# Returns True if the file was written, False if an error occurred.
+def process_file(input_file, output_directory="", output_prefix="", cleaner=None, jobs=1):
+    cleaner = cleaner or Cleaner()
+
+    try:
+        output_file = output_path(input_file, output_directory, output_prefix)
 
-        if DEBUG_MODE:
-            nl = "\n"
-            t = "\t"
-            replaced_text = text.replace('\n', '\\n')
-            replaced_block_text = block_cleaned_text.replace('\n', '\\n')
+        with cleaner.trace_file(input_file):
+            with_offset_str = ""
+            if cleaner.add_offset:
+                with_offset_str = f" with offset {cleaner.add_offset.time()}"
+            elif not cleaner.retimer.is_identity():
+                with_offset_str = " with retiming"
 
-            print(f"  {original_time_start}: {t}{replaced_text} {nl}→ {timecode.start}: {t}{replaced_block_text}")
+            # --no_clean only renumbers and retimes, which is done at the byte level for most files
+            output_files = cleaner.retime_file(input_file, output_file)
+            if output_files:
+                print(f"Copied subtitles{with_offset_str}.")
+            else:
+                subtitle_list = cleaner.read_file(input_file)
+                print("Got the input file srt list. Cleaning...")
+
+                clean_lines = (lambda lines: cleaner.clean_lines_parallel(lines, jobs)) if jobs > 1 else None
+                tracks = cleaner.clean_variants(subtitle_list, clean_lines)
+
+                print(f"Cleaned subtitles from the list{with_offset_str}. Outputting to file...")
+
+                output_files = cleaner.write_variants(tracks, output_file)
+        cleaner.count("files")
+        print(f"File complete. Processed SRT saved to {', '.join(output_files)}.")
+        return True
+
+    except Exception as e:
+        print(f"Error cleaning SRT file {input_file}: {e}")
+        traceback.print_exc(file=sys.stdout)
+        return False
 
-        # Skip block if cleaned text is empty
-        if not block_cleaned_text:
-            continue
-                                
-        # new_subtitle_list.append((timecode, '\n'.join([block_cleaned_text])))
-        new_subtitle_list.append((timecode, block_cleaned_text))
+# Run process_file in a pool worker, capturing its output so the parent can print it in order
+def process_file_captured(cleaner, input_file, output_directory="", output_prefix=""):
+    output = io.StringIO()
 
-    for timecode, text in subtitle_list:
-        if add_offset:
-            timecode.add_offset(add_offset)
+    with contextlib.redirect_stdout(output):
+        success = process_file(input_file, output_directory, output_prefix, cleaner)
 
-        if add_duration:
-            timecode.add_duration(add_duration)
+    return success, output.getvalue()
 
-    return new_subtitle_list
+# Run process_file on all the SRT files in a directory, using up to `jobs` worker processes.
+# With `recursive`, subdirectories are scanned too and mirrored in the output directory.
+# With `manifest_path`, files whose content, rules and options are unchanged since the last run are skipped.
+def process_directory(input_directory, output_directory="", output_prefix="", cleaner=None, jobs=1,
+                      recursive=False, include=None, exclude=None, manifest_path=None):
+    cleaner = cleaner or Cleaner()
 
-# Clean up subtitles in an input SRT file, then output with a prefix added on the filename
-def process_file(input_file, output_directory="", output_prefix="", add_offset=None, add_duration=None, no_clean=False):
     try:
-        # Derive the output file name
-        output_file = None
+        # List all .srt files in the directory, sorted so that output order is stable
+        srt_files = find_srt_files(input_directory, recursive, include, exclude)
 
-        if output_directory:
-            output_file = f"{output_directory}\\{output_prefix}{os.path.basename(input_file)}"
-        else:
-            output_file = f"{output_prefix}{os.path.basename(input_file)}"
-        
-        subtitle_list = srt_to_list(input_file)
-        print("Got the input file srt list. Cleaning...")
+        if not srt_files:
+            print(f"No .srt files found in directory: {input_directory}")
+            return
+
+        file_manifest = manifest(manifest_path) if manifest_path else None
+        options = "|".join([f"prefix={output_prefix}"] + [f"{key}={value}" for key, value in sorted(cleaner.options.items())
+                                                          if key not in ("debug", "cache_size", "trace", "metrics", "threads", "variants")]
+                           + [f"variants={describe_variants(cleaner.variants)}"])
+        tasks = []
+        entries = []
+        skipped = 0
+
+        for srt_file in srt_files:
+            input_file = os.path.join(input_directory, *srt_file.split('/'))
+            file_output_directory = os.path.join(output_directory, *srt_file.split('/')[:-1])
+
+            if file_manifest:
+                # The first output stands for the file: if it is gone, the file is cleaned again
+                output_file = os.path.abspath(cleaner.output_files(output_path(input_file, file_output_directory, output_prefix))[0])
+                entry = file_manifest.entry(input_file, file_manifest.input_hash(srt_file, input_file), output_file, options)
+
+                if file_manifest.is_up_to_date(srt_file, entry):
+                    skipped += 1
+                    continue
 
-        if (not no_clean):
-            subtitle_list = clean_subtitle_list(subtitle_list, add_offset, add_duration)
+                entries.append((srt_file, entry))
 
-        with_offset_str = ""
-        if add_offset:
-            with_offset_str = f" with offset {add_offset.time()}"
+            if file_output_directory:
+                os.makedirs(file_output_directory, exist_ok=True)
 
-        print(f"Cleaned subtitles from the list{with_offset_str}. Outputting to file...")
+            tasks.append((input_file, file_output_directory, output_prefix))
 
-        list_to_srt(subtitle_list, output_file)
-        print(f"File complete. Processed SRT saved to {output_file}.")
+        results = []
+
+        if jobs > 1 and len(tasks) > 1:
+            # map() yields results in task order, so logs print in the same order as a serial run
+            for success, output in cleaner.map(process_file_captured, tasks, jobs):
+                print(output, end="")
+                results.append(success)
+        else:
+            for task in tasks:
+                results.append(process_file(*task, cleaner, jobs))
+
+        failed = [task[0] for task, success in zip(tasks, results) if not success]
+
+        if file_manifest:
+            for (srt_file, entry), success in zip(entries, results):
+                if success:
+                    file_manifest.update(srt_file, entry)
+            file_manifest.save()
+
+        print(f"Processed {len(tasks)} files: {len(tasks) - len(failed)} succeeded, {len(failed)} failed.")
+        if skipped:
+            print(f"Skipped {skipped} unchanged files.")
+        for input_file in failed:
+            print(f"  Failed: {input_file}")
 
     except Exception as e:
-        print(f"Error cleaning SRT file {input_file}: {e}")
-        traceback.print_exc(file=sys.stdout)
-        quit()
+        print(f"An error occurred while processing the directory: {e}")
+
+    return
+
+# Add the SRT files in a directory to the job queue at queue_path, with the cleaner's options,
+# for --worker processes on any node that can reach the queue file to clean.
+def enqueue_directory(queue_path, input_directory, output_directory="", output_prefix="", cleaner=None,
+                      recursive=False, include=None, exclude=None):
+    cleaner = cleaner or Cleaner()
 
-# Run process_file on all the SRT files in a directory
-def process_directory(input_directory, output_directory="", output_prefix="", add_offset=None, add_duration=None, no_clean=False):
     try:
-        # List all .srt files in the directory
-        srt_files = [f for f in os.listdir(input_directory) if f.endswith('.srt')]
+        srt_files = find_srt_files(input_directory, recursive, include, exclude)
 
         if not srt_files:
             print(f"No .srt files found in directory: {input_directory}")
             return
 
-        # Process each file
+        tasks = []
         for srt_file in srt_files:
-            full_path = os.path.join(input_directory, srt_file)
-            process_file(full_path, output_directory, output_prefix, add_offset, add_duration, no_clean)
+            input_file = os.path.join(input_directory, *srt_file.split('/'))
+            file_output_directory = os.path.join(output_directory, *srt_file.split('/')[:-1])
+            # Workers may run in other directories, so every path is stored absolute
+            tasks.append((input_file, os.path.abspath(file_output_directory), output_prefix))
+
+        from canto_subtitle_cleaner.workqueue import job_queue
+        queue = job_queue(queue_path)
+        try:
+            queue.set_options(cleaner.options)
+            queued = queue.enqueue(tasks)
+            counts = queue.counts()
+        finally:
+            queue.close()
+
+        print(f"Queued {queued} of {len(tasks)} files in {queue_path}.")
+        if queued < len(tasks):
+            print(f"Skipped {len(tasks) - queued} files that are still running.")
+        print(f"Queue: {format_counts(counts)}.")
 
     except Exception as e:
-        print(f"An error occurred while processing the directory: {e}")
+        print(f"An error occurred while queueing the directory: {e}")
 
     return
 
+def format_counts(counts):
+    from canto_subtitle_cleaner.workqueue import PENDING, RUNNING, DONE, FAILED
+    return ", ".join(f"{counts[status]} {status}" for status in (PENDING, RUNNING, DONE, FAILED))
+
+# Claim jobs from the queue at queue_path and clean them until no job is pending or running.
+# While other workers still hold jobs, wait in case one of them dies and its lease expires.
+# Returns True if every job this worker finished succeeded.
+def run_worker(queue_path, cleaner=None, lease_seconds=None, poll_seconds=None):
+    from canto_subtitle_cleaner.workqueue import LEASE_SECONDS, POLL_SECONDS, PENDING, RUNNING, job_queue, lease_keeper, worker_name
+    cleaner = cleaner or Cleaner()
+    poll_seconds = poll_seconds or POLL_SECONDS
+    queue = job_queue(queue_path, lease_seconds or LEASE_SECONDS)
+    worker = worker_name()
+    succeeded = 0
+    failed = []
+
+    print(f"Worker {worker} started on {queue_path}.")
+
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                counts = queue.counts()
+                if not counts[PENDING] and not counts[RUNNING]:
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            if job.output_directory:
+                os.makedirs(job.output_directory, exist_ok=True)
+
+            keeper = lease_keeper(queue, job, worker)
+            try:
+                success, output = process_file_captured(cleaner, job.input_file, job.output_directory, job.output_prefix)
+            except KeyboardInterrupt:
+                keeper.close()
+                queue.release(job, worker)
+                raise
+            keeper.close()
+
+            print(output, end="")
+            error = None if success else next((line for line in output.splitlines() if line.startswith("Error")), "Cleaning failed.")
+            if not queue.finish(job, worker, success, output, error):
+                print(f"Lost the lease on {job.input_file}; another worker took it over.")
+            elif success:
+                succeeded += 1
+            else:
+                failed.append(job.input_file)
+
+        print(f"Worker {worker} finished {succeeded + len(failed)} files: {succeeded} succeeded, {len(failed)} failed.")
+        for input_file in failed:
+            print(f"  Failed: {input_file}")
+        print(f"Queue: {format_counts(queue.counts())}.")
+
+    except KeyboardInterrupt:
+        print("Stopping worker...")
+
+    finally:
+        queue.close()
+
+    return not failed
+
+# Print the number of jobs per status in a queue, and the error of each failed job
+def print_queue_status(queue_path):
+    from canto_subtitle_cleaner.workqueue import job_queue
+    queue = job_queue(queue_path)
+    try:
+        print(f"Queue: {format_counts(queue.counts())}.")
+        for input_file, error in queue.failures():
+            print(f"  Failed: {input_file}: {error}")
+    finally:
+        queue.close()
+
+# Clean a member of an archive in a pool worker, capturing its output so the parent can print it in order
+def clean_member_captured(cleaner, name, content):
+    output = io.StringIO()
+
+    with contextlib.redirect_stdout(output):
+        tracks = clean_text_task(cleaner, name, content)
+
+    return tracks, output.getvalue()
+
+# Clean the SRT files in a zip or tar archive, reading its members one at a time without extracting them.
+# Members are cleaned in up to `jobs` worker processes and written in archive order, either under
+# output_directory, mirroring the folders in the archive, or as members of the archive at archive_path.
+def process_archive(input_archive, output_directory="", output_prefix="", cleaner=None, jobs=1,
+                    include=None, exclude=None, archive_path=None):
+    cleaner = cleaner or Cleaner()
+    succeeded = 0
+    failed = []
+
+    try:
+        target = output_archive(archive_path) if archive_path else None
+        opener = target.open if target else open_text
+        members = iter_members(input_archive, include, exclude)
+        # Names of the members read so far: map consumes each task before yielding its result
+        names = []
+
+        def tasks():
+            for name, content in members:
+                names.append(name)
+                yield (f"{input_archive}:{name}", content)
+
+        try:
+            for i, (tracks, output) in enumerate(cleaner.map(clean_member_captured, tasks(), jobs)):
+                name = names[i]
+                print(output, end="")
+                if isinstance(tracks, Exception):
+                    print(f"Error cleaning SRT file {name} in {input_archive}: {tracks}")
+                    failed.append(name)
+                    continue
+
+                member_directory, member_name = os.path.split(name)
+                file_output_directory = member_directory if target else os.path.join(output_directory, member_directory)
+                if file_output_directory and not target:
+                    os.makedirs(file_output_directory, exist_ok=True)
+
+                output_files = cleaner.write_variants(tracks, output_path(member_name, file_output_directory, output_prefix), opener)
+                print(f"Processed {name}: saved to {', '.join(output_files)}.")
+                succeeded += 1
+        finally:
+            if target:
+                target.close()
+
+        if not names:
+            print(f"No .srt files found in archive: {input_archive}")
+            return
+
+        print(f"Processed {len(names)} files from {input_archive}: {succeeded} succeeded, {len(failed)} failed.")
+        if target:
+            print(f"Output archive saved to {archive_path}.")
+        for name in failed:
+            print(f"  Failed: {name}")
+
+    except Exception as e:
+        print(f"An error occurred while processing the archive: {e}")
+
+    return
+
+# Watch a directory and clean SRT files as they arrive, until interrupted.
+# Workers stay alive between files, so rules and the segmenter are only loaded once.
+def watch_directory(input_directory, output_directory="", output_prefix="", cleaner=None, jobs=1,
+                    recursive=False, include=None, exclude=None):
+    from concurrent.futures import ProcessPoolExecutor
+    from canto_subtitle_cleaner.watch import directory_watcher
+    cleaner = cleaner or Cleaner()
+    watcher = directory_watcher(input_directory, recursive, include, exclude)
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(cleaner.options,))
+    running = []
+
+    print(f"Watching {input_directory} for new SRT files. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            for srt_file in watcher.scan():
+                input_file = os.path.join(input_directory, *srt_file.split('/'))
+                file_output_directory = os.path.join(output_directory, *srt_file.split('/')[:-1])
+
+                # Don't pick up our own output if it is written back into the watched directory
+                for output_file in cleaner.output_files(output_path(input_file, file_output_directory, output_prefix)):
+                    output_file = os.path.relpath(output_file, input_directory)
+                    if not output_file.startswith('..'):
+                        watcher.ignore(output_file.replace(os.sep, '/'))
+
+                if file_output_directory:
+                    os.makedirs(file_output_directory, exist_ok=True)
+
+                task = (input_file, file_output_directory, output_prefix)
+                running.append((input_file, executor.submit(call_in_worker, (process_file_captured, task))))
+
+            still_running = []
+            for input_file, future in running:
+                if not future.done():
+                    still_running.append((input_file, future))
+                    continue
+
+                success, output = cleaner.merge_result(future.result())
+                print(output, end="")
+                if not success:
+                    print(f"  Failed: {input_file}")
+            running = still_running
+
+            watcher.wait()
+
+    except KeyboardInterrupt:
+        print("Stopping watch...")
+
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        watcher.close()
+
+# The corpus for --verify-engine and --analyze-rules: --corpus, or tests/ in a source checkout.
+# Quits with an error if it is missing, as in an installed package, which does not include tests/.
+def corpus_or_quit(corpus_directory=None):
+    from canto_subtitle_cleaner.verify import CORPUS_DIRECTORY
+    corpus_directory = corpus_directory or CORPUS_DIRECTORY
+
+    if not os.path.isdir(corpus_directory):
+        print(f"Error: The corpus directory '{corpus_directory}' does not exist. Use --corpus <directory> with .srt files and their golden outputs.")
+        print_usage()
+        quit()
+
+    return corpus_directory
+
 def print_usage():
-    print(f"usage: python -m {PACKAGE_NAME} [<input_file> | -d <input_directory>] [-o <output_directory> | -p <output_prefix>] [--add_offset HH:MM:SS] [--add_duration HH:MM:SS] [--no_clean] [--debug]")
+    print(f"usage: python -m {PACKAGE_NAME} [<input_file> | - | -d <input_directory> | --watch <input_directory> | --serve [host:]port | --serve unix:<path> | --verify-engine [<module>:<factory>] [--seed <n>] [--corpus <directory>] | --worker <queue.db> | --queue-status <queue.db> | --audit-regex | --analyze-rules [--corpus <directory>]] [-o <output_directory> | -p <output_prefix>] [--add_offset HH:MM:SS] [--add_duration HH:MM:SS] [--offset [-]HH:MM:SS,ms] [--scale <factor>] [--fps <from>:<to>] [--sync <input time>=<output time>] [--overlaps trim|merge|shift|readable] [--variants standard,common,<name>=<rules.json>] [--formats srt,vtt,ass,jsonl] [--compress gz|bz2|xz] [--archive <output archive>] [-j <jobs>] [--threads <threads>] [--line-budget <ms>] [--long-line <characters>] [-r] [--include <glob>] [--exclude <glob>] [--manifest <file>] [--no_clean] [--timings] [--trace <file>] [--metrics <file.prom|file.json|file.jsonl>] [--metrics-interval <seconds>] [--enqueue <queue.db>] [--lease <seconds>] [--debug]")
     return
 
 ######################################## MAIN SECTION #########################################
@@ -113,11 +420,19 @@ def quit():
     sys.exit(1)
 
 def main():
-    global DEBUG_MODE, OUTPUT_PREFIX
+    debug_mode = False
+    output_prefix = OUTPUT_PREFIX
     output_directory = ""
     add_offset = None
     add_duration = None
     no_clean = False
+    jobs = 1
+    recursive = False
+    include = []
+    exclude = []
+    manifest_path = None
+    timings = False
+    trace_path = None
 
     # Check if there are arguments 
     if len(sys.argv) < 2:
@@ -132,18 +447,166 @@ def main():
 
     # Enable debug mode if --debug flag is present
     if "--debug" in sys.argv:
-        DEBUG_MODE = True
+        debug_mode = True
 
     # -p argument for output file name prefix
     if "-p" in sys.argv:
         prefix_index = sys.argv.index("-p")
         if prefix_index + 1 < len(sys.argv):
-            OUTPUT_PREFIX = sys.argv[prefix_index + 1]
+            output_prefix = sys.argv[prefix_index + 1]
         else:
             print("Error: Missing value for -p argument.")
             print_usage()
             quit()
 
+    # -j argument for number of worker processes when processing a directory
+    if "-j" in sys.argv:
+        prefix_index = sys.argv.index("-j")
+        if prefix_index + 1 < len(sys.argv):
+            try:
+                jobs = int(sys.argv[prefix_index + 1])
+            except ValueError:
+                jobs = 0
+
+            if jobs < 1:
+                print("Error: Invalid value for -j argument. Use a positive number of jobs.")
+                print_usage()
+                quit()
+        else:
+            print("Error: Missing value for -j argument.")
+            print_usage()
+            quit()
+
+    # --threads argument for number of threads cleaning the lines of each file, sharing rules and caches
+    threads = 1
+    if "--threads" in sys.argv:
+        prefix_index = sys.argv.index("--threads")
+        try:
+            threads = int(sys.argv[prefix_index + 1])
+        except (IndexError, ValueError):
+            threads = 0
+
+        if threads < 1:
+            print("Error: Invalid value for --threads argument. Use a positive number of threads.")
+            print_usage()
+            quit()
+
+        if threads > 1 and getattr(sys, "_is_gil_enabled", lambda: True)():
+            print("Note: this Python build has a GIL, so --threads will not clean lines in parallel. Use -j for worker processes.", file=sys.stderr)
+
+    # -r to scan input directories recursively
+    if "-r" in sys.argv:
+        recursive = True
+
+    # --include and --exclude glob patterns for directory scans; both may be repeated
+    for i, arg in enumerate(sys.argv):
+        if arg in ("--include", "--exclude"):
+            if i + 1 < len(sys.argv):
+                (include if arg == "--include" else exclude).append(sys.argv[i + 1])
+            else:
+                print(f"Error: Missing value for {arg} argument.")
+                print_usage()
+                quit()
+
+    # --manifest file used to skip unchanged files in directory scans
+    if "--manifest" in sys.argv:
+        prefix_index = sys.argv.index("--manifest")
+        if prefix_index + 1 < len(sys.argv):
+            manifest_path = os.path.abspath(sys.argv[prefix_index + 1])
+        else:
+            print("Error: Missing value for --manifest argument.")
+            print_usage()
+            quit()
+
+    # --timings prints a per-stage and per-file timing breakdown at the end
+    if "--timings" in sys.argv:
+        timings = True
+
+    # --trace file to save stage timings to, in Chrome trace event format
+    if "--trace" in sys.argv:
+        prefix_index = sys.argv.index("--trace")
+        if prefix_index + 1 < len(sys.argv):
+            trace_path = os.path.abspath(sys.argv[prefix_index + 1])
+        else:
+            print("Error: Missing value for --trace argument.")
+            print_usage()
+            quit()
+
+    # --metrics file to write counters and stage latencies to, in Prometheus text format or as JSON snapshots
+    metrics_path = None
+    if "--metrics" in sys.argv:
+        prefix_index = sys.argv.index("--metrics")
+        if prefix_index + 1 < len(sys.argv):
+            metrics_path = os.path.abspath(sys.argv[prefix_index + 1])
+        else:
+            print("Error: Missing value for --metrics argument.")
+            print_usage()
+            quit()
+
+    # --metrics-interval in seconds between metrics snapshots while running
+    metrics_interval = METRICS_INTERVAL
+    if "--metrics-interval" in sys.argv:
+        prefix_index = sys.argv.index("--metrics-interval")
+        try:
+            metrics_interval = float(sys.argv[prefix_index + 1])
+        except (IndexError, ValueError):
+            metrics_interval = 0
+
+        if metrics_interval <= 0:
+            print("Error: Invalid value for --metrics-interval argument. Use a positive number of seconds.")
+            print_usage()
+            quit()
+
+    # --enqueue argument for a job queue file to add the files of -d to, instead of cleaning them
+    enqueue_path = None
+    if "--enqueue" in sys.argv:
+        prefix_index = sys.argv.index("--enqueue")
+        if prefix_index + 1 < len(sys.argv) and sys.argv[1] == "-d":
+            enqueue_path = os.path.abspath(sys.argv[prefix_index + 1])
+        else:
+            print("Error: --enqueue needs a queue file and an input directory with -d.")
+            print_usage()
+            quit()
+
+    # --worker argument for a job queue file to claim and clean files from
+    queue_path = None
+    if "--worker" in sys.argv or "--queue-status" in sys.argv:
+        prefix_index = sys.argv.index("--worker" if "--worker" in sys.argv else "--queue-status")
+        if prefix_index + 1 < len(sys.argv) and os.path.isfile(sys.argv[prefix_index + 1]):
+            queue_path = os.path.abspath(sys.argv[prefix_index + 1])
+        elif prefix_index + 1 < len(sys.argv):
+            print(f"Error: The queue file '{sys.argv[prefix_index + 1]}' does not exist. Create it with -d <input_directory> --enqueue.")
+            quit()
+        else:
+            print(f"Error: Missing value for {sys.argv[prefix_index]} argument. Please add a queue file.")
+            print_usage()
+            quit()
+
+    # --lease in seconds that a worker holds a job without renewing it before another worker may take it over
+    lease_seconds = None
+    if "--lease" in sys.argv:
+        prefix_index = sys.argv.index("--lease")
+        try:
+            lease_seconds = float(sys.argv[prefix_index + 1])
+        except (IndexError, ValueError):
+            lease_seconds = 0
+
+        if lease_seconds <= 0:
+            print("Error: Invalid value for --lease argument. Use a positive number of seconds.")
+            print_usage()
+            quit()
+
+    # --corpus directory of .srt files and golden outputs, instead of tests/ in a source checkout
+    corpus_directory = None
+    if "--corpus" in sys.argv:
+        prefix_index = sys.argv.index("--corpus")
+        if prefix_index + 1 < len(sys.argv):
+            corpus_directory = os.path.abspath(sys.argv[prefix_index + 1])
+        else:
+            print("Error: Missing value for --corpus argument. Please add a corpus directory.")
+            print_usage()
+            quit()
+
     # --no_clean
     if "--no_clean" in sys.argv:
         no_clean = True
@@ -178,6 +641,117 @@ def main():
             print_usage()
             quit()
 
+    # --offset, --scale, --fps and --sync retime whole tracks; --sync may be repeated
+    offset_ms = 0
+    scale = 1.0
+    anchors = []
+    try:
+        for i, arg in enumerate(sys.argv):
+            if arg in ("--offset", "--scale", "--fps", "--sync"):
+                if i + 1 >= len(sys.argv):
+                    print(f"Error: Missing value for {arg} argument.")
+                    print_usage()
+                    quit()
+
+                value = sys.argv[i + 1]
+                if arg == "--offset":
+                    offset_ms = parse_time_ms(value)
+                elif arg == "--scale":
+                    scale *= float(value)
+                elif arg == "--fps":
+                    scale *= parse_fps(value)
+                else:
+                    anchors.append(parse_anchor(value))
+
+        retime = retimer(offset_ms, scale, anchors)
+    except ValueError as e:
+        print(f"Error: {e}")
+        print_usage()
+        quit()
+
+    # --overlaps policy for subtitles that start before the previous one ends
+    overlap_policy = TRIM
+    if "--overlaps" in sys.argv:
+        prefix_index = sys.argv.index("--overlaps")
+        if prefix_index + 1 < len(sys.argv) and sys.argv[prefix_index + 1] in POLICIES:
+            overlap_policy = sys.argv[prefix_index + 1]
+        else:
+            print(f"Error: Invalid value for --overlaps argument. Use one of {', '.join(POLICIES)}.")
+            print_usage()
+            quit()
+
+    # --variants to write several variants of each file from one cleaning pass
+    variants = None
+    if "--variants" in sys.argv:
+        prefix_index = sys.argv.index("--variants")
+        if prefix_index + 1 < len(sys.argv):
+            variants = sys.argv[prefix_index + 1]
+        else:
+            print("Error: Missing value for --variants argument.")
+            print_usage()
+            quit()
+
+    # --formats to write each file in several formats from the same cleaned track
+    formats = None
+    if "--formats" in sys.argv:
+        prefix_index = sys.argv.index("--formats")
+        if prefix_index + 1 < len(sys.argv):
+            formats = sys.argv[prefix_index + 1]
+        else:
+            print("Error: Missing value for --formats argument.")
+            print_usage()
+            quit()
+
+    # --compress to write compressed output files
+    compress = None
+    if "--compress" in sys.argv:
+        prefix_index = sys.argv.index("--compress")
+        if prefix_index + 1 < len(sys.argv) and sys.argv[prefix_index + 1] in COMPRESSORS:
+            compress = sys.argv[prefix_index + 1]
+        else:
+            print(f"Error: Invalid value for --compress argument. Use one of {', '.join(COMPRESSORS)}.")
+            print_usage()
+            quit()
+
+    # --archive to write the cleaned members of an input archive into an output archive
+    archive_path = None
+    if "--archive" in sys.argv:
+        prefix_index = sys.argv.index("--archive")
+        if prefix_index + 1 < len(sys.argv) and is_archive(sys.argv[prefix_index + 1]):
+            archive_path = os.path.abspath(sys.argv[prefix_index + 1])
+        else:
+            print("Error: Invalid value for --archive argument. Use a .zip, .tar, .tar.gz, .tar.bz2 or .tar.xz path.")
+            print_usage()
+            quit()
+
+    # --line-budget in milliseconds, after which a line's remaining stages only run the safe rules
+    line_budget_ms = None
+    if "--line-budget" in sys.argv:
+        prefix_index = sys.argv.index("--line-budget")
+        try:
+            line_budget_ms = float(sys.argv[prefix_index + 1])
+        except (IndexError, ValueError):
+            line_budget_ms = 0
+
+        if line_budget_ms <= 0:
+            print("Error: Invalid value for --line-budget argument. Use a positive number of milliseconds.")
+            print_usage()
+            quit()
+
+    # --long-line length, above which lines only run the safe rules. 0 turns the limit off.
+    long_line_length = LONG_LINE_LENGTH
+    if "--long-line" in sys.argv:
+        prefix_index = sys.argv.index("--long-line")
+        try:
+            long_line_length = int(sys.argv[prefix_index + 1])
+        except (IndexError, ValueError):
+            long_line_length = -1
+
+        if long_line_length < 0:
+            print("Error: Invalid value for --long-line argument. Use a number of characters, or 0 for no limit.")
+            print_usage()
+            quit()
+
     # Sanitize and validate input paths
     def validate_path(path):
         if not os.path.exists(path):
@@ -195,17 +769,135 @@ def main():
             print_usage()
             quit()
 
+    try:
+        cleaner = Cleaner(add_offset=add_offset, add_duration=add_duration, retime=retime, overlap_policy=overlap_policy, no_clean=no_clean, debug=debug_mode,
+                          variants=variants, formats=formats, compress=compress, threads=threads,
+                          long_line_length=long_line_length, line_budget_ms=line_budget_ms, trace=timings or bool(trace_path),
+                          metrics=bool(metrics_path) or "--serve" in sys.argv)
+        if "--worker" in sys.argv:
+            # Clean with the options the files were queued with, keeping this worker's threads and diagnostics
+            from canto_subtitle_cleaner.workqueue import job_queue
+            queue = job_queue(queue_path)
+            options = queue.options()
+            queue.close()
+            cleaner = Cleaner(**{**options, **{key: cleaner.options[key] for key in ("threads", "debug", "trace", "metrics")}})
+    except (ValueError, OSError) as e:
+        # Unknown variants or formats and unreadable rule packs
+        print(f"Error: {e}")
+        print_usage()
+        quit()
+
+    # --audit-regex lists the rules that can take super-linear time on long lines
+    if "--audit-regex" in sys.argv:
+        from canto_subtitle_cleaner.guard import audit_rules, format_audit
+        print(format_audit(audit_rules()))
+        quit()
+
+    # --queue-status prints the progress of a job queue and its failures
+    if "--queue-status" in sys.argv:
+        print_queue_status(queue_path)
+        quit()
+
+    # --analyze-rules lists duplicate and dead rules, and runs of rules that could be applied in one pass
+    if "--analyze-rules" in sys.argv:
+        from canto_subtitle_cleaner.analyze import analyze_rules, format_analysis
+        print(format_analysis(analyze_rules(corpus_directory=corpus_or_quit(corpus_directory))))
+        quit()
+
+    writer = metrics_writer(cleaner, metrics_path, metrics_interval) if metrics_path else None
+
+    # --verify-engine compares a candidate engine's output with the golden corpus and the current rules
+    if "--verify-engine" in sys.argv:
+        prefix_index = sys.argv.index("--verify-engine")
+        spec = None
+        if prefix_index + 1 < len(sys.argv) and not sys.argv[prefix_index + 1].startswith("-"):
+            spec = sys.argv[prefix_index + 1]
+
+        seed = None
+        if "--seed" in sys.argv:
+            prefix_index = sys.argv.index("--seed")
+            try:
+                seed = int(sys.argv[prefix_index + 1])
+            except (IndexError, ValueError):
+                print("Error: Invalid value for --seed argument. Use a whole number.")
+                print_usage()
+                quit()
+
+        from canto_subtitle_cleaner.verify import run_verification
+        if not run_verification(spec, corpus_or_quit(corpus_directory), seed=seed):
+            quit()
+    # --serve argument for an address to run the cleaning service on
+    elif "--serve" in sys.argv:
+        prefix_index = sys.argv.index("--serve")
+        if prefix_index + 1 >= len(sys.argv):
+            print("Error: Missing value for --serve argument. Please add a port or unix:<path>.")
+            print_usage()
+            quit()
+        from canto_subtitle_cleaner.server import serve
+        try:
+            serve(sys.argv[prefix_index + 1], cleaner)
+        except FileExistsError as e:
+            print(f"Error: Cannot listen on {sys.argv[prefix_index + 1]}: {e}.")
+            quit()
+    # --worker cleans files from a job queue until it is finished
+    elif "--worker" in sys.argv:
+        if not run_worker(queue_path, cleaner, lease_seconds):
+            quit()
+    # --watch argument for a directory to clean continuously as files arrive
+    elif "--watch" in sys.argv:
+        prefix_index = sys.argv.index("--watch")
+        if prefix_index + 1 >= len(sys.argv):
+            print("Error: Missing value for --watch argument. Please add an input directory.")
+            print_usage()
+            quit()
+        input_directory = validate_path(sys.argv[prefix_index + 1])
+        watch_directory(input_directory, output_directory, output_prefix, cleaner, jobs, recursive, include, exclude)
+    # - reads SRT from stdin and streams the cleaned SRT to stdout
+    elif sys.argv[1] == "-":
+        if variants:
+            print("Error: --variants writes one file per variant and cannot be used with -.")
+            quit()
+        if len(cleaner.formats) > 1:
+            print("Error: Only one of --formats can be streamed to stdout with -.")
+            quit()
+        input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        output_stream = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        if not process_stream(input_stream, output_stream, cleaner):
+            quit()
     # -d argument for directory of input SRT files
-    if sys.argv[1] == "-d":
+    elif sys.argv[1] == "-d":
         if len(sys.argv) < 3:
             print("Error: Missing value for -d argument. Please add an input directory.")
             print_usage()
             quit()
         input_directory = validate_path(sys.argv[2])
-        process_directory(input_directory, output_directory, OUTPUT_PREFIX, add_offset, add_duration, no_clean)
+        if enqueue_path:
+            enqueue_directory(enqueue_path, input_directory, output_directory, output_prefix, cleaner, recursive, include, exclude)
+        else:
+            process_directory(input_directory, output_directory, output_prefix, cleaner, jobs,
+                              recursive, include, exclude, manifest_path)
+    # A zip or tar archive of SRT files, read without extracting it
+    elif is_archive(sys.argv[1]):
+        input_archive = validate_path(sys.argv[1])
+        process_archive(input_archive, output_directory, output_prefix, cleaner, jobs, include, exclude, archive_path)
     else:
+        if archive_path:
+            print("Error: --archive can only be used with an input archive.")
+            quit()
         input_file = validate_path(sys.argv[1])
-        process_file(input_file, output_directory, OUTPUT_PREFIX, add_offset, add_duration, no_clean)
+        if not process_file(input_file, output_directory, output_prefix, cleaner, jobs):
+            quit()
+
+    # Keep stdout clean when it carries the streamed SRT
+    report_stream = sys.stderr if sys.argv[1] == "-" else sys.stdout
+    if writer:
+        writer.close()
+        print(f"Metrics saved to {metrics_path}.", file=report_stream)
+    if timings:
+        print(cleaner.tracer.summary(), file=report_stream)
+    if trace_path:
+        cleaner.tracer.save(trace_path)
+        print(f"Trace saved to {trace_path}.", file=report_stream)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""Clean subtitles from asyncio code without blocking the event loop.
+
+File reads and cleaning run in an executor: by default a thread pool sharing one warm cleaner and
+its cache, or worker processes from process_pool(), each with a warm copy of the cleaner. A bounded
+number of calls run at once across all callers, and the others wait, so a burst of requests queues
+up in the event loop instead of in the executor. Tracks are cleaned in chunks, a few chunks ahead
+of the consumer, and their blocks are yielded as an async iterator.
+"""
+
+import asyncio
+import functools
+import itertools
+import threading
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from canto_subtitle_cleaner.cleaner import Cleaner, init_worker, call_in_worker, clean_lines_task
+from canto_subtitle_cleaner.overlap import sort_by_start, overlap_resolver
+
+CONCURRENCY = 4         # Executor calls running at once; further calls wait in the event loop
+CHUNK_BLOCKS = 500      # Blocks cleaned per executor call when streaming a track
+CHUNKS_AHEAD = 2        # Chunks cleaned ahead of the consumer of a track
+
+def process_pool(cleaner, workers):
+    """An executor of worker processes, each building a warm copy of cleaner before its first call."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cleaner.options,))
+
+def read_file_task(cleaner, input_file):
+    return cleaner.read_file(input_file)
+
+def adjust_track_task(cleaner, subtitle_list):
+    """Run the track stages over the whole track, which compare each block with its neighbours."""
+    cleaner.count("blocks_read", len(subtitle_list))
+
+    if cleaner.no_clean:
+        return sort_by_start(subtitle_list)
+
+    return cleaner.adjust_track(subtitle_list)
+
+def clean_chunk_task(cleaner, subtitle_list):
+    """Clean the texts of adjusted blocks, dropping the empty ones and retiming the rest."""
+    if cleaner.no_clean:
+        return cleaner.retimer.apply(subtitle_list)
+
+    with cleaner.span("clean_subtitle", summed=False):
+        cleaned_texts = cleaner.clean_lines([text for timecode, text in subtitle_list])
+
+    return cleaner.finish_track(subtitle_list, cleaned_texts)
+
+class async_cleaner:
+    """Async counterparts of the cleaner's file, track and line methods, for use in one event loop.
+
+    `executor` runs the file reads and cleaning: a thread pool of `concurrency` threads by default, or
+    e.g. process_pool(cleaner, workers) to clean on several cores. At most `concurrency` calls run in
+    it at once. An executor passed in is left open by close().
+    """
+
+    def __init__(self, cleaner=None, executor=None, concurrency=CONCURRENCY, chunk_blocks=CHUNK_BLOCKS):
+        self.cleaner = cleaner or Cleaner()
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="async_cleaner")
+        self.in_processes = isinstance(self.executor, ProcessPoolExecutor)
+        self.concurrency = concurrency
+        self.chunk_blocks = chunk_blocks
+        self.semaphore = None   # Made on first use, in the event loop that uses it
+        self.warm = False
+        self.lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.owns_executor:
+            self.executor.shutdown(wait=True)
+
+    def call(self, function, args):
+        """Run function(cleaner, *args) on an executor thread, warming the cleaner up on the first call."""
+        if not self.warm:
+            # The segmenter is loaded on first use, which must not happen in several threads at once
+            with self.lock:
+                if not self.warm:
+                    self.cleaner.warm_up()
+                    self.warm = True
+
+        return function(self.cleaner, *args)
+
+    async def run(self, function, *args):
+        """Await function(cleaner, *args) in the executor, waiting for a free slot first."""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+
+        async with self.semaphore:
+            if self.in_processes:
+                # Statistics and timings from the worker are added to this process's cleaner
+                return self.cleaner.merge_result(await loop.run_in_executor(self.executor, call_in_worker, (function, args)))
+            return await loop.run_in_executor(self.executor, functools.partial(self.call, function, args))
+
+    async def aclean_lines(self, lines):
+        """Clean a list of subtitle texts, returning the cleaned texts in order."""
+        return await self.run(clean_lines_task, list(lines))
+
+    async def aclean_track(self, subtitle_list):
+        """Clean a list of (timecode, text), yielding the blocks that clean_srt would write, with overlaps resolved.
+
+        The texts are cleaned in chunks of chunk_blocks, at most CHUNKS_AHEAD chunks ahead of the
+        consumer, so a slow consumer holds back the cleaning.
+        """
+        subtitle_list = await self.run(adjust_track_task, subtitle_list)
+        chunks = (subtitle_list[i:i + self.chunk_blocks] for i in range(0, len(subtitle_list), self.chunk_blocks))
+        running = collections.deque(asyncio.ensure_future(self.run(clean_chunk_task, chunk))
+                                    for chunk in itertools.islice(chunks, CHUNKS_AHEAD))
+        # The last block of a chunk can still change with the next chunk, so the resolver holds it back until then
+        resolver = overlap_resolver(self.cleaner.overlap_policy)
+
+        try:
+            while running:
+                cleaned = await running.popleft()
+                for chunk in itertools.islice(chunks, 1):
+                    running.append(asyncio.ensure_future(self.run(clean_chunk_task, chunk)))
+
+                for timecode, text in cleaned:
+                    for subtitle in resolver.add(timecode, text):
+                        yield subtitle
+
+            for subtitle in resolver.flush():
+                yield subtitle
+
+        finally:
+            # The consumer stopped early or failed: don't clean chunks nobody will read
+            for future in running:
+                future.cancel()
+
+    async def aclean_file(self, input_file):
+        """Read and clean an SRT file, yielding its cleaned blocks as aclean_track does."""
+        subtitle_list = await self.run(read_file_task, input_file)
+
+        async for subtitle in self.aclean_track(subtitle_list):
+            yield subtitle
+
+        self.cleaner.count("files")
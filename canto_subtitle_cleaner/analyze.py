@@ -0,0 +1,369 @@
+"""Find duplicate, dead and fusable rules in the cleaning pipeline.
+
+The rule tables are analysed in pipeline order: the text stages of clean_subtitle, then the
+uncommon conventions revert of the "common" variant. Findings:
+    duplicate   the same rule appears earlier in the pipeline
+    dead        the rule never matches by the time it runs: neither on inputs built from its own
+                pattern and run through every earlier stage, nor on the corpus
+    fusable     a run of adjacent literal rules that cannot create, destroy or overlap each
+                other's matches, so one pass over an alternation of them gives the same text
+
+Dead rules are found empirically, so the generated inputs are reported with each one. Fusable runs
+are found statically and then checked against sequential application on the corpus.
+"""
+
+import re
+import json
+import types
+import contextlib
+import collections
+import canto_subtitle_cleaner.clean as clean
+from canto_subtitle_cleaner.clean import CLEAN_STAGES, clean_subtitle_revert_uncommon_conventions, resub
+from canto_subtitle_cleaner.guard import stage_tables, sre_parse, sre_constants
+from canto_subtitle_cleaner.srt import text_to_list
+from canto_subtitle_cleaner.verify import CORPUS_DIRECTORY, GOLDEN_DIRECTORY, GOLDEN_LINES, corpus_files, quiet
+
+# The stages that apply rule tables, in the order a line goes through them
+PIPELINE = CLEAN_STAGES + [clean_subtitle_revert_uncommon_conventions]
+
+MAX_WITNESSES = 8       # Inputs built from each pattern
+CORPUS_WITNESSES = 4    # Corpus lines matching a pattern, used as inputs too
+FILLER = "嘢"           # Stands for "any character" in generated inputs
+# Text around generated inputs, so that lookarounds and anchors get a chance either way
+CONTEXTS = [("", ""), ("佢話", "喎"), ("", "佢話"), ("，", "？")]
+
+class rule:
+    """A rule of a table, with its position in the pipeline."""
+
+    def __init__(self, position, stage, table, index, pattern, repl):
+        self.position = position
+        self.stage = stage
+        self.table = table
+        self.index = index
+        self.pattern = pattern
+        self.repl = repl
+
+    @property
+    def literal(self):
+        """The pattern as plain text if it only matches that text, with a plain replacement, else None."""
+        if self.pattern.flags & ~re.UNICODE or not isinstance(self.repl, str) or "\\" in self.repl:
+            return None
+
+        items = list(sre_parse.parse(self.pattern.pattern))
+        if not items or any(op is not sre_constants.LITERAL for op, av in items):
+            return None
+
+        return "".join(chr(av) for op, av in items)
+
+    def __str__(self):
+        return f"{self.table}[{self.index}] ({self.pattern.pattern!r}, {self.repl!r})"
+
+def pipeline_rules(pipeline=PIPELINE):
+    """Every rule of the pipeline's stages, in the order a line meets them."""
+    rules = []
+
+    for stage in pipeline:
+        for table in stage_tables(stage):
+            for index, (pattern, repl) in enumerate(getattr(clean, table)):
+                rules.append(rule(len(rules), stage.__name__, table, index, pattern, repl))
+
+    return rules
+
+class probe:
+    """Stands in for a compiled pattern in a rule table: reports the text before and after each substitution."""
+
+    def __init__(self, rule, report):
+        self.rule = rule
+        self.report = report
+
+    def sub(self, repl, text):
+        result = self.rule.pattern.sub(repl, text)
+        self.report(self.rule, text, result)
+        return result
+
+def instrumented(stage, rules, report):
+    """A copy of a stage whose rule tables call report(rule, text, result) each time a rule runs."""
+    by_table = collections.defaultdict(list)
+    for r in rules:
+        by_table[r.table].append(r)
+
+    tables = {table: [(probe(r, report), r.repl) for r in by_table[table]] for table in stage_tables(stage)}
+    return types.FunctionType(stage.__code__, {**stage.__globals__, **tables}, stage.__name__, stage.__defaults__, stage.__closure__)
+
+def run_instrumented(text, stages):
+    for stage in stages:
+        text = stage(text)
+    return text
+
+######################################## GENERATED INPUTS ########################################
+def expand(items, groups=None, limit=MAX_WITNESSES):
+    """Return up to `limit` (text, groups) pairs for a parsed pattern. Negative lookarounds
+    and anchors are left out, so the texts are candidates that still have to be matched against the pattern."""
+    results = [("", dict(groups or {}))]
+
+    for op, av in items:
+        options = []
+        for text, groups in results:
+            for piece, groups in expand_item(op, av, groups, limit):
+                options.append((text + piece, groups))
+                if len(options) >= limit:
+                    break
+        results = options
+        if not results:
+            return []
+
+    return results
+
+def expand_item(op, av, groups, limit):
+    if op is sre_constants.LITERAL:
+        return [(chr(av), groups)]
+    if op is sre_constants.NOT_LITERAL:
+        return [(FILLER if chr(av) != FILLER else "一", groups)]
+    if op is sre_constants.ANY:
+        return [(FILLER, groups)]
+    if op is sre_constants.IN:
+        return [(char, groups) for char in class_members(av)]
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        low, high, items = av
+        options = []
+        for count in sorted({low, min(max(low, 1), high), min(low + 1, high)}):
+            options.extend(expand(list(items) * count, groups, limit))
+        return options
+    if op is sre_constants.SUBPATTERN:
+        group, items = av[0], av[-1]
+        options = expand(list(items), groups, limit)
+        if group is not None:
+            options = [(text, {**groups, group: text}) for text, groups in options]
+        return options
+    if op is sre_constants.BRANCH:
+        return [option for branch in av[1] for option in expand(list(branch), groups, limit)]
+    if op is sre_constants.GROUPREF:
+        return [(groups.get(av, ""), groups)]
+    if op is sre_constants.ASSERT:
+        # Lookbehinds need their text before the rest, lookaheads usually at the end: try both with and without it
+        return [("", groups)] + expand(list(av[1]), groups, limit)
+    if op in (sre_constants.AT, sre_constants.ASSERT_NOT):
+        return [("", groups)]
+
+    return []
+
+def class_members(items):
+    """A couple of characters in a character class, or one outside it if it is negated."""
+    if items and items[0][0] is sre_constants.NEGATE:
+        excluded = re.compile(f"[{''.join(re.escape(chr(av)) for op, av in items if op is sre_constants.LITERAL)}]")
+        return [char for char in (FILLER, "一", "a") if not excluded.match(char)][:1]
+
+    members = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            members.append(chr(av))
+        elif op is sre_constants.RANGE:
+            members.append(chr(av[0]))
+        elif op is sre_constants.CATEGORY:
+            members.append({sre_constants.CATEGORY_DIGIT: "1", sre_constants.CATEGORY_SPACE: " "}.get(av, "a"))
+
+    # The first and last members, which are often the common and the odd case
+    return list(dict.fromkeys(members[:1] + members[-1:]))
+
+def witnesses(r, corpus=()):
+    """Inputs that the rule's pattern matches on its own: built from the pattern, and from the corpus."""
+    inputs = []
+
+    for text, groups in expand(list(sre_parse.parse(r.pattern.pattern))):
+        for before, after in CONTEXTS:
+            if r.pattern.search(before + text + after):
+                inputs.append(before + text + after)
+
+    inputs.extend([text for text in corpus if r.pattern.search(text)][:CORPUS_WITNESSES])
+    return list(dict.fromkeys(inputs))
+
+########################################## ANALYSES ##########################################
+def find_duplicates(rules):
+    """Return (rule, earlier rule) for every rule whose pattern appeared earlier in the pipeline, with the same
+    or a different replacement."""
+    first = {}
+    duplicates = []
+
+    for r in rules:
+        key = (r.pattern.pattern, r.pattern.flags)
+        if key in first:
+            duplicates.append((r, first[key]))
+        else:
+            first[key] = r
+
+    return duplicates
+
+def corpus_lines(corpus_directory=CORPUS_DIRECTORY):
+    """The subtitle texts of the corpus files and the inputs of the golden random lines."""
+    lines = []
+    for input_file in corpus_files(corpus_directory):
+        with open(input_file, encoding='utf-8') as f:
+            lines.extend(text for timecode, text in text_to_list(f.read()))
+
+    with contextlib.suppress(OSError):
+        with open(f"{corpus_directory}/{GOLDEN_DIRECTORY}/{GOLDEN_LINES}", encoding='utf-8') as f:
+            lines.extend(line["input"] for line in json.load(f))
+
+    return lines
+
+def count_matches(rules, lines, pipeline=PIPELINE):
+    """Run lines through the pipeline and count, for each rule, the lines it matched when its turn came."""
+    matches = collections.Counter()
+
+    def report(r, text, result):
+        if r.pattern.search(text):
+            matches[r.position] += 1
+
+    stages = [instrumented(stage, rules, report) for stage in pipeline]
+    for text in lines:
+        run_instrumented(text, stages)
+
+    return matches
+
+def find_dead_rules(rules, corpus, corpus_matches, pipeline=PIPELINE):
+    """Return (rule, inputs tried, cause) for rules that never match at their turn, where cause says what
+    most often removed their matches. Rules that matched the corpus at their turn are alive and skipped."""
+    dead = []
+
+    for target in rules:
+        if corpus_matches[target.position]:
+            continue
+
+        inputs = witnesses(target, corpus)
+        if not inputs:
+            continue
+
+        fired = False
+        causes = collections.Counter()
+        for text in inputs:
+            # Whether the text still matched after the last rule that ran, and what last removed the match
+            state = {"matched": True, "cause": None}
+
+            def report(r, text, result):
+                nonlocal fired
+                if r.position > target.position:
+                    return
+                if r is target:
+                    fired = fired or bool(target.pattern.search(text))
+                    return
+
+                before = bool(target.pattern.search(text))
+                if state["matched"] and not before:
+                    # Changed between two rules, by code of the stage or of a stage without rule tables
+                    state["cause"] = f"the code before {r.table}[{r.index}] in {r.stage}"
+                if before and not target.pattern.search(result):
+                    state["cause"] = str(r)
+                state["matched"] = bool(target.pattern.search(result))
+
+            run_instrumented(text, [instrumented(stage, rules, report) for stage in pipeline])
+            causes[state["cause"] or f"the stages before {target.stage}"] += 1
+
+            if fired:
+                break
+
+        if not fired:
+            dead.append((target, inputs, causes.most_common(1)[0][0]))
+
+    return dead
+
+def interferes(earlier, later):
+    """Whether applying the literal rule `earlier` can create, destroy or overlap matches of the literal rule
+    `later`, so that applying both in one pass could differ from applying them in turn."""
+    pattern, repl, other = earlier.literal, earlier.repl, later.literal
+
+    # Overlapping matches: containment, or a suffix of one being a prefix of the other
+    for a, b in ((pattern, other), (other, pattern)):
+        if b in a or any(a.endswith(b[:i]) for i in range(1, len(b))):
+            return True
+
+    # The replacement, with any text around it, forming the later pattern
+    if not repl:
+        return len(other) > 1
+    if other in repl or repl in other:
+        return True
+    return any(repl.endswith(other[:i]) or repl.startswith(other[-i:]) for i in range(1, len(other)))
+
+def find_fusable_runs(rules):
+    """Return runs of adjacent literal rules in the same table that can be applied in one pass."""
+    runs = []
+    run = []
+
+    for r in rules:
+        if run and (r.table != run[0].table or not r.literal or any(interferes(earlier, r) for earlier in run)):
+            if len(run) > 1:
+                runs.append(run)
+            run = []
+
+        if r.literal:
+            run.append(r)
+
+    if len(run) > 1:
+        runs.append(run)
+
+    return runs
+
+def fused_rule(run):
+    """One (pattern, replacement function) applying a fusable run of literal rules in a single pass."""
+    replacements = {r.literal: r.repl for r in run}
+    pattern = re.compile("|".join(re.escape(literal) for literal in replacements))
+    return pattern, lambda match: replacements[match.group(0)]
+
+def check_fusable_run(run, lines):
+    """Return the first line where the fused run gives different text from applying the rules in turn, or None."""
+    pattern, repl = fused_rule(run)
+    sequential = [(r.pattern, r.repl) for r in run]
+
+    for text in lines:
+        if pattern.sub(repl, text) != resub(text, sequential):
+            return text
+
+    return None
+
+class analysis:
+    """The findings for a pipeline, as returned by analyze_rules."""
+
+    def __init__(self, rules, lines, duplicates, dead, fusable, corpus_matches):
+        self.rules = rules
+        self.lines = lines
+        self.duplicates = duplicates
+        self.dead = dead
+        self.fusable = fusable
+        self.corpus_matches = corpus_matches
+
+    @property
+    def passes_saved(self):
+        """Regex passes per line that fusing every fusable run would save."""
+        return sum(len(run) - 1 for run, counterexample in self.fusable if counterexample is None)
+
+def analyze_rules(pipeline=PIPELINE, corpus_directory=CORPUS_DIRECTORY):
+    rules = pipeline_rules(pipeline)
+
+    with quiet():
+        lines = corpus_lines(corpus_directory)
+        corpus_matches = count_matches(rules, lines, pipeline)
+        dead = find_dead_rules(rules, lines, corpus_matches, pipeline)
+
+    fusable = [(run, check_fusable_run(run, lines)) for run in find_fusable_runs(rules)]
+    return analysis(rules, lines, find_duplicates(rules), dead, fusable, corpus_matches)
+
+def format_analysis(result):
+    lines = [f"Analysed {len(result.rules)} rules in {len(PIPELINE)} stages over {len(result.lines)} corpus lines."]
+
+    lines.append(f"\n{len(result.duplicates)} duplicate rules:")
+    for r, earlier in result.duplicates:
+        same = "same replacement" if r.repl == earlier.repl else f"replacement {earlier.repl!r} there"
+        lines.append(f"  {r}\n      repeats {earlier.table}[{earlier.index}] ({same})")
+
+    lines.append(f"\n{len(result.dead)} dead rules:")
+    for r, inputs, cause in result.dead:
+        lines.append(f"  {r}\n      never matched at its turn on {len(inputs)} inputs, e.g. {inputs[0]!r}; removed by {cause}")
+
+    lines.append(f"\n{len(result.fusable)} fusable runs, saving {result.passes_saved} passes per line:")
+    for run, counterexample in result.fusable:
+        check = "same output on the corpus" if counterexample is None else f"DIFFERS on {counterexample!r}"
+        lines.append(f"  {run[0].table}[{run[0].index}..{run[-1].index}]: {len(run)} rules in one pass ({check})")
+
+    unused = [r for r in result.rules if not result.corpus_matches[r.position]]
+    lines.append(f"\n{len(unused)} rules never matched the corpus at their turn.")
+
+    return "\n".join(lines)
@@ -0,0 +1,182 @@
+"""Read subtitles straight out of compressed files and archives, and write compressed outputs or an output archive.
+
+Compressed files (.srt.gz, .srt.bz2, .srt.xz) are decompressed while they are read. Archives (.zip and
+.tar, optionally compressed) are read one member at a time: tar archives as a stream from start to
+end, so nothing is extracted to disk first.
+"""
+
+import io
+import os
+import ntpath
+import posixpath
+import bz2
+import gzip
+import lzma
+import time
+import threading
+from canto_subtitle_cleaner.library import SUBTITLE_PATTERNS, matches_any
+
+# Compression suffix -> function opening a file in that format, like open()
+COMPRESSORS = {
+    "gz": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+TAR_SUFFIXES = {".tar": "", ".tar.gz": "gz", ".tgz": "gz", ".tar.bz2": "bz2", ".tbz2": "bz2", ".tar.xz": "xz", ".txz": "xz"}
+ZIP_SUFFIX = ".zip"
+
+def tar_compression(path):
+    """The compression of a tar archive ("" for none), or None if the path is not a tar archive."""
+    name = path.lower()
+    for suffix, compression in TAR_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+
+    return None
+
+def is_archive(path):
+    return path.lower().endswith(ZIP_SUFFIX) or tar_compression(path) is not None
+
+def compression(path):
+    """The compression suffix of a single compressed file, or None."""
+    extension = os.path.splitext(path)[1][1:].lower()
+    return extension if extension in COMPRESSORS and not is_archive(path) else None
+
+def plain_name(path):
+    """The name of a file without its compression suffix: a.srt.gz -> a.srt."""
+    return os.path.splitext(path)[0] if compression(path) else path
+
+def compressed_path(path, compress=None):
+    return f"{path}.{compress}" if compress else path
+
+def open_text(path, mode='r'):
+    """Open a file as UTF-8 text, decompressing or compressing it according to its suffix."""
+    opener = COMPRESSORS.get(compression(path))
+    if opener:
+        return opener(path, mode + 't', encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+def read_text(path):
+    with open_text(path) as f:
+        return f.read()
+
+def decode_member(name, data):
+    """Decode a member's bytes, decompressing members like a.srt.gz inside an archive."""
+    opener = COMPRESSORS.get(compression(name))
+    if opener:
+        with opener(io.BytesIO(data)) as f:
+            data = f.read()
+
+    return data.decode('utf-8')
+
+def safe_member_name(name):
+    """A member name normalised to a relative path inside the archive, or None if it would point outside it."""
+    name = posixpath.normpath(name.replace("\\", "/"))
+
+    if posixpath.isabs(name) or ntpath.splitdrive(name)[0] or name == ".." or name.startswith("../"):
+        return None
+
+    return name
+
+def iter_members(archive_path, include=None, exclude=None):
+    """Yield (member name, text) for the subtitle files in an archive, one member at a time, in archive order.
+
+    Names are normalised, and members whose names are absolute or go up out of the archive are skipped,
+    so that they are never written outside the output directory.
+    """
+    include = include or SUBTITLE_PATTERNS
+    exclude = exclude or []
+
+    def wanted(name):
+        if not (matches_any(name, include) and not matches_any(name, exclude)):
+            return None
+
+        safe_name = safe_member_name(name)
+        if safe_name is None:
+            print(f"Error: unsafe member name {name} in {archive_path}. Skipping it.")
+        return safe_name
+
+    # Imported here, like in output_archive, since most runs never open an archive
+    import tarfile
+    import zipfile
+
+    if archive_path.lower().endswith(ZIP_SUFFIX):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                name = not info.is_dir() and wanted(info.filename)
+                if name:
+                    with archive.open(info) as f:
+                        yield name, decode_member(name, f.read())
+        return
+
+    # Stream mode reads the tar archive front to back, without seeking
+    with tarfile.open(archive_path, f"r|{tar_compression(archive_path) or '*'}") as archive:
+        for member in archive:
+            name = member.isfile() and wanted(member.name)
+            if name:
+                yield name, decode_member(name, archive.extractfile(member).read())
+
+class archive_member(io.StringIO):
+    """A member being written to an output archive: its text is added to the archive when it is closed."""
+
+    def __init__(self, archive, name):
+        super().__init__()
+        self.archive = archive
+        self.name = name
+
+    def close(self):
+        if not self.closed:
+            data = self.getvalue().encode('utf-8')
+            opener = COMPRESSORS.get(compression(self.name))
+            if opener:
+                buffer = io.BytesIO()
+                with opener(buffer, 'wb') as f:
+                    f.write(data)
+                data = buffer.getvalue()
+            self.archive.add(self.name, data)
+        super().close()
+
+class output_archive:
+    """A .zip or .tar[.gz|.bz2|.xz] archive that cleaned files are written into instead of a directory."""
+
+    def __init__(self, path):
+        if not is_archive(path):
+            raise ValueError(f"Unknown archive type: {path}. Use .zip, .tar, .tar.gz, .tar.bz2 or .tar.xz.")
+
+        self.path = path
+        # Variants may be written from several threads, and archives take one member at a time
+        self.lock = threading.Lock()
+
+        import tarfile
+        import zipfile
+        if path.lower().endswith(ZIP_SUFFIX):
+            self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            self.tar = None
+        else:
+            self.zip = None
+            self.tar = tarfile.open(path, f"w:{tar_compression(path)}")
+
+    def open(self, name, mode='w'):
+        """Open a member for writing as text, with the same signature as open_text."""
+        return archive_member(self, name.replace(os.sep, '/'))
+
+    def add(self, name, data):
+        with self.lock:
+            if self.zip:
+                self.zip.writestr(name, data)
+            else:
+                info = self.tar.tarinfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        (self.zip or self.tar).close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
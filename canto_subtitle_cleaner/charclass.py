@@ -0,0 +1,68 @@
+"""Character classes for the per-character loops of the formatter, as table lookups instead of regex matches.
+
+Each character maps to a byte of flags. Flags are computed once per distinct character and kept in
+CHAR_FLAGS, so classifying a line is one dictionary lookup per character.
+"""
+
+import string
+
+# Character class flags
+CJK = 1                 # CJK unified ideographs, [一-鿿]
+DIGIT = 2               # Decimal digits in any script, like \d
+LATIN = 4               # ASCII letters, [A-Za-z]
+DELIMITING = 8          # Punctuation that delimits segments, [，？！…。：；]
+PUNCTUATION = 16        # Punctuation or whitespace that a line may break after, [，？！…：；\s\-]
+STANDALONE_START = 32   # Characters that may be used alone to start a sentence before a comma
+ASCII = 64              # [\x00-\x7F]
+
+DELIMITING_CHARS = frozenset("，？！…。：；")
+PUNCTUATION_CHARS = frozenset("，？！…：；-")
+LATIN_CHARS = frozenset(string.ascii_letters)
+STANDALONE_START_CHARS = frozenset({"噉", "喂", "噢", "嗯", "哦", "嗱", "係", "好", "嘩"})
+
+def compute_flags(char):
+    flags = 0
+
+    if "一" <= char <= "鿿":
+        flags |= CJK
+    if char.isdecimal():
+        flags |= DIGIT
+    if char in LATIN_CHARS:
+        flags |= LATIN
+    if char in DELIMITING_CHARS:
+        flags |= DELIMITING
+    if char in PUNCTUATION_CHARS or char.isspace():
+        flags |= PUNCTUATION
+    if char in STANDALONE_START_CHARS:
+        flags |= STANDALONE_START
+    if char.isascii():
+        flags |= ASCII
+
+    return flags
+
+class char_flags(dict):
+    """Flags per character, filled in on first lookup."""
+
+    def __missing__(self, char):
+        flags = self[char] = compute_flags(char)
+        return flags
+
+CHAR_FLAGS = char_flags()
+CHAR_FLAGS.update((chr(i), compute_flags(chr(i))) for i in range(128))
+CHAR_FLAGS.update((char, compute_flags(char)) for char in DELIMITING_CHARS | PUNCTUATION_CHARS | STANDALONE_START_CHARS)
+
+def classify(text):
+    """Return the flags of every character of a line, as bytes."""
+    return bytes(map(CHAR_FLAGS.__getitem__, text))
+
+def is_delimiting(char):
+    return CHAR_FLAGS[char] & DELIMITING != 0
+
+def is_punctuation(char):
+    return CHAR_FLAGS[char] & PUNCTUATION != 0
+
+def is_non_chinese(char):
+    return CHAR_FLAGS[char] & (LATIN | DIGIT) != 0
+
+def is_ascii(char):
+    return CHAR_FLAGS[char] & ASCII != 0
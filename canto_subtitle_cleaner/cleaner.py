@@ -0,0 +1,578 @@
+"""A reusable cleaning session that owns its options, caches and statistics."""
+
+import io
+import copy
+import warnings
+import time
+import itertools
+import threading
+import collections
+import contextlib
+from canto_subtitle_cleaner.srt import text_to_list, loads, dumps, clean_timecodes, timecode as srt_timecode
+from canto_subtitle_cleaner.format import adjust_subtitle_breaks, magnetize_endings
+from canto_subtitle_cleaner.tracing import tracer
+from canto_subtitle_cleaner.metrics import stage_latencies
+from canto_subtitle_cleaner.retime import retimer, to_ms
+from canto_subtitle_cleaner.overlap import TRIM, POLICIES, sort_by_start
+from canto_subtitle_cleaner.variants import STANDARD, parse_variants, variant_path
+from canto_subtitle_cleaner.writers import SRT, parse_formats, format_path, write_track
+from canto_subtitle_cleaner.archive import COMPRESSORS, compression, compressed_path, open_text, read_text
+from canto_subtitle_cleaner.fastsrt import fallback, retime_file as retime_srt_file
+
+PARALLEL_MIN_LINES = 2000   # Below this, starting worker processes costs more than it saves
+CHUNKS_PER_JOB = 4          # Several chunks per worker, so that uneven chunks still balance out
+TASKS_IN_FLIGHT = 2         # Tasks queued per worker in map, so that workers never wait for the next task
+THREADED_MIN_LINES = 64     # Below this, handing lines to the thread pool costs more than it saves
+LONG_LINE_LENGTH = 500      # Far longer than any real subtitle: only garbage lines, where risky rules can go quadratic
+
+class Cleaner:
+    """Clean subtitle lines, tracks and files with one set of options.
+
+    Build one instance and reuse it: the rules are compiled once, on the first line cleaned or by
+    warm_up(), which also loads the word segmenter, and cleaned lines are cached per instance. Nothing here touches global state,
+    so several differently configured cleaners can live in one process.
+    """
+
+    def __init__(self, line_max_length=21, magnetize_max_delta_ms=300, magnetize_intermediate_delta_ms=1000,
+                 revert_uncommon_conventions=False, add_offset=None, add_duration=None, retime=None,
+                 overlap_policy=TRIM, variants=None, formats=None, compress=None, threads=1,
+                 long_line_length=LONG_LINE_LENGTH, line_budget_ms=None, no_clean=False, debug=False, cache_size=65536, trace=False, metrics=False):
+        # Kept so that worker processes can build an identical cleaner
+        self.options = {
+            "line_max_length": line_max_length,
+            "magnetize_max_delta_ms": magnetize_max_delta_ms,
+            "magnetize_intermediate_delta_ms": magnetize_intermediate_delta_ms,
+            "revert_uncommon_conventions": revert_uncommon_conventions,
+            "add_offset": add_offset,
+            "add_duration": add_duration,
+            "retime": retime,
+            "overlap_policy": overlap_policy,
+            "variants": variants,
+            "formats": formats,
+            "compress": compress,
+            "threads": threads,
+            "long_line_length": long_line_length,
+            "line_budget_ms": line_budget_ms,
+            "no_clean": no_clean,
+            "debug": debug,
+            "cache_size": cache_size,
+            "trace": trace,
+            "metrics": metrics,
+        }
+        self.line_max_length = line_max_length
+        self.magnetize_max_delta_ms = magnetize_max_delta_ms
+        self.magnetize_intermediate_delta_ms = magnetize_intermediate_delta_ms
+        self.revert_uncommon_conventions = revert_uncommon_conventions
+        self.add_offset = add_offset
+        self.add_duration = add_duration
+        # add_offset and add_duration are folded into the retiming, which is applied to whole tracks at once
+        retime = retime or retimer()
+        self.retimer = retimer(retime.offset_ms + to_ms(add_offset), retime.scale, retime.anchors,
+                               retime.duration_ms + to_ms(add_duration))
+        self.overlap_policy = overlap_policy
+        # Variant name -> stages applied after the shared cleaning pass
+        self.variants = parse_variants(variants) if variants else {STANDARD: []}
+        # Output formats written from each cleaned track
+        self.formats = parse_formats(formats) if formats else [SRT]
+        if compress and compress not in COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compress}. Use one of {', '.join(COMPRESSORS)}.")
+        self.compress = compress
+        self.threads = threads
+        # Lines longer than this, or going over the time budget, fall back to the safe rules
+        self.long_line_length = long_line_length
+        self.line_budget_ms = line_budget_ms
+        self.no_clean = no_clean
+        self.debug = debug
+        self.cache_size = cache_size
+
+        self.cache = {}
+        self.stats = collections.Counter()
+        self.tracer = tracer() if trace else None
+        # Latency histograms per stage, for metrics.py
+        self.latencies = stage_latencies() if metrics else None
+        # Guards the cache and statistics, which threads cleaning lines of the same track share
+        self.lock = threading.Lock()
+        self.executor = None
+
+        if overlap_policy not in POLICIES:
+            raise ValueError(f"Unknown overlap policy: {overlap_policy}. Use one of {', '.join(POLICIES)}.")
+
+    def span(self, name, summed=True):
+        """Time a stage when tracing or metrics are enabled."""
+        context = self.tracer.span(name, summed) if self.tracer else contextlib.nullcontext()
+        return self.timed(context, name) if self.latencies else context
+
+    def trace_file(self, input_file):
+        """Attribute the stages timed inside this context to input_file."""
+        context = self.tracer.file_span(input_file) if self.tracer else contextlib.nullcontext()
+        return self.timed(context, "file") if self.latencies else context
+
+    @contextlib.contextmanager
+    def timed(self, context, name):
+        """Run a tracing context and add its time to the latency histogram of name."""
+        with context, self.latencies.span(name):
+            yield
+
+    def count(self, name, n=1):
+        """Add to a statistic. Safe to call from several threads."""
+        with self.lock:
+            self.stats[name] += n
+
+    def warm_up(self):
+        """Load the word segmenter and run every rule once, before the first real subtitle."""
+        from canto_subtitle_cleaner.clean import warm_up
+        warm_up()
+
+    def clean_line(self, text):
+        """Clean a single subtitle text, as clean_subtitle does."""
+        cleaned_text = self.cache.get(text)
+
+        if cleaned_text is not None:
+            self.count("cache_hits")
+            return cleaned_text
+
+        self.count("cache_misses")
+        over_budget = []
+        steps = self.iter_clean_guarded(text, over_budget)
+        if self.latencies:
+            steps = self.latencies.observe_steps(steps)
+        if self.tracer:
+            cleaned_text = self.tracer.trace_steps(steps)
+        else:
+            for stage, cleaned_text in steps:
+                pass
+
+        # linebreak leaves a line that is too long unbroken when it finds nowhere to break it
+        if '\n' not in cleaned_text and len(cleaned_text) > self.line_max_length - 3:
+            self.count("linebreak_fallbacks")
+
+        if self.revert_uncommon_conventions:
+            from canto_subtitle_cleaner.clean import clean_subtitle_revert_uncommon_conventions
+            start = time.perf_counter()
+            cleaned_text = clean_subtitle_revert_uncommon_conventions(cleaned_text)
+            if self.tracer:
+                self.tracer.add("revert_uncommon_conventions", time.perf_counter() - start)
+            if self.latencies:
+                self.latencies.observe("revert_uncommon_conventions", time.perf_counter() - start)
+
+        # A line that went over the budget may be cleaned in full next time, so its result is not kept
+        if self.cache_size and not over_budget:
+            with self.lock:
+                if len(self.cache) >= self.cache_size:
+                    del self.cache[next(iter(self.cache))]  # Drop the oldest entry
+                self.cache[text] = cleaned_text
+
+        return cleaned_text
+
+    def iter_clean_guarded(self, text, over_budget=None):
+        """iter_clean_subtitle, falling back to the safe rules of guard.py for lines that are too long,
+        or for the remaining stages once a line goes over the time budget. The name of the stage that
+        went over the budget is appended to the list `over_budget`, if given.
+
+        The budget is only checked between stages, so it cannot stop a stage that has started: a single
+        catastrophic rule still runs to completion. The length limit is what bounds the time a risky
+        rule can take.
+        """
+        # The rules are compiled when clean.py is imported, so runs that never clean a line never compile them
+        from canto_subtitle_cleaner.clean import CLEAN_STAGES, iter_clean_subtitle
+        from canto_subtitle_cleaner.guard import SAFE_STAGES
+
+        if self.long_line_length and len(text) > self.long_line_length:
+            self.report_fallback(text, f"it is {len(text)} characters long")
+            yield from iter_clean_subtitle(text, self.line_max_length, SAFE_STAGES)
+            return
+
+        if not self.line_budget_ms:
+            yield from iter_clean_subtitle(text, self.line_max_length)
+            return
+
+        original_text = text
+        deadline = time.perf_counter() + self.line_budget_ms / 1000
+        for i, stage in enumerate(CLEAN_STAGES):
+            text = stage(text)
+            yield stage.__name__, text
+
+            if time.perf_counter() > deadline and i + 1 < len(CLEAN_STAGES):
+                self.report_fallback(original_text, f"it went over the {self.line_budget_ms}ms budget in {stage.__name__}")
+                if over_budget is not None:
+                    over_budget.append(stage.__name__)
+                yield from iter_clean_subtitle(text, self.line_max_length, SAFE_STAGES[i + 1:])
+                return
+
+        yield from iter_clean_subtitle(text, self.line_max_length, [])
+
+    def report_fallback(self, text, reason):
+        self.count("safe_fallbacks")
+        warnings.warn(f"Cleaning a line with the safe rules only, because {reason}: {text[:40]}…")
+
+    def iter_clean_line(self, text):
+        """Yield (stage name, text) after each step of clean_line, e.g. to find where two engines diverge."""
+        for stage, text in self.iter_clean_guarded(text):
+            yield stage, text
+
+        if self.revert_uncommon_conventions:
+            from canto_subtitle_cleaner.clean import clean_subtitle_revert_uncommon_conventions
+            yield "revert_uncommon_conventions", clean_subtitle_revert_uncommon_conventions(text)
+
+    def clean_lines(self, lines):
+        if self.threads > 1 and len(lines) >= THREADED_MIN_LINES:
+            return self.clean_lines_threaded(lines)
+
+        return [self.clean_line(text) for text in lines]
+
+    def clean_lines_threaded(self, lines):
+        """clean_lines in this cleaner's thread pool, sharing its compiled rules and cache.
+
+        Only free-threaded Python builds clean lines in parallel this way; with the GIL, use
+        clean_lines_parallel, which uses processes.
+        """
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            with self.lock:
+                if self.executor is None:
+                    # The segmenter is loaded on first use, which must not happen in several threads at once
+                    self.warm_up()
+                    self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="cleaner")
+
+        distinct = list(dict.fromkeys(lines))
+        chunk_size = -(-len(distinct) // (self.threads * CHUNKS_PER_JOB))
+        chunks = [distinct[i:i + chunk_size] for i in range(0, len(distinct), chunk_size)]
+
+        cleaned_lines = {}
+        for chunk, cleaned in zip(chunks, self.executor.map(lambda chunk: [self.clean_line(text) for text in chunk], chunks)):
+            cleaned_lines.update(zip(chunk, cleaned))
+
+        return [cleaned_lines[text] for text in lines]
+
+    def clean_lines_parallel(self, lines, jobs=1):
+        """clean_lines for large tracks: distinct lines are cleaned in chunks across up to `jobs`
+        worker processes, and the results are put back in the original order."""
+        distinct = list(dict.fromkeys(lines))
+
+        if jobs <= 1 or len(distinct) < PARALLEL_MIN_LINES:
+            return self.clean_lines(lines)
+
+        chunk_size = -(-len(distinct) // (jobs * CHUNKS_PER_JOB))
+        file = self.tracer.file if self.tracer else None
+        tasks = [(distinct[i:i + chunk_size], file) for i in range(0, len(distinct), chunk_size)]
+
+        cleaned = []
+        for chunk in self.map(clean_lines_task, tasks, jobs):
+            cleaned.extend(chunk)
+
+        cleaned_lines = dict(zip(distinct, cleaned))
+        return [cleaned_lines[text] for text in lines]
+
+    def finish_block(self, timecode, text, cleaned_text):
+        """Strip a cleaned block, returning None if it should be dropped."""
+        cleaned_text = cleaned_text.strip()
+
+        if self.debug:
+            replaced_text = text.replace('\n', '\\n')
+            replaced_block_text = cleaned_text.replace('\n', '\\n')
+            print(f"  {timecode.start}: \t{replaced_text} \n→ {timecode.start}: \t{replaced_block_text}")
+
+        # Skip block if cleaned text is empty
+        if not cleaned_text:
+            self.count("blocks_dropped")
+            return None
+
+        return (timecode, cleaned_text)
+
+    def clean_track(self, subtitle_list, clean_lines=None):
+        """Take a list of (timecode, subtitle text), clean up all the text, and return the blocks to keep.
+
+        `clean_lines` replaces the function used to clean the texts, e.g. to batch them with other requests.
+        """
+        self.count("blocks_read", len(subtitle_list))
+
+        if self.no_clean:
+            with self.span("retime"):
+                return self.retimer.apply(subtitle_list)
+
+        subtitle_list, cleaned_texts = self.clean_texts(subtitle_list, clean_lines)
+        return self.finish_track(subtitle_list, cleaned_texts)
+
+    def clean_variants(self, subtitle_list, clean_lines=None):
+        """Clean a track once and return {variant name: blocks to keep} for each of this cleaner's variants.
+
+        Only the variant-specific stages, dropping empty blocks and retiming run once per variant.
+        """
+        if len(self.variants) == 1 and not next(iter(self.variants.values())):
+            return {name: self.clean_track(subtitle_list, clean_lines) for name in self.variants}
+
+        self.count("blocks_read", len(subtitle_list))
+
+        if self.no_clean:
+            with self.span("retime"):
+                return {name: self.retimer.apply([(copy.copy(timecode), text) for timecode, text in subtitle_list])
+                        for name in self.variants}
+
+        subtitle_list, cleaned_texts = self.clean_texts(subtitle_list, clean_lines)
+        tracks = {}
+
+        for name, stages in self.variants.items():
+            texts = cleaned_texts
+            with self.span("variant_stages"):
+                for stage in stages:
+                    texts = [stage(text) for text in texts]
+
+            # Each variant drops and retimes its own blocks
+            tracks[name] = self.finish_track([(copy.copy(timecode), text) for timecode, text in subtitle_list], texts)
+
+        return tracks
+
+    def clean_texts(self, subtitle_list, clean_lines=None):
+        """Run the track stages and clean every text. Returns the adjusted track and its cleaned texts."""
+        subtitle_list = self.adjust_track(subtitle_list)
+
+        with self.span("clean_subtitle", summed=False):
+            cleaned_texts = (clean_lines or self.clean_lines)([text for timecode, text in subtitle_list])
+
+        return subtitle_list, cleaned_texts
+
+    def adjust_track(self, subtitle_list):
+        """Sort a track by start time and run the track stages, which compare each block with its neighbours in time."""
+        for timecode, text in subtitle_list:
+            if not isinstance(timecode, srt_timecode):
+                raise TypeError("Expected timecode to be of type srt.timecode")
+
+        subtitle_list = sort_by_start(subtitle_list)
+
+        with self.span("adjust_subtitle_breaks"):
+            adjust_subtitle_breaks(subtitle_list, self.count)
+        with self.span("magnetize_endings"):
+            magnetize_endings(subtitle_list, self.magnetize_max_delta_ms, self.magnetize_intermediate_delta_ms)
+
+        return subtitle_list
+
+    def finish_track(self, subtitle_list, cleaned_texts):
+        new_subtitle_list = []
+
+        for (timecode, text), cleaned_text in zip(subtitle_list, cleaned_texts):
+            subtitle = self.finish_block(timecode, text, cleaned_text)
+            if subtitle:
+                new_subtitle_list.append(subtitle)
+
+        with self.span("retime"):
+            return self.retimer.apply(new_subtitle_list)
+
+    def clean_stream(self, subtitle_blocks):
+        """Streaming version of clean_track: yields each block as soon as the next one has been read.
+
+        Each stage only looks one block ahead, so running the same stages over a two-block window
+        gives the same result as running them over the whole track.
+        """
+        previous = None
+
+        def finish(timecode, text):
+            subtitle = (timecode, text) if self.no_clean else self.finish_block(timecode, text, self.clean_line(text))
+            if subtitle:
+                retimed = self.retimer.apply([subtitle])
+                return retimed[0] if retimed else None
+
+        for block in subtitle_blocks:
+            if not isinstance(block[0], srt_timecode):
+                raise TypeError("Expected timecode to be of type srt.timecode")
+
+            self.count("blocks_read")
+
+            if previous is not None:
+                if not self.no_clean:
+                    window = [previous, block]
+                    start = time.perf_counter()
+                    adjust_subtitle_breaks(window, self.count)
+                    middle = time.perf_counter()
+                    magnetize_endings(window, self.magnetize_max_delta_ms, self.magnetize_intermediate_delta_ms)
+                    previous, block = window
+
+                    end = time.perf_counter()
+                    if self.tracer:
+                        self.tracer.add("adjust_subtitle_breaks", middle - start)
+                        self.tracer.add("magnetize_endings", end - middle)
+                    if self.latencies:
+                        self.latencies.observe("adjust_subtitle_breaks", middle - start)
+                        self.latencies.observe("magnetize_endings", end - middle)
+
+                subtitle = finish(*previous)
+                if subtitle:
+                    yield subtitle
+
+            previous = block
+
+        if previous is not None:
+            subtitle = finish(*previous)
+            if subtitle:
+                yield subtitle
+
+    def read_file(self, input_file):
+        """Parse an SRT file, decompressing .srt.gz, .srt.bz2 and .srt.xz files as they are read."""
+        with self.span("parse"):
+            return text_to_list(read_text(input_file), self.count)
+
+    def output_files(self, output_file):
+        """The paths written for output_file: one per variant and output format."""
+        return [compressed_path(format_path(variant_path(output_file, name), output_format), self.compress)
+                for name in self.variants for output_format in self.formats]
+
+    def write_file(self, subtitle_list, output_file, opener=open_text):
+        """Resolve overlaps once and write the track in each output format. Returns the paths written.
+
+        opener opens each output as text: a file by default, or a member of an output archive.
+        """
+        with self.span("clean_timecodes"):
+            subtitle_list = clean_timecodes(subtitle_list, self.overlap_policy)
+
+        paths = []
+        with self.span("write"):
+            for output_format in self.formats:
+                paths.append(compressed_path(format_path(output_file, output_format), self.compress))
+                write_track(subtitle_list, paths[-1], output_format, opener)
+
+        return paths
+
+    def write_variants(self, tracks, output_file, opener=open_text):
+        """Write each variant's track next to output_file, in parallel. Returns the paths written."""
+        variant_files = [variant_path(output_file, name) for name in tracks]
+
+        if len(tracks) == 1:
+            written = [self.write_file(next(iter(tracks.values())), variant_files[0], opener)]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=len(tracks)) as executor:
+                written = list(executor.map(self.write_file, tracks.values(), variant_files, [opener] * len(tracks)))
+
+        return [path for paths in written for path in paths]
+
+    def retime_file(self, input_file, output_file):
+        """With no_clean, retime an SRT file at the byte level, without parsing its text. Returns the paths
+        written, or None if the file, or this cleaner's variants, formats or compression, need the full parser."""
+        if (not self.no_clean or self.formats != [SRT] or self.compress or compression(input_file)
+                or len(self.variants) != 1 or next(iter(self.variants.values()))):
+            return None
+
+        output_file = self.output_files(output_file)[0]
+        try:
+            with self.span("retime_bytes"):
+                counts = retime_srt_file(input_file, output_file, self.retimer, self.overlap_policy)
+        except fallback:
+            self.count("byte_fallbacks")
+            return None
+
+        for name, n in counts.items():
+            self.count(name, n)
+        return [output_file]
+
+    def clean_srt(self, content, clean_lines=None):
+        """Clean SRT content given as str, bytes or memoryview and return the cleaned SRT text, without touching the disk."""
+        with self.span("parse"):
+            subtitle_list = loads(content, self.count)
+
+        subtitle_list = self.clean_track(subtitle_list, clean_lines)
+
+        with self.span("clean_timecodes"):
+            subtitle_list = clean_timecodes(subtitle_list, self.overlap_policy)
+        with self.span("write"):
+            return dumps(subtitle_list, fix_timecodes=False)
+
+    def clean_file(self, input_file, output_file, jobs=1):
+        """Clean an SRT file and write each variant next to output_file, cleaning its lines in up to `jobs` processes."""
+        with self.trace_file(input_file):
+            if not self.retime_file(input_file, output_file):
+                clean_lines = (lambda lines: self.clean_lines_parallel(lines, jobs)) if jobs > 1 else None
+                self.write_variants(self.clean_variants(self.read_file(input_file), clean_lines), output_file)
+        self.count("files")
+
+        return output_file
+
+    def clean_many(self, input_files, output_files, jobs=1):
+        """Clean several files, in up to `jobs` worker processes.
+
+        Returns one result per file, in order: None on success, or the exception that was raised.
+        """
+        return list(self.map(clean_file_task, zip(input_files, output_files), jobs))
+
+    def map(self, function, tasks, jobs=1):
+        """Yield function(cleaner, *task) for each task, in task order.
+
+        With jobs > 1 the calls run in a process pool whose workers each hold a warm copy of this
+        cleaner; their statistics and stage timings are added to this cleaner's. Tasks are taken
+        from the iterable as workers free up, at most TASKS_IN_FLIGHT per worker ahead of the
+        results, so a long stream of tasks (like the members of an archive) is never all in memory.
+        """
+        tasks = iter(tasks)
+        first_tasks = list(itertools.islice(tasks, max(jobs, 1)))
+
+        if jobs <= 1 or len(first_tasks) <= 1:
+            for task in itertools.chain(first_tasks, tasks):
+                yield function(self, *task)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(first_tasks), initializer=init_worker, initargs=(self.options,)) as executor:
+            running = collections.deque()
+
+            for task in itertools.chain(first_tasks, tasks):
+                running.append(executor.submit(call_in_worker, (function, task)))
+                if len(running) >= jobs * TASKS_IN_FLIGHT:
+                    yield self.merge_result(running.popleft().result())
+
+            while running:
+                yield self.merge_result(running.popleft().result())
+
+    def merge_result(self, worker_result):
+        """Add the statistics, timings and latencies of a pool worker's call to this cleaner's, returning its result."""
+        result, stats, timings, latencies = worker_result
+        with self.lock:
+            self.stats.update(stats)
+        if self.tracer and timings:
+            self.tracer.merge(timings)
+        if self.latencies and latencies:
+            self.latencies.merge(latencies)
+
+        return result
+
+def clean_file_task(cleaner, input_file, output_file):
+    try:
+        cleaner.clean_file(input_file, output_file)
+        return None
+    except Exception as e:
+        return e
+
+def clean_text_task(cleaner, name, content):
+    """Clean the text of an SRT file, returning {variant name: track}, or the exception that was raised."""
+    try:
+        with cleaner.trace_file(name):
+            with cleaner.span("parse"):
+                subtitle_list = text_to_list(content, cleaner.count)
+            tracks = cleaner.clean_variants(subtitle_list)
+        cleaner.count("files")
+        return tracks
+    except Exception as e:
+        return e
+
+def clean_lines_task(cleaner, lines, file=None):
+    if cleaner.tracer:
+        cleaner.tracer.file = file  # Attribute the worker's timings to the file being cleaned
+    return cleaner.clean_lines(lines)
+
+# The cleaner owned by a pool worker process
+_worker_cleaner = None
+
+def init_worker(options):
+    """Set up a pool worker: build its cleaner and compile all rules once before the first task."""
+    global _worker_cleaner
+    _worker_cleaner = Cleaner(**options)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_cleaner.warm_up()
+
+def call_in_worker(call):
+    """Run (function, task) on the worker's cleaner, returning the result and the statistics, timings and latencies it added."""
+    function, task = call
+    before = collections.Counter(_worker_cleaner.stats)
+    result = function(_worker_cleaner, *task)
+    timings = _worker_cleaner.tracer.drain() if _worker_cleaner.tracer else None
+    latencies = _worker_cleaner.latencies.drain() if _worker_cleaner.latencies else None
+
+    return result, _worker_cleaner.stats - before, timings, latencies
@@ -0,0 +1,175 @@
+"""Retime SRT files at the byte level, for --no_clean runs.
+
+The file is streamed line by line as bytes. Only the timecode lines are parsed, with a fixed-layout
+integer parser, and rewritten; the text lines are passed through without being decoded. Blocks are
+renumbered and overlaps are resolved as usual, so the output is identical to parsing the file and
+writing it back.
+
+That only holds for files in the usual layout, so anything else raises fallback, and the file is
+read with the full parser instead: a block that is short or out of order, a timecode that strptime would
+read differently (like 0:00:01,5), line separators other than \\n and \\r\\n, whitespace outside
+ASCII, and times that go past 24 hours.
+"""
+
+import os
+import re
+import warnings
+import collections
+from canto_subtitle_cleaner.overlap import TRIM, iter_resolve_overlaps
+
+CHUNK_SIZE = 1 << 20     # Bytes read at once; each chunk is extended to the end of its last line
+RETIME_BATCH = 1024     # Blocks retimed at once: the retimer works on arrays of times
+
+# Bytes where str.splitlines() or str.isspace() see more than bytes do: \x0b, \x0c, \x1c-\x1f, a lone
+# \r, U+0085, U+00A0, U+1680, U+2000-U+200A, U+2028, U+2029, U+202F, U+205F and U+3000. Every match
+# starts with one of a few bytes, checked first, so most positions fail on a single byte.
+IRREGULAR = re.compile(rb"[\x0b\x0c\x1c-\x1f\r\xc2\xe1\xe2\xe3](?:(?<=[\x0b\x0c\x1c-\x1f])|(?<=\r)(?!\n)|(?<=\xc2)[\x85\xa0]"
+                       rb"|(?<=\xe1)\x9a\x80|(?<=\xe2)(?:\x80[\x80-\x8a\xa8\xa9\xaf]|\x81\x9f)|(?<=\xe3)\x80\x80)")
+WHITESPACE_LINE = re.compile(rb"^[ \t]+$", re.MULTILINE)
+SEPARATOR = re.compile(rb"\n\n+")
+# Every digit of a timecode line maps to 0, so one comparison checks its layout
+LAYOUT = b"00:00:00,000 --> 00:00:00,000"
+DIGITS_TO_ZERO = bytes.maketrans(b"0123456789", b"0000000000")
+DAY_MS = 24 * 3600000   # strftime wraps the hours after a day
+NEWLINE = os.linesep.encode()
+
+class fallback(Exception):
+    """The file is not in the layout that the byte-level path reproduces exactly."""
+
+class raw_timecode:
+    """Start and end times in milliseconds, as the retimer and iter_resolve_overlaps use them."""
+    __slots__ = ("start_ms", "end_ms")
+
+    def __init__(self, start_ms, end_ms):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+    def to_bytes(self):
+        start = self.start_ms
+        end = self.end_ms
+        if not 0 <= start < end < DAY_MS:
+            raise fallback(f"Time out of range: {start} --> {end}")
+
+        return b"%02d:%02d:%02d,%03d --> %02d:%02d:%02d,%03d" % (
+            start // 3600000, start // 60000 % 60, start // 1000 % 60, start % 1000,
+            end // 3600000, end // 60000 % 60, end // 1000 % 60, end % 1000)
+
+# Milliseconds from the nine digits of HH:MM:SS,mmm read as one integer
+def digits_ms(n):
+    hours, n = divmod(n, 10000000)
+    minutes, n = divmod(n, 100000)
+    seconds, ms = divmod(n, 1000)
+    if hours > 23 or minutes > 59 or seconds > 59:
+        raise fallback(f"Time out of range: {hours}:{minutes}:{seconds}")
+
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + ms
+
+def parse_timecode_line(line):
+    """Parse b"HH:MM:SS,mmm --> HH:MM:SS,mmm" into a raw_timecode, or None if it does not start before it ends.
+    Raises fallback for any other layout."""
+    if line.translate(DIGITS_TO_ZERO) != LAYOUT:
+        raise fallback(f"Unusual timecode: {line!r}")
+
+    # The 18 digits of both times as one integer
+    start, end = divmod(int(line.translate(None, b":, ->")), 1000000000)
+    start = digits_ms(start)
+    end = digits_ms(end)
+
+    return raw_timecode(start, end) if start < end else None
+
+def iter_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Yield the stream in chunks of whole lines, with \r\n line breaks replaced and whitespace-only lines emptied."""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        if not chunk.endswith(b"\n"):
+            chunk += stream.readline()
+
+        if IRREGULAR.search(chunk):
+            raise fallback("Unusual whitespace or line break.")
+        if b"\r" in chunk:
+            chunk = chunk.replace(b"\r\n", b"\n")
+
+        # A whitespace-only line separates blocks, like an empty one
+        yield WHITESPACE_LINE.sub(b"", chunk)
+
+def iter_raw_blocks(stream, counts, chunk_size=CHUNK_SIZE):
+    """Read an SRT byte stream in chunks and yield (raw_timecode, text bytes) for each block.
+
+    Blocks whose timecode does not start before it ends are dropped, as parse_block does, and
+    counted in counts. The last block of each chunk is held back until the next one, since at the
+    end of the file the trailing whitespace of the last block is stripped.
+    """
+    held_back = b""
+
+    def blocks(pieces):
+        for piece in pieces:
+            piece = piece.strip(b"\n")
+            if not piece:
+                continue
+
+            lines = piece.split(b"\n", 2)
+            if len(lines) < 3:
+                raise fallback(f"Block with fewer than 3 lines: {piece!r}")
+
+            block_timecode = parse_timecode_line(lines[1])
+            if block_timecode is None:
+                warnings.warn(f"Warning: timecode is malformed {lines[1].decode()}. Removing subtitle entry.")
+                counts["blocks_malformed"] += 1
+                continue
+
+            counts["blocks_read"] += 1
+            yield (block_timecode, lines[2])
+
+    for chunk in iter_chunks(stream, chunk_size):
+        chunk = held_back + chunk
+        # Blank lines at the end of the chunk may be the end of the file, so the block before them is held back too
+        cut = chunk.rstrip(b"\n").rfind(b"\n\n")
+        if cut < 0:
+            held_back = chunk
+            continue
+
+        held_back = chunk[cut + 2:]
+        yield from blocks(SEPARATOR.split(chunk[:cut]))
+
+    yield from blocks([held_back.rstrip()])
+
+def iter_retimed(blocks, retimer):
+    """Retime blocks in batches, yielding those that still end after 0:00. Raises fallback if they go out of order."""
+    previous_start = -1
+    batch = []
+
+    def retime(batch):
+        nonlocal previous_start
+        for subtitle in retimer.apply(batch):
+            if subtitle[0].start_ms < previous_start:
+                raise fallback("Subtitles are out of order.")
+            previous_start = subtitle[0].start_ms
+            yield subtitle
+
+    for subtitle in blocks:
+        batch.append(subtitle)
+        if len(batch) >= RETIME_BATCH:
+            yield from retime(batch)
+            batch = []
+
+    yield from retime(batch)
+
+def retime_file(input_file, output_file, retimer, policy=TRIM):
+    """Retime an SRT file into output_file at the byte level. Returns the blocks read and dropped as malformed,
+    as statistics for Cleaner.count.
+
+    Raises fallback, possibly after part of output_file has been written, if the file needs the full parser.
+    """
+    counts = collections.Counter()
+
+    with open(input_file, 'rb') as input_stream, open(output_file, 'wb') as output_stream:
+        subtitles = iter_resolve_overlaps(iter_retimed(iter_raw_blocks(input_stream, counts), retimer), policy)
+
+        for i, (timecode, text) in enumerate(subtitles, 1):
+            # Blocks are separated by blank lines, with no trailing newline after the last block
+            block = b"%s%d\n%s\n%s" % (b"\n\n" if i > 1 else b"", i, timecode.to_bytes(), text)
+            output_stream.write(block if NEWLINE == b"\n" else block.replace(b"\n", NEWLINE))
+
+    return counts
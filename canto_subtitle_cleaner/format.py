@@ -1,11 +1,22 @@
 """Formats subtitles to ensure proper line breaks and spacing."""
 
 import re
+import sys
 from datetime import datetime
-import pycantonese
 import warnings
 import math
-from canto_subtitle_cleaner.parse import is_punctuation, is_non_chinese, RE_DELIMITING_PUNCTUATION
+from canto_subtitle_cleaner.charclass import classify, is_ascii, DELIMITING, PUNCTUATION
+
+# Print a progress message in a single write, so that messages from threads cleaning lines at the same
+# time are never interleaved. sys.stdout is looked up on every call, so redirect_stdout still captures it.
+def report(message):
+    sys.stdout.write(message + "\n")
+
+# pycantonese takes longer to import than the rest of the package, so it is imported on the first
+# ambiguous line break: runs that never need one, like --help or --no_clean, never load it
+def segment(text):
+    import pycantonese
+    return pycantonese.segment(text)
 
 def linebreak(text, line_max_length=21):
     if '\n' in text:
@@ -20,25 +31,26 @@ def linebreak(text, line_max_length=21):
     firstline_min_length = max(length // 4, 4)
     firstline_max_length = min(length // 2, line_max_length - 1)
     firstline_extended_length = min(length // 4 * 3, line_max_length - 3)
+    classes = classify(text)
 
     # If possible, split after delimiting punctuation in the first half the line
     for i in range(firstline_max_length, firstline_min_length - 1, -1):
-        if re.match(RE_DELIMITING_PUNCTUATION, text[i]):
+        if classes[i] & DELIMITING:
             return text[:i + 1] + '\n' + text[i + 1:]
         
     # Otherwise, split after delimiting punctuation in the second half of the line
     for i in range(firstline_max_length, firstline_extended_length + 1):
-        if re.match(RE_DELIMITING_PUNCTUATION, text[i]):
+        if classes[i] & DELIMITING:
             return text[:i + 1] + '\n' + text[i + 1:]
 
     # Otherwise, split at the first non-punctuation chinese character that's not in the middle of a word
     for i in range(firstline_max_length, firstline_min_length - 1, -1):
         
-        if is_punctuation(text[i]):
+        if classes[i] & PUNCTUATION:
             return text[:i + 1] + '\n' + text[i + 1:]
         
-        if (len(pycantonese.segment(text[i:i + 2])) == 1):
-            print(f"Skipping line break at char {i} because it is in the middle of a word: {text[i:i + 2]}")
+        if (len(segment(text[i:i + 2])) == 1):
+            report(f"Skipping line break at char {i} because it is in the middle of a word: {text[i:i + 2]}")
             continue
             
         return text[:i + 1] + '\n' + text[i + 1:] 
@@ -47,6 +59,10 @@ def linebreak(text, line_max_length=21):
     warnings.warn(f"No suitable line break found for line in line {text}.")
     return text
     
+def warm_up():
+    """Load the pycantonese segmenter, which is otherwise loaded on the first ambiguous line break."""
+    segment("你好")
+
 def final_step(text):
     # Step 6: Remove trailing fullwidth commas
     text = re.sub(r'，$', '', text)
@@ -54,45 +70,39 @@ def final_step(text):
 
     return text
 
-# Fix subtitles that incorrectly broken across 2 different subtitles
-def adjust_subtitle_breaks(subtitle_list):
+# Fix subtitles that incorrectly broken across 2 different subtitles.
+# count, e.g. Cleaner.count, is called with "chars_pulled_back" for every character moved to the previous subtitle.
+def adjust_subtitle_breaks(subtitle_list, count=None):
     OMIT_CHARS = {"噉", "喂", "噢", "嗯", "哦", "好", "吓", "哼", "嘩", "係", "吼"}
     prev_text = None
 
     for i, (timecode, text) in enumerate(subtitle_list):
         if prev_text and text:
             # If final character of previous is not a Chinese letter, skip
-            if re.match(r'[\x00-\x7F]', prev_text[-1]):
+            if is_ascii(prev_text[-1]):
                 prev_text = text
                 prev_timecode = timecode
                 continue
 
-            match = re.match(r'^([^\x00-\x7F])[，]|^([^\x00-\x7F])[？]', text)
-            
-            if match:
-                if match.group(1):
-                    char = match.group(1)
-                    question_mark = ""
-
-                if match.group(2):
-                    char = match.group(2)
-                    question_mark = "？"
-                
-                if not char:
-                    raise ValueError("Error: beginning of line was matched, but no matching character was set.")
+            # A single non-ASCII character followed by a comma or question mark
+            if len(text) > 1 and not is_ascii(text[0]) and text[1] in ("，", "？"):
+                char = text[0]
+                question_mark = "？" if text[1] == "？" else ""
 
                 delta_ms = timecode - prev_timecode
 
                 if delta_ms < 1000 and char not in OMIT_CHARS:
                     subtitle_list[i - 1] = (prev_timecode, prev_text + char + question_mark)
                     
-                    print(f"============ Subtitle break: Pulling back char {char} from line {i}. ============")
-                    print(f"End of previous line at {prev_timecode.end}; start of current at {timecode.start}; delta {int(delta_ms)}ms")
-                    print(f"({repr(prev_text)} {repr(text)}) -> ({repr(prev_text + char + question_mark)} {repr(text[len(char + question_mark) + 1:])})")
-                    print("============================================================================")
+                    report(f"============ Subtitle break: Pulling back char {char} from line {i}. ============\n"
+                           f"End of previous line at {prev_timecode.end}; start of current at {timecode.start}; delta {int(delta_ms)}ms\n"
+                           f"({repr(prev_text)} {repr(text)}) -> ({repr(prev_text + char + question_mark)} {repr(text[len(char + question_mark) + 1:])})\n"
+                           "============================================================================")
                     
                     text = text[len(char + question_mark) + 1:]
                     subtitle_list[i] = (timecode, text)
+                    if count:
+                        count("chars_pulled_back")
 
         prev_text = text
         prev_timecode = timecode
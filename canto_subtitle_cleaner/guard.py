@@ -0,0 +1,122 @@
+"""Guard against rules that go super-linear on long lines.
+
+The rules are audited statically when this module is imported. A rule is risky when:
+    exponential     an unbounded repeat contains another unbounded repeat, e.g. (a+)+
+    backreference   a backreference refers to a group of variable length, e.g. ([一-鿿]{2,})\\1+
+    quadratic       an unanchored unbounded repeat must be followed by more text, e.g. 係([^，？]*?)前,
+                    so every start position can scan to the end of the line before failing
+
+SAFE_STAGES are the cleaning stages with their risky rules left out, for lines that are too long or
+that go over the per-line time budget of a Cleaner.
+"""
+
+import canto_subtitle_cleaner.clean as clean
+from canto_subtitle_cleaner.clean import CLEAN_STAGES, resub
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:     # Python < 3.11
+    import sre_parse, sre_constants
+
+EXPONENTIAL = "exponential"
+BACKREFERENCE = "backreference"
+QUADRATIC = "quadratic"
+
+REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+ANCHORS = (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)
+
+def iter_items(items):
+    """Yield every (op, av) in a parsed pattern, depth first."""
+    for op, av in items:
+        yield op, av
+
+        if op in REPEATS:
+            yield from iter_items(av[2])
+        elif op is sre_constants.SUBPATTERN:
+            yield from iter_items(av[-1])
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                yield from iter_items(branch)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            yield from iter_items(av[1])
+
+def is_unbounded(op, av):
+    return op in REPEATS and av[1] == sre_constants.MAXREPEAT
+
+def has_unbounded_repeat(items):
+    return any(is_unbounded(op, av) for op, av in iter_items(items))
+
+def audit_pattern(pattern):
+    """Return (risk, reason) for a compiled or source pattern, or None if it matches in linear time."""
+    source = getattr(pattern, "pattern", pattern)
+    parsed = sre_parse.parse(source)
+    items = list(parsed)
+
+    for op, av in iter_items(items):
+        if is_unbounded(op, av) and has_unbounded_repeat(av[2]):
+            return EXPONENTIAL, "an unbounded repeat contains another unbounded repeat"
+
+    groups = {}
+    for op, av in iter_items(items):
+        if op is sre_constants.SUBPATTERN and av[0] is not None:
+            groups[av[0]] = av[-1]
+    for op, av in iter_items(items):
+        if op is sre_constants.GROUPREF:
+            low, high = sre_parse.SubPattern(parsed.state, groups[av]).getwidth()
+            if low != high:
+                return BACKREFERENCE, f"a backreference to group {av} of variable length"
+
+    anchored = items and items[0][0] is sre_constants.AT and items[0][1] in ANCHORS
+    if not anchored:
+        for i, (op, av) in enumerate(items):
+            if has_unbounded_repeat([(op, av)]) and sre_parse.SubPattern(parsed.state, items[i + 1:]).getwidth()[0] > 0:
+                return QUADRATIC, "an unanchored unbounded repeat is followed by required text"
+
+    return None
+
+def rule_tables():
+    """The rule tables of the cleaning stages, as {name: rules}, in module order."""
+    return {name: value for name, value in vars(clean).items() if name.endswith("_RULES")}
+
+def audit_rules():
+    """Return (table name, index, pattern, risk, reason) for every risky rule."""
+    findings = []
+
+    for name, rules in rule_tables().items():
+        for index, (pattern, repl) in enumerate(rules):
+            risk = audit_pattern(pattern)
+            if risk:
+                findings.append((name, index, pattern.pattern, *risk))
+
+    return findings
+
+def format_audit(findings):
+    lines = [f"{len(findings)} risky rules:"]
+    for name, index, pattern, risk, reason in findings:
+        lines.append(f"  {name}[{index}] {pattern}\n      {risk}: {reason}")
+
+    return "\n".join(lines)
+
+def stage_tables(stage):
+    """The names of the rule tables a stage applies, in the order it first refers to them."""
+    return [name for name in stage.__code__.co_names if name.endswith("_RULES")]
+
+def safe_stage(stage, risky):
+    """The stage itself if none of its rule tables has a risky rule. Otherwise a stage that only
+    applies its tables' safe rules, in order, skipping any other logic in the stage."""
+    tables = [getattr(clean, name) for name in stage_tables(stage)]
+    if not any(id(pattern) in risky for table in tables for pattern, repl in table):
+        return stage
+
+    safe_tables = [[(pattern, repl) for pattern, repl in table if id(pattern) not in risky] for table in tables]
+
+    def run_safe_rules(text):
+        for table in safe_tables:
+            text = resub(text, table)
+        return text
+
+    run_safe_rules.__name__ = stage.__name__
+    return run_safe_rules
+
+RISKY_PATTERNS = {id(pattern) for rules in rule_tables().values() for pattern, repl in rules if audit_pattern(pattern)}
+SAFE_STAGES = [safe_stage(stage, RISKY_PATTERNS) for stage in CLEAN_STAGES]
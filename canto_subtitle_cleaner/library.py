@@ -0,0 +1,132 @@
+"""Helper functions for scanning a subtitle library and tracking which files are already cleaned."""
+
+import os
+import json
+import fnmatch
+import hashlib
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# Subtitle files picked up by default, plain or compressed
+SUBTITLE_PATTERNS = ["*.srt", "*.srt.gz", "*.srt.bz2", "*.srt.xz"]
+
+# Manifest fields that must all match for a file to be skipped
+MANIFEST_KEY_FIELDS = ("hash", "ruleset", "options", "output")
+
+def matches_any(relative_path, patterns):
+    """Check a path against glob patterns. Patterns without a slash match the file name only."""
+    name = relative_path.rsplit('/', 1)[-1]
+
+    for pattern in patterns:
+        if fnmatch.fnmatch(relative_path if '/' in pattern else name, pattern):
+            return True
+
+    return False
+
+def find_srt_files(input_directory, recursive=False, include=None, exclude=None):
+    """Return the sorted relative paths (with '/' separators) of subtitle files in a directory."""
+    include = include or SUBTITLE_PATTERNS
+    exclude = exclude or []
+    found = []
+
+    for root, dirs, files in os.walk(input_directory):
+        dirs.sort()
+        relative_root = os.path.relpath(root, input_directory).replace(os.sep, '/')
+
+        for name in files:
+            relative_path = name if relative_root == '.' else f"{relative_root}/{name}"
+            if matches_any(relative_path, include) and not matches_any(relative_path, exclude):
+                found.append(relative_path)
+
+        if not recursive:
+            break
+
+    return sorted(found)
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+_ruleset_version = None
+
+def ruleset_version():
+    """Return a short hash of the package's modules, so that any change to the rules or to how they are
+    applied invalidates old results.
+
+    Every module is hashed: the output depends on most of them (the rules, the character classes,
+    the safe fallbacks, timecodes, overlaps and writers), and a list would fall behind as code moves.
+    """
+    global _ruleset_version
+
+    if _ruleset_version is None:
+        digest = hashlib.sha256()
+        package_directory = os.path.dirname(os.path.abspath(__file__))
+
+        for module in sorted(name for name in os.listdir(package_directory) if name.endswith(".py")):
+            digest.update(module.encode('utf-8'))
+            with open(os.path.join(package_directory, module), 'rb') as f:
+                digest.update(f.read())
+
+        _ruleset_version = digest.hexdigest()[:16]
+
+    return _ruleset_version
+
+class manifest:
+    """A JSON record of input hash, rule-set version, options and output path for each processed file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("files", {})
+
+    def input_hash(self, key, path):
+        """Return the hash of an input file, reusing the recorded hash if its size and mtime are unchanged."""
+        stat = os.stat(path)
+        recorded = self.entries.get(key, {})
+
+        if recorded.get("size") == stat.st_size and recorded.get("mtime_ns") == stat.st_mtime_ns:
+            return recorded["hash"]
+
+        return file_hash(path)
+
+    def entry(self, path, input_hash, output_path, options):
+        stat = os.stat(path)
+
+        return {
+            "hash": input_hash,
+            "ruleset": ruleset_version(),
+            "options": options,
+            "output": output_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def is_up_to_date(self, key, entry):
+        """A file can be skipped when its content, rules, options and output path are unchanged and the output still exists."""
+        recorded = self.entries.get(key)
+
+        if not recorded:
+            return False
+
+        return all(recorded.get(field) == entry[field] for field in MANIFEST_KEY_FIELDS) and os.path.exists(entry["output"])
+
+    def update(self, key, entry):
+        self.entries[key] = entry
+
+    def save(self):
+        """Write the manifest atomically, so an interrupted run never leaves a truncated file."""
+        temp_path = self.path + ".tmp"
+
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.entries}, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+        os.replace(temp_path, self.path)
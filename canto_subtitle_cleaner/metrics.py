@@ -0,0 +1,180 @@
+"""Export a cleaner's counters and stage latencies, for capacity planning and spotting throughput regressions.
+
+Exports:
+    Prometheus text format, for a scrape endpoint (GET /metrics with --serve) or a textfile collector (*.prom)
+    JSON snapshots, overwritten (*.json) or appended one per line (*.jsonl)
+
+Latencies are kept as histograms per stage: every cleaning stage per line, the track stages per
+track, and "file" per file. Counters come from the cleaner's statistics.
+"""
+
+import os
+import json
+import time
+import bisect
+import threading
+import contextlib
+
+PREFIX = "canto_subtitle_cleaner"
+METRICS_INTERVAL = 60   # Seconds between snapshots in long-running modes
+
+# Upper bounds in seconds: per-line stages take microseconds, whole files up to seconds
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+# Statistic -> (metric name, labels, help)
+COUNTERS = {
+    "files": ("files_total", "", "Files cleaned."),
+    "blocks_read": ("blocks_read_total", "", "Subtitle blocks read."),
+    "blocks_dropped": ("blocks_dropped_total", 'reason="empty"', "Subtitle blocks dropped."),
+    "blocks_malformed": ("blocks_dropped_total", 'reason="malformed"', "Subtitle blocks dropped."),
+    "chars_pulled_back": ("chars_pulled_back_total", "", "Characters pulled back into the previous subtitle by adjust_subtitle_breaks."),
+    "linebreak_fallbacks": ("linebreak_fallbacks_total", "", "Cleaned lines with no suitable line break."),
+    "safe_fallbacks": ("safe_fallbacks_total", "", "Lines cleaned with the safe rules only."),
+    "byte_fallbacks": ("byte_fallbacks_total", "", "Files retimed with the full parser because of an unusual layout."),
+    "cache_hits": ("cache_hits_total", "", "Lines found in the cache."),
+    "cache_misses": ("cache_misses_total", "", "Lines cleaned because they were not in the cache."),
+}
+
+class stage_latencies:
+    """Latency histograms per stage. Stages may be observed from several threads."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}    # stage -> [count per bucket, with +Inf last; sum of seconds]
+        self.lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][i] += 1
+            histogram[1] += seconds
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe_steps(self, steps):
+        """Pass (stage name, text) pairs from iter_clean_subtitle through, observing the time of each step."""
+        start = time.perf_counter()
+
+        for name, text in steps:
+            now = time.perf_counter()
+            self.observe(name, now - start)
+            yield name, text
+            start = time.perf_counter()
+
+    def drain(self):
+        """Return and forget everything observed so far, e.g. to send it from a worker to its parent."""
+        with self.lock:
+            drained = self.histograms
+            self.histograms = {}
+        return drained
+
+    def merge(self, drained):
+        with self.lock:
+            for name, (counts, seconds) in drained.items():
+                histogram = self.histograms.setdefault(name, [[0] * (len(self.buckets) + 1), 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += seconds
+
+    def snapshot(self):
+        with self.lock:
+            return {name: ([*counts], seconds) for name, (counts, seconds) in self.histograms.items()}
+
+def cache_hit_rate(stats):
+    lookups = stats["cache_hits"] + stats["cache_misses"]
+    return stats["cache_hits"] / lookups if lookups else 0.0
+
+def snapshot(cleaner):
+    """The cleaner's counters and stage latencies as a JSON-serialisable dict."""
+    with cleaner.lock:
+        stats = dict(cleaner.stats)
+        cache_entries = len(cleaner.cache)
+    counters = {name: stats.get(name, 0) for name in COUNTERS}
+
+    stages = {}
+    if cleaner.latencies:
+        buckets = [*cleaner.latencies.buckets, "+Inf"]
+        for name, (counts, seconds) in sorted(cleaner.latencies.snapshot().items()):
+            stages[name] = {"count": sum(counts), "sum_seconds": round(seconds, 6),
+                            "buckets": {str(le): count for le, count in zip(buckets, counts)}}
+
+    return {"time": round(time.time(), 3), "pid": os.getpid(), "counters": counters,
+            "cache_hit_rate": round(cache_hit_rate(counters), 6), "cache_entries": cache_entries, "stages": stages}
+
+def prometheus_text(cleaner):
+    """The cleaner's counters and stage latencies in Prometheus text exposition format."""
+    data = snapshot(cleaner)
+    lines = []
+    described = set()
+
+    for name, (metric, labels, help) in COUNTERS.items():
+        if metric not in described:
+            lines.append(f"# HELP {PREFIX}_{metric} {help}")
+            lines.append(f"# TYPE {PREFIX}_{metric} counter")
+            described.add(metric)
+        lines.append(f"{PREFIX}_{metric}{{{labels}}} {data['counters'][name]}" if labels else f"{PREFIX}_{metric} {data['counters'][name]}")
+
+    lines.append(f"# HELP {PREFIX}_cache_hit_ratio Share of line lookups found in the cache.")
+    lines.append(f"# TYPE {PREFIX}_cache_hit_ratio gauge")
+    lines.append(f"{PREFIX}_cache_hit_ratio {data['cache_hit_rate']}")
+    lines.append(f"# HELP {PREFIX}_cache_entries Lines in the cache.")
+    lines.append(f"# TYPE {PREFIX}_cache_entries gauge")
+    lines.append(f"{PREFIX}_cache_entries {data['cache_entries']}")
+
+    if data["stages"]:
+        lines.append(f"# HELP {PREFIX}_stage_seconds Time spent in each stage, per line, track or file.")
+        lines.append(f"# TYPE {PREFIX}_stage_seconds histogram")
+    for name, stage in data["stages"].items():
+        # Prometheus buckets are cumulative
+        cumulative = 0
+        for le, count in stage["buckets"].items():
+            cumulative += count
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {stage["sum_seconds"]}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+
+    return "\n".join(lines) + "\n"
+
+def write_metrics(cleaner, path):
+    """Write the cleaner's metrics to path: *.json is overwritten with a snapshot, *.jsonl gets a snapshot
+    appended, and anything else (e.g. *.prom) is overwritten in Prometheus text format."""
+    if path.endswith(".jsonl"):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot(cleaner), ensure_ascii=False) + "\n")
+        return
+
+    text = json.dumps(snapshot(cleaner), ensure_ascii=False, indent=2) if path.endswith(".json") else prometheus_text(cleaner)
+
+    # Replace the file in one step, so that a collector never reads a half-written file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+
+class metrics_writer:
+    """Write a cleaner's metrics to a file every `interval` seconds, and once more when closed."""
+
+    def __init__(self, cleaner, path, interval=METRICS_INTERVAL):
+        self.cleaner = cleaner
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics_writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            write_metrics(self.cleaner, self.path)
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        write_metrics(self.cleaner, self.path)
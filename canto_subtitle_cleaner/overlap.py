@@ -0,0 +1,109 @@
+"""Resolve overlapping subtitles on integer millisecond times.
+
+Policies, for a block that starts before the previous one ends:
+    trim        end the previous block 1ms before the next starts (the original clean_timecodes behaviour),
+                or merge them if that would leave the previous block no duration
+    merge       combine both blocks into one, spanning both, with their texts on separate lines
+    shift       delay the next block to start 1ms after the previous one ends, keeping its duration
+    readable    trim, but merge instead when that would leave the previous block under MIN_DURATION_MS;
+                a merged block keeps its extent, and a later block starts after it or joins it
+
+Chains of overlaps are resolved in the same sweep, since each block is compared with the already
+resolved block before it.
+"""
+
+import warnings
+
+TRIM = "trim"
+MERGE = "merge"
+SHIFT = "shift"
+READABLE = "readable"
+POLICIES = (TRIM, MERGE, SHIFT, READABLE)
+MIN_DURATION_MS = 500   # Shortest block that readable leaves; a block that trimming would leave shorter is merged instead
+
+def sort_by_start(subtitle_list):
+    """Return the track stably sorted by start time, or the same list if it is already in order."""
+    starts = [timecode.start_ms for timecode, text in subtitle_list]
+
+    if all(a <= b for a, b in zip(starts, starts[1:])):
+        return subtitle_list
+
+    warnings.warn("Subtitles are out of order. Sorting them by start time.")
+    order = sorted(range(len(starts)), key=starts.__getitem__)
+    return [subtitle_list[i] for i in order]
+
+class overlap_resolver:
+    """Resolve the overlaps of a track sorted by start time, one block at a time.
+
+    Each block is held back until the next one has been read, since the next one can still change
+    it. With trim, a block is merged with the next one when trimming would leave it no duration. With
+    readable, it is merged when trimming would leave it shorter than MIN_DURATION_MS, and a merged
+    block keeps its extent: a later block that overlaps it starts after it if it is still at least
+    MIN_DURATION_MS long then, and is merged into it otherwise.
+    """
+
+    def __init__(self, policy=TRIM):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overlap policy: {policy}. Use one of {', '.join(POLICIES)}.")
+
+        self.policy = policy
+        # Shortest block that trimming may leave
+        self.min_duration_ms = MIN_DURATION_MS if policy == READABLE else 1
+        self.pending = None     # (timecode, text, merged) of the block held back
+
+    def add(self, timecode, text):
+        """Add the next block. Returns the blocks it resolved: the one held back, or none if the two were merged."""
+        if self.pending is None:
+            self.pending = (timecode, text, False)
+            return []
+
+        pending_timecode, pending_text, merged = self.pending
+        pending_end = pending_timecode.end_ms
+        start = timecode.start_ms
+        end = timecode.end_ms
+
+        if pending_end > start:
+            if self.policy == SHIFT:
+                timecode.start_ms = pending_end + 1
+                timecode.end_ms = pending_end + 1 + (end - start)
+            elif self.policy == READABLE and merged:
+                if end - (pending_end + 1) < self.min_duration_ms:
+                    return self._merge(timecode, text)
+                timecode.start_ms = pending_end + 1
+            elif self.policy in (TRIM, READABLE) and start - 1 - pending_timecode.start_ms >= self.min_duration_ms:
+                pending_timecode.end_ms = start - 1
+            else:
+                return self._merge(timecode, text)
+
+        self.pending = (timecode, text, False)
+        return [(pending_timecode, pending_text)]
+
+    def _merge(self, timecode, text):
+        pending_timecode, pending_text, merged = self.pending
+        if timecode.end_ms > pending_timecode.end_ms:
+            pending_timecode.end_ms = timecode.end_ms
+
+        # Texts are bytes on the byte-level --no_clean path
+        self.pending = (pending_timecode, pending_text + ("\n" if isinstance(text, str) else b"\n") + text, True)
+        return []
+
+    def flush(self):
+        """Return the block held back, at the end of the track."""
+        pending, self.pending = self.pending, None
+        return [pending[:2]] if pending is not None else []
+
+def iter_resolve_overlaps(subtitles, policy=TRIM):
+    """Yield (timecode, text) with overlaps resolved, each block as soon as the next one has been read.
+
+    The input must be sorted by start time. See overlap_resolver for how each policy resolves an overlap.
+    """
+    resolver = overlap_resolver(policy)
+
+    for timecode, text in subtitles:
+        yield from resolver.add(timecode, text)
+
+    yield from resolver.flush()
+
+def resolve_overlaps(subtitle_list, policy=TRIM):
+    """Sort a track by start time if needed and resolve its overlaps, returning the new list."""
+    return list(iter_resolve_overlaps(sort_by_start(subtitle_list), policy))
@@ -1,8 +1,7 @@
 """Helper functions for parsing and pattern recognition on a single line of Cantonese."""
 import re
-
-# List of characters that may be used alone to start a sentence before a comma
-STANDALONE_START_CHARS = {"噉", "喂", "噢", "嗯", "哦", "嗱", "係", "好", "嘩"}
+# Character predicates are table lookups, shared with the formatter
+from canto_subtitle_cleaner.charclass import STANDALONE_START_CHARS, is_non_chinese, is_punctuation
 
 # Punctuation characters that break lines into independent segments
 RE_DELIMITING_PUNCTUATION = re.compile(r'([，？！…。：；]+)')
@@ -29,10 +28,4 @@ def is_question(segment):
         if re.search(RE_QUESTION_PAT, segment) or any(word in segment for word in QUESTION_WORDS):
             return True 
     
-    return False
-
-def is_non_chinese(char):
-    return re.match(r'[A-Za-z\d]', char)
-
-def is_punctuation(char):
-    return re.match(r'[，？！…：；\s\-]', char)
\ No newline at end of file
+    return False
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Retime whole tracks at once: signed offsets, linear scaling, frame-rate conversion and sync points.
+
+Times are handled as integer milliseconds in arrays, so a retiming is one pass over the track
+instead of datetime arithmetic per block.
+"""
+
+import re
+import bisect
+from array import array
+from datetime import datetime, timedelta
+
+TIME_ZERO = datetime.strptime('00:00:00', '%H:%M:%S')
+RE_TIME = re.compile(r'^(-)?(?:(\d+):)?(?:(\d+):)?(\d+)(?:[,.](\d{1,3}))?$')
+
+def parse_time_ms(text):
+    """Parse "[-][HH:][MM:]SS[,mmm]" into signed milliseconds."""
+    match = RE_TIME.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid time format: {text}. Use [-]HH:MM:SS,ms.")
+
+    sign, first, second, seconds, fraction = match.groups()
+    # With a single colon the fields are MM:SS
+    hours, minutes = (first, second) if second is not None else (None, first)
+    ms = ((int(hours or 0) * 60 + int(minutes or 0)) * 60 + int(seconds)) * 1000 + int((fraction or "0").ljust(3, "0"))
+
+    return -ms if sign else ms
+
+def to_ms(value):
+    """Convert an offset given as milliseconds, a time string or a datetime after 00:00:00 into milliseconds."""
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return round(value)
+    if isinstance(value, str):
+        return parse_time_ms(value)
+
+    return (value - TIME_ZERO) // timedelta(milliseconds=1)
+
+def parse_fps(text):
+    """Parse "<from>:<to>" frame rates, e.g. "25:23.976", into the time scale that converts between them."""
+    try:
+        source, target = (float(fps) for fps in text.split(":"))
+    except ValueError:
+        raise ValueError(f"Invalid frame rates: {text}. Use <from>:<to>, e.g. 25:23.976.")
+
+    if source <= 0 or target <= 0:
+        raise ValueError(f"Invalid frame rates: {text}. Frame rates must be positive.")
+
+    # A track timed for a 25fps master runs 25/23.976 times longer on a 23.976fps master
+    return source / target
+
+def parse_anchor(text):
+    """Parse a sync point "<time in input>=<time in output>" into a pair of milliseconds."""
+    source, separator, target = text.partition("=")
+    if not separator:
+        raise ValueError(f"Invalid sync point: {text}. Use <input time>=<output time>.")
+
+    return (parse_time_ms(source), parse_time_ms(target))
+
+def track_times(subtitle_list):
+    """Return the start and end times of a track as two arrays of milliseconds."""
+    starts = array('q', [timecode.start_ms for timecode, text in subtitle_list])
+    ends = array('q', [timecode.end_ms for timecode, text in subtitle_list])
+    return starts, ends
+
+class retimer:
+    """A mapping of subtitle times: t -> sync(t) * scale + offset, with duration_ms added to end times.
+
+    sync is the piecewise linear map through the anchor points, extended past the first and last
+    anchors with the slope of the nearest segment. With a single anchor it is a plain shift.
+    """
+
+    def __init__(self, offset_ms=0, scale=1.0, anchors=None, duration_ms=0):
+        self.offset_ms = offset_ms
+        self.scale = scale
+        self.anchors = sorted(anchors or [])
+        self.duration_ms = duration_ms
+
+        if scale <= 0:
+            raise ValueError("Time scale must be positive.")
+
+        for (source, target), (next_source, next_target) in zip(self.anchors, self.anchors[1:]):
+            if next_source == source or next_target <= target:
+                raise ValueError("Sync points must be in increasing order in both input and output times.")
+
+    def __repr__(self):
+        return f"retimer(offset_ms={self.offset_ms}, scale={self.scale}, anchors={self.anchors}, duration_ms={self.duration_ms})"
+
+    def __eq__(self, other):
+        return isinstance(other, retimer) and repr(self) == repr(other)
+
+    def is_identity(self):
+        return not self.offset_ms and self.scale == 1 and not self.anchors and not self.duration_ms
+
+    def map_times(self, times):
+        """Map an array of millisecond times in one pass, returning a new array."""
+        offset = self.offset_ms
+
+        if self.anchors:
+            times = self._sync(times)
+
+        if self.scale != 1:
+            scale = self.scale
+            return array('q', [round(t * scale) + offset for t in times])
+
+        return array('q', [t + offset for t in times])
+
+    def _sync(self, times):
+        anchors = self.anchors
+        if len(anchors) == 1:
+            shift = anchors[0][1] - anchors[0][0]
+            return array('q', [t + shift for t in times])
+
+        sources = [source for source, target in anchors]
+        # Slope and intercept of each segment, with the outer segments extended to the ends of the track
+        segments = []
+        for (source, target), (next_source, next_target) in zip(anchors, anchors[1:]):
+            slope = (next_target - target) / (next_source - source)
+            segments.append((slope, target - source * slope))
+        segments = [segments[0]] + segments + [segments[-1]]
+
+        mapped = array('q')
+        for t in times:
+            slope, intercept = segments[bisect.bisect_right(sources, t)]
+            mapped.append(round(t * slope + intercept))
+        return mapped
+
+    def apply(self, subtitle_list):
+        """Retime a list of (timecode, text) in place, returning the blocks that still end after 0:00.
+
+        Blocks that would start before 0:00 are clamped to start there.
+        """
+        if self.is_identity() or not subtitle_list:
+            return subtitle_list
+
+        starts, ends = track_times(subtitle_list)
+        starts = self.map_times(starts)
+        ends = self.map_times(ends)
+        duration = self.duration_ms
+        retimed = []
+
+        for (timecode, text), start, end in zip(subtitle_list, starts, ends):
+            end += duration
+            if end <= 0:
+                continue
+
+            timecode.start_ms = max(start, 0)
+            timecode.end_ms = end
+            retimed.append((timecode, text))
+
+        return retimed
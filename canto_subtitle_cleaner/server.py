@@ -0,0 +1,242 @@
+"""A local HTTP service for cleaning subtitles without starting a new process for each call.
+
+Endpoints:
+    POST /clean/line    {"text": "..."}         -> {"text": "..."}
+    POST /clean/lines   {"lines": ["...", ...]} -> {"lines": ["...", ...]}
+    POST /clean/srt     SRT text                 -> cleaned SRT text
+    GET  /stats         request counts, batching and latency percentiles
+    GET  /metrics       counters and stage latency histograms in Prometheus text format
+    GET  /health        "ok"
+
+Listen on "[host:]port" for TCP or "unix:/path/to.sock" for a Unix socket.
+"""
+
+import os
+import json
+import stat
+import math
+import time
+import queue
+import traceback
+import threading
+import collections
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from canto_subtitle_cleaner.cleaner import Cleaner
+from canto_subtitle_cleaner.metrics import prometheus_text
+
+LATENCY_WINDOW = 10000      # Most recent requests used for latency percentiles
+PERCENTILES = (50, 90, 99)
+
+class line_batcher:
+    """Clean lines from concurrent requests on a single thread.
+
+    Requests that arrive while a batch is being cleaned are coalesced into the next batch, so
+    idle requests are never delayed and busy periods don't fight over the GIL. The distinct lines of
+    a batch are cleaned with a single clean_lines call and handed back to each request.
+    """
+
+    def __init__(self, cleaner):
+        self.cleaner = cleaner
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.lines = 0
+        self.thread = threading.Thread(target=self._run, name="line_batcher", daemon=True)
+        self.thread.start()
+
+    def clean(self, lines):
+        """Clean a list of lines, blocking until the batch containing them is done."""
+        job = {"lines": list(lines), "done": threading.Event()}
+        self.queue.put(job)
+        job["done"].wait()
+
+        if "error" in job:
+            raise job["error"]
+
+        return job["result"]
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            jobs = [self.queue.get()]
+
+            # Take everything else that is already waiting
+            while True:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in jobs
+            jobs = [job for job in jobs if job is not None]
+            if stop and not jobs:
+                return
+
+            self.batches += 1
+            batch = []
+            for job in jobs:
+                if all(isinstance(line, str) for line in job["lines"]):
+                    batch.append(job)
+                else:
+                    job["error"] = TypeError("Lines must be strings.")
+
+            # One clean_lines call for the whole batch; a line asked for by several requests is cleaned once
+            distinct = list(dict.fromkeys(line for job in batch for line in job["lines"]))
+            try:
+                cleaned_lines = dict(zip(distinct, self.cleaner.clean_lines(distinct)))
+                for job in batch:
+                    job["result"] = [cleaned_lines[line] for line in job["lines"]]
+                    self.lines += len(job["lines"])
+            except Exception as e:
+                for job in batch:
+                    job["error"] = e
+
+            for job in jobs:
+                job["done"].set()
+
+            if stop:
+                return
+
+class latency_stats:
+    """Request counts and latency percentiles per endpoint over a sliding window."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.window = window
+        self.counts = collections.Counter()
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            self.counts[endpoint] += 1
+            self.latencies[endpoint].append(seconds)
+
+    def summary(self):
+        with self.lock:
+            snapshot = {endpoint: sorted(latencies) for endpoint, latencies in self.latencies.items()}
+            counts = dict(self.counts)
+
+        summary = {}
+        for endpoint, latencies in snapshot.items():
+            summary[endpoint] = {"count": counts[endpoint]}
+            for p in PERCENTILES:
+                # Nearest-rank percentile, in milliseconds
+                summary[endpoint][f"p{p}_ms"] = round(latencies[max(math.ceil(p / 100 * len(latencies)) - 1, 0)] * 1000, 3)
+
+        return summary
+
+def clean_srt_text(content, batcher):
+    """Clean the contents of an SRT file, as text or UTF-8 bytes, the same way as process_file, and return the new contents."""
+    return batcher.cleaner.clean_srt(content, clean_lines=batcher.clean)
+
+class request_handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep connections open between requests
+
+    def do_GET(self):
+        if self.path == "/stats":
+            stats = {
+                "requests": self.server.stats.summary(),
+                "batches": self.server.batcher.batches,
+                "lines": self.server.batcher.lines,
+                "cache": {"hits": self.server.batcher.cleaner.stats["cache_hits"],
+                          "misses": self.server.batcher.cleaner.stats["cache_misses"],
+                          "size": len(self.server.batcher.cleaner.cache)},
+            }
+            self._send(200, json.dumps(stats, ensure_ascii=False), "application/json")
+        elif self.path == "/metrics":
+            self._send(200, prometheus_text(self.server.batcher.cleaner), "text/plain; version=0.0.4")
+        elif self.path == "/health":
+            self._send(200, "ok", "text/plain")
+        else:
+            self._send(404, json.dumps({"error": f"Unknown endpoint {self.path}"}), "application/json")
+
+    def do_POST(self):
+        start = time.perf_counter()
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(f"Invalid Content-Length {length}")
+            body = self.rfile.read(length)
+
+            if self.path == "/clean/line":
+                text = json.loads(body)["text"]
+                self._send(200, json.dumps({"text": self.server.batcher.clean([text])[0]}, ensure_ascii=False), "application/json")
+            elif self.path == "/clean/lines":
+                lines = json.loads(body)["lines"]
+                self._send(200, json.dumps({"lines": self.server.batcher.clean(lines)}, ensure_ascii=False), "application/json")
+            elif self.path == "/clean/srt":
+                self._send(200, clean_srt_text(body, self.server.batcher), "application/x-subrip")
+            else:
+                self._send(404, json.dumps({"error": f"Unknown endpoint {self.path}"}), "application/json")
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, json.dumps({"error": str(e)}, ensure_ascii=False), "application/json")
+            return
+        except Exception as e:
+            # Any other failure, like a broken rule pack, still gets an answer instead of a dropped connection
+            traceback.print_exc()
+            self._send(500, json.dumps({"error": f"{type(e).__name__}: {e}"}, ensure_ascii=False), "application/json")
+            return
+
+        self.server.stats.record(self.path, time.perf_counter() - start)
+
+    def _send(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass    # Per-request logs would dominate the cost of small requests
+
+class tcp_cleaning_server(ThreadingHTTPServer):
+    daemon_threads = True
+
+class unix_cleaning_server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(address, cleaner=None):
+    """Create a server for "[host:]port" or "unix:/path/to.sock". Port 0 picks a free port."""
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        # Only a stale socket from an earlier run is replaced; anything else at the path is left alone
+        if os.path.lexists(path):
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            os.unlink(path)
+        server = unix_cleaning_server(path, request_handler)
+    else:
+        host, _, port = address.rpartition(":")
+        server = tcp_cleaning_server((host or "127.0.0.1", int(port)), request_handler)
+
+    server.batcher = line_batcher(cleaner or Cleaner())
+    server.stats = latency_stats()
+    return server
+
+def serve(address, cleaner=None):
+    """Run the cleaning service until interrupted, then print latency percentiles."""
+    cleaner = cleaner or Cleaner()
+    cleaner.warm_up()
+    server = make_server(address, cleaner)
+    print(f"Serving on {address}. Press Ctrl+C to stop.")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping server...")
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+        for endpoint, summary in server.stats.summary().items():
+            print(f"  {endpoint}: " + ", ".join(f"{key}={value}" for key, value in summary.items()))
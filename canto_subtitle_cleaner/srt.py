@@ -1,8 +1,11 @@
 """Helper functions for reading and writing .srt files."""
 
+import io
 import re
 import warnings
 from datetime import datetime, timedelta
+from canto_subtitle_cleaner.overlap import TRIM, resolve_overlaps, iter_resolve_overlaps
+from canto_subtitle_cleaner.writers import write_srt
 
 class timecode:
     """A class to represent an SRT timecode."""
@@ -33,6 +36,24 @@ class timecode:
     def end(self):
         return self.end_time.strftime(timecode.TIMECODE_FORMAT)[:-3]
 
+    @property
+    def start_ms(self):
+        """Start time in whole milliseconds since 00:00:00."""
+        return (self.start_time - timecode.TIME_ZERO) // timedelta(milliseconds=1)
+
+    @start_ms.setter
+    def start_ms(self, ms):
+        self.start_time = timecode.TIME_ZERO + timedelta(milliseconds=ms)
+
+    @property
+    def end_ms(self):
+        """End time in whole milliseconds since 00:00:00."""
+        return (self.end_time - timecode.TIME_ZERO) // timedelta(milliseconds=1)
+
+    @end_ms.setter
+    def end_ms(self, ms):
+        self.end_time = timecode.TIME_ZERO + timedelta(milliseconds=ms)
+
     def __sub__(self, other):
         """Returns the difference between two timecodes in milliseconds."""
         if (self.start_time <= other.end_time and self.start_time >= other.start_time) \
@@ -78,57 +99,149 @@ class timecode:
 def srt_to_list(input_path):
     with open(input_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    
+
+    return text_to_list(content)
+
+# Takes the contents of an .srt file and returns an iterable list of (timecode, raw subtitle text).
+# count, e.g. Cleaner.count, is called with "blocks_malformed" for every block that is dropped.
+def text_to_list(content, count=None):
     # Split into blocks
     blocks = re.split(r'\n\s*\n', content.strip())
     subtitle_list = []
 
     for block in blocks:
-        lines = block.splitlines()
-        if len(lines) >= 3:
-            # Ignore header index, we will renumber anyway
-            try:
-                block_timecode = timecode(lines[1])
-            except ValueError:
-                warnings.warn(f"Warning: timecode is malformed {lines[1]}. Removing subtitle entry.")
-                continue
-            
-            block_text = '\n'.join(lines[2:])
-            subtitle_list.append((block_timecode, block_text))
-        else:
-            # Optional: skip malformed/short blocks entirely
-            continue
+        subtitle = parse_block(block)
+        if subtitle:
+            subtitle_list.append(subtitle)
+        elif count and block:
+            count("blocks_malformed")
     
     return subtitle_list
 
-def clean_timecodes(subtitle_list):
-    previous_timecode = None
-    delta = datetime.strptime('00:00:00,001', '%H:%M:%S,%f') - datetime.strptime('00:00:00', '%H:%M:%S')
+# Takes the text of a single block and returns (timecode, raw subtitle text), or None if it is malformed
+def parse_block(block):
+    lines = block.splitlines()
+    if len(lines) >= 3:
+        # Ignore header index, we will renumber anyway
+        try:
+            block_timecode = timecode(lines[1])
+        except ValueError:
+            warnings.warn(f"Warning: timecode is malformed {lines[1]}. Removing subtitle entry.")
+            return None
+        
+        block_text = '\n'.join(lines[2:])
+        return (block_timecode, block_text)
+    else:
+        # Optional: skip malformed/short blocks entirely
+        return None
+
+# Reads an .srt stream line by line and yields each (timecode, raw subtitle text) as soon as its block ends.
+# Gives the same blocks as text_to_list on the whole content, without reading it all first.
+def iter_srt_blocks(stream, count=None):
+    lines = []
+    pending = None
+
+    for line in stream:
+        # A whitespace-only line separates blocks
+        if line.isspace():
+            if lines:
+                pending = ''.join(lines)[:-1]
+                lines = []
+            continue
 
-    for timecode, text in subtitle_list:
-        if previous_timecode:
-            if previous_timecode.end > timecode.start:
-                previous_timecode.end_time = timecode.start_time - delta
-
-        previous_timecode = timecode
-    
-    return subtitle_list
+        # Hold back a finished block until more text follows: at the end of the file, its trailing whitespace is stripped
+        if pending is not None:
+            subtitle = parse_block(pending)
+            if subtitle:
+                yield subtitle
+            elif count:
+                count("blocks_malformed")
+            pending = None
+
+        lines.append(line)
+
+    if lines:
+        pending = ''.join(lines)
+
+    if pending is not None:
+        subtitle = parse_block(pending.rstrip())
+        if subtitle:
+            yield subtitle
+        elif count:
+            count("blocks_malformed")
+
+# Takes SRT content as str, or as UTF-8 bytes, bytearray or memoryview, and returns a list of (timecode, raw subtitle text).
+# Bytes are decoded in one pass straight from the caller's buffer, so a memoryview is never copied to bytes first.
+def loads(content, count=None):
+    if not isinstance(content, str):
+        content = str(content, 'utf-8')
+
+    return text_to_list(content, count)
+
+# Takes a text or binary file object and returns a list of (timecode, raw subtitle text).
+# Blocks are parsed as lines are read, and binary files are decoded as they are read.
+def load(f):
+    if not isinstance(f, (io.RawIOBase, io.BufferedIOBase)):
+        return list(iter_srt_blocks(f))
+
+    reader = io.TextIOWrapper(f, encoding='utf-8')
+    try:
+        return list(iter_srt_blocks(reader))
+    finally:
+        # Leave the caller's file open
+        reader.detach()
+
+# Sort a list of (timecode, subtitle text) by start time and resolve overlaps, returning the new list.
+# See overlap.py for the policies.
+def clean_timecodes(subtitle_list, policy=TRIM):
+    return resolve_overlaps(subtitle_list, policy)
 
 
 # Takes an iterable list of (timecode, subtitle text) and writes it to a file in .srt format
-def list_to_srt(subtitle_list, output_path):
+def list_to_srt(subtitle_list, output_path, fix_timecodes=True):
+    cleaned_content = list_to_text(subtitle_list, fix_timecodes)
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(cleaned_content)
+
+# Takes an iterable of (timecode, subtitle text) and writes each block to a stream as soon as the next one arrives.
+# Gives the same output as list_to_text for input sorted by start time, flushing after every block.
+def write_srt_stream(subtitle_list, stream, policy=TRIM):
+    write_srt(iter_resolve_overlaps(subtitle_list, policy), stream, flush=True)
+
+# Takes an iterable list of (timecode, subtitle text) and writes it to a text or binary file object in .srt format.
+# Pass fix_timecodes=False if clean_timecodes has already been run on the list.
+def dump(subtitle_list, f, fix_timecodes=True):
+    if fix_timecodes:
+        subtitle_list = clean_timecodes(subtitle_list)
+
+    if not isinstance(f, (io.RawIOBase, io.BufferedIOBase)):
+        write_srt(subtitle_list, f)
+        return
+
+    writer = io.TextIOWrapper(f, encoding='utf-8')
+    try:
+        write_srt(subtitle_list, writer)
+        writer.flush()
+    finally:
+        writer.detach()
+
+# Takes an iterable list of (timecode, subtitle text) and returns it as text in .srt format.
+# Pass fix_timecodes=False if clean_timecodes has already been run on the list.
+def list_to_text(subtitle_list, fix_timecodes=True):
     blocks = []
     i = 1
 
-    clean_timecodes(subtitle_list)
+    if fix_timecodes:
+        subtitle_list = clean_timecodes(subtitle_list)
 
     for timecode, text in subtitle_list:
         blocks.append(f'{i}\n{timecode}\n{text}')
         i += 1
     
     # Join blocks with blank lines
-    cleaned_content = '\n\n'.join(blocks)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(cleaned_content)
+    return '\n\n'.join(blocks)
 
+# The same as list_to_text, named to pair with loads
+def dumps(subtitle_list, fix_timecodes=True):
+    return list_to_text(subtitle_list, fix_timecodes)
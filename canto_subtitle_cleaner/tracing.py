@@ -0,0 +1,156 @@
+"""Record wall time and call counts of pipeline stages, as a summary table or a Chrome trace."""
+
+import os
+import json
+import time
+import threading
+import contextlib
+import collections
+
+# Stage groups for the per-file summary, to tell I/O, segmentation and rule costs apart
+IO_STAGES = {"parse", "write"}
+SEGMENTATION_STAGES = {"linebreak"}
+TRACK_STAGES = {"adjust_subtitle_breaks", "magnetize_endings", "clean_timecodes", "retime"}
+
+class tracer:
+    """Collect stage timings for each file.
+
+    File-level stages (parse, write...) are recorded as spans on the timeline. Per-line stages run
+    thousands of times per file, so they are summed per file instead, and laid out back to back
+    on a separate "aggregated" track of the Chrome trace. Stages may be recorded from several
+    threads cleaning lines of the same file.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.file = None
+        self.events = []
+        self.totals = {}    # (file, stage) -> [seconds, calls]
+        self.spans = set()  # Stages recorded as spans in the current file
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, calls=1):
+        with self.lock:
+            total = self.totals.setdefault((self.file, name), [0.0, 0])
+            total[0] += seconds
+            total[1] += calls
+
+    def record(self, name, start, seconds, thread=0, **args):
+        with self.lock:
+            self.events.append({"name": name, "cat": "stage", "ph": "X", "pid": self.pid, "tid": thread,
+                                "ts": round(start * 1e6, 3), "dur": round(seconds * 1e6, 3), "args": {"file": self.file, **args}})
+
+    @contextlib.contextmanager
+    def span(self, name, summed=True):
+        """Time a block on the timeline. Pass summed=False for spans that enclose other stages,
+        so that their time is not counted twice in the summary."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(name, start, seconds)
+            if summed:
+                self.add(name, seconds)
+            self.spans.add(name)
+
+    def trace_steps(self, steps):
+        """Consume (stage name, text) pairs from iter_clean_subtitle, timing each step. Returns the final text."""
+        text = None
+        start = time.perf_counter()
+
+        for name, text in steps:
+            now = time.perf_counter()
+            self.add(name, now - start)
+            start = now
+
+        return text
+
+    @contextlib.contextmanager
+    def file_span(self, file):
+        self.file = file
+        self.spans = {"file"}
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.record("file", start, seconds)
+            self.add("file", seconds)
+
+            # Lay out the per-line stages of this file on the aggregated track
+            offset = start
+            with self.lock:
+                totals = list(self.totals.items())
+            for (file, name), (stage_seconds, calls) in totals:
+                if file == self.file and name not in self.spans:
+                    self.record(name, offset, stage_seconds, thread=1, calls=calls, aggregated=True)
+                    offset += stage_seconds
+
+            self.file = None
+
+    def drain(self):
+        """Return and forget everything recorded so far, e.g. to send it from a worker to its parent."""
+        with self.lock:
+            drained = (self.events, self.totals)
+            self.events = []
+            self.totals = {}
+        return drained
+
+    def merge(self, drained):
+        events, totals = drained
+        with self.lock:
+            self.events.extend(events)
+            for (file, name), (seconds, calls) in totals.items():
+                total = self.totals.setdefault((file, name), [0.0, 0])
+                total[0] += seconds
+                total[1] += calls
+
+    def chrome_trace(self):
+        """Return the trace in Chrome trace event format, for chrome://tracing or Perfetto."""
+        metadata = []
+        for pid in sorted({event["pid"] for event in self.events}):
+            metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "stages"}})
+            metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": "per-line stages (summed per file)"}})
+
+        return {"traceEvents": metadata + sorted(self.events, key=lambda event: (event["pid"], event["ts"])), "displayTimeUnit": "ms"}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+    def summary(self):
+        """Return a table of total time and calls per stage, followed by a per-file breakdown."""
+        stages = collections.defaultdict(lambda: [0.0, 0])
+        files = collections.defaultdict(collections.Counter)
+
+        for (file, name), (seconds, calls) in self.totals.items():
+            if name != "file":
+                stages[name][0] += seconds
+                stages[name][1] += calls
+
+            if name == "file":
+                group = "total"
+            elif name in IO_STAGES:
+                group = "io"
+            elif name in SEGMENTATION_STAGES:
+                group = "segmentation"
+            elif name in TRACK_STAGES:
+                group = "track"
+            else:
+                group = "rules"
+            files[file][group] += seconds
+
+        total_seconds = sum(seconds for seconds, calls in stages.values()) or 1
+        lines = [f"{'stage':<34}{'calls':>10}{'total ms':>12}{'share':>8}"]
+        for name, (seconds, calls) in sorted(stages.items(), key=lambda item: -item[1][0]):
+            lines.append(f"{name:<34}{calls:>10}{seconds * 1000:>12.1f}{seconds / total_seconds:>8.1%}")
+
+        lines.append("")
+        lines.append(f"{'file':<40}{'total ms':>10}{'io':>10}{'segment':>10}{'rules':>10}{'track':>10}")
+        for file, groups in sorted(files.items(), key=lambda item: str(item[0])):
+            name = os.path.basename(file) if file else "(no file)"
+            lines.append(f"{name[:39]:<40}" + "".join(f"{groups[group] * 1000:>10.1f}" for group in ("total", "io", "segmentation", "rules", "track")))
+
+        return "\n".join(lines)
@@ -0,0 +1,84 @@
+"""Output variants: stages applied to already cleaned text, so several variants share one cleaning pass.
+
+Built-in variants:
+    standard    the CantoCaptions conventions, as cleaned
+    common      with uncommon conventions reverted to the more common characters
+
+A custom variant is a rule pack: a JSON list of [pattern, replacement] pairs, applied in order.
+Variants are given as "standard,common,<name>=<rule pack.json>".
+"""
+
+import os
+import json
+import hashlib
+
+STANDARD = "standard"
+COMMON = "common"
+
+class rule_pack:
+    """A list of regex rules loaded from a JSON file, applied like the built-in rule tables."""
+
+    def __init__(self, path):
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+
+        if not isinstance(rules, list) or not all(isinstance(rule, list) and len(rule) == 2 for rule in rules):
+            raise ValueError(f"Rule pack {path} must be a JSON list of [pattern, replacement] pairs.")
+
+        from canto_subtitle_cleaner.clean import compile_rules
+
+        self.path = path
+        self.rules = compile_rules(rules)
+        # Part of the variant spec in the manifest options, so that editing the pack reprocesses files
+        self.digest = hashlib.sha256(json.dumps(rules, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+    def __call__(self, text):
+        from canto_subtitle_cleaner.clean import resub
+        return resub(text, self.rules)
+
+    def __repr__(self):
+        return f"rule_pack({self.path}@{self.digest})"
+
+def builtin_variants():
+    """The built-in variants by name. The rules are only imported when a variant is asked for."""
+    from canto_subtitle_cleaner.clean import clean_subtitle_revert_uncommon_conventions
+
+    return {
+        STANDARD: [],
+        COMMON: [clean_subtitle_revert_uncommon_conventions],
+    }
+
+def parse_variants(spec):
+    """Parse "standard,common,<name>=<rule pack.json>" into {name: [stages]}, in the given order."""
+    variants = {}
+    builtin = builtin_variants()
+
+    for item in spec.split(","):
+        name, separator, path = item.strip().partition("=")
+        if not name:
+            continue
+
+        if separator:
+            variants[name] = [rule_pack(path)]
+        elif name in builtin:
+            variants[name] = builtin[name]
+        else:
+            raise ValueError(f"Unknown variant: {name}. Use {', '.join(builtin)} or <name>=<rule pack.json>.")
+
+    if not variants:
+        raise ValueError("No variants given.")
+
+    return variants
+
+def describe_variants(variants):
+    """A stable description of a set of variants, for comparing the options of two runs."""
+    return ",".join(f"{name}:" + "+".join(getattr(stage, "__name__", None) or repr(stage) for stage in stages)
+                    for name, stages in variants.items())
+
+def variant_path(output_file, name):
+    """The standard variant keeps the usual output name; others get the variant name before the extension."""
+    if name == STANDARD:
+        return output_file
+
+    stem, extension = os.path.splitext(output_file)
+    return f"{stem}.{name}{extension}"
@@ -0,0 +1,294 @@
+"""Check that a candidate cleaning engine gives byte-identical output to the current one.
+
+A candidate is anything with the Cleaner interface (clean_line and clean_file), built by a factory
+named as "module:attribute". It is compared with:
+    - the golden corpus: the SRT files in tests/, whose expected outputs are frozen in tests/golden/,
+      along with a frozen set of random lines in tests/golden/lines.json
+    - fresh random Cantonese-like lines and tracks, cleaned by the current rules
+
+The reference for the random lines and tracks is the rules in this working tree, not a frozen copy,
+so those checks only mean something for a candidate outside the tree, such as a rewritten engine.
+Cleaner itself is always its own reference there: verifying it only checks it against the golden
+corpus, and a change to the rules that breaks the random lines goes unnoticed.
+
+The first diverging block of each source is reported, with the stage that diverged where it can be
+found. A candidate that also has iter_clean_line, yielding (stage name, text) like
+iter_clean_subtitle, is compared stage by stage.
+
+Golden outputs depend on the installed pycantonese. After an intended change of behaviour,
+regenerate them with freeze_golden().
+"""
+
+import io
+import os
+import json
+import random
+import tempfile
+import warnings
+import importlib
+import itertools
+import contextlib
+from canto_subtitle_cleaner.cleaner import Cleaner
+from canto_subtitle_cleaner.clean import iter_clean_subtitle
+from canto_subtitle_cleaner.srt import text_to_list, list_to_text
+from canto_subtitle_cleaner.format import adjust_subtitle_breaks, magnetize_endings
+
+CORPUS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests")
+GOLDEN_DIRECTORY = "golden"
+GOLDEN_LINES = "lines.json"
+GOLDEN_LINES_SEED = 0
+GOLDEN_LINES_COUNT = 300
+DEFAULT_LINES = 500
+DEFAULT_TRACKS = 20
+MAX_REPORTED = 10
+
+# Pieces that random lines are built from, on top of the characters of the corpus
+RANDOM_PIECES = [
+    "啊", "呀", "喎", "咩", "㗎", "啦", "囉", "嘅", "咋", "乜", "嗎", "吖", "呢", "喇", "啩", "嗯", "哦", "呃", "哈哈",
+    "，", ",", "。", "?", "？", "!", "！", "…", "...", "、", " ", "\n", "「", "」", "-",
+    "一", "二", "三", "十", "百", "千", "零", "兩", "1", "23", "2024", "OK", "Hi",
+]
+
+class divergence:
+    """The first block where a candidate's output differs from the reference."""
+
+    def __init__(self, source, index, stage, input_text, expected, actual):
+        self.source = source
+        self.index = index
+        self.stage = stage
+        self.input_text = input_text
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return "\n".join([f"{self.source}, block {self.index}: diverged at {self.stage}",
+                          f"  input:    {self.input_text!r}",
+                          f"  expected: {self.expected!r}",
+                          f"  actual:   {self.actual!r}"])
+
+def load_engine(spec=None):
+    """Return the candidate factory named by "module:attribute", or Cleaner if no spec is given."""
+    if not spec:
+        return Cleaner
+
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "Cleaner")
+
+@contextlib.contextmanager
+def quiet():
+    """Hide line break diagnostics, which both engines print."""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+def reference_line(text):
+    for stage, text in iter_clean_subtitle(text):
+        pass
+    return text
+
+def diverging_stage(engine, text):
+    """Name the first cleaning stage where the candidate differs from the reference, if it can tell."""
+    if not hasattr(engine, "iter_clean_line"):
+        return "clean_line"
+
+    for (stage, expected), (_, actual) in zip(iter_clean_subtitle(text), engine.iter_clean_line(text)):
+        if expected != actual:
+            return stage
+
+    return "clean_line"
+
+def shrink_line(engine, text, expected_of):
+    """Remove characters from a diverging line for as long as it still diverges."""
+    i = 0
+    while i < len(text):
+        shorter = text[:i] + text[i + 1:]
+        if engine.clean_line(shorter) != expected_of(shorter):
+            text = shorter
+        else:
+            i += 1
+    return text
+
+def line_divergence(engine, text, expected, source, index, shrink=False):
+    actual = engine.clean_line(text)
+    if actual == expected:
+        return None
+
+    if shrink:
+        text = shrink_line(engine, text, reference_line)
+        expected = reference_line(text)
+        actual = engine.clean_line(text)
+
+    return divergence(source, index, diverging_stage(engine, text), text, expected, actual)
+
+def reference_line_inputs(content):
+    """Return the text that each output block of the reference pipeline was cleaned from."""
+    subtitle_list = text_to_list(content)
+    adjust_subtitle_breaks(subtitle_list)
+    magnetize_endings(subtitle_list)
+    cleaner = Cleaner(cache_size=0)
+
+    return [text for timecode, text in subtitle_list if cleaner.clean_line(text).strip()]
+
+def track_divergence(engine, content, expected, source):
+    """Clean SRT content with the candidate and compare it with the expected output, block by block."""
+    with tempfile.TemporaryDirectory() as directory:
+        input_file = os.path.join(directory, "input.srt")
+        output_file = os.path.join(directory, "output.srt")
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        engine.clean_file(input_file, output_file)
+
+        with open(output_file, encoding='utf-8', newline='') as f:
+            actual = f.read()
+
+    if actual == expected:
+        return None
+
+    blocks = itertools.zip_longest(expected.split('\n\n'), actual.split('\n\n'))
+    for index, (expected_block, actual_block) in enumerate(blocks):
+        if expected_block != actual_block:
+            break
+    else:
+        return divergence(source, None, "write", None, expected[-40:], actual[-40:])
+
+    # Find out whether the block's text was cleaned differently, or moved or retimed by the track stages
+    inputs = reference_line_inputs(content)
+    expected_lines = (expected_block or "").split('\n')
+    actual_lines = (actual_block or "").split('\n')
+
+    if index < len(inputs):
+        text = inputs[index]
+        if engine.clean_line(text).strip() != '\n'.join(expected_lines[2:]):
+            return divergence(source, index + 1, diverging_stage(engine, text), text, expected_block, actual_block)
+
+    if expected_lines[2:] == actual_lines[2:]:
+        stage = "timecodes (magnetize_endings, clean_timecodes)"
+    else:
+        stage = "track (adjust_subtitle_breaks, magnetize_endings)"
+
+    return divergence(source, index + 1, stage, inputs[index] if index < len(inputs) else None, expected_block, actual_block)
+
+def corpus_vocabulary(corpus_directory=CORPUS_DIRECTORY):
+    """Return the characters of the corpus subtitles, to build random lines from."""
+    characters = set()
+    for input_file in corpus_files(corpus_directory):
+        with open(input_file, encoding='utf-8') as f:
+            for timecode, text in text_to_list(f.read()):
+                characters.update(text)
+
+    return sorted(characters - {'\n'})
+
+def random_line(rng, vocabulary):
+    # Particles, punctuation and numbers are what most rules match on, so they are drawn often
+    pieces = [rng.choice(RANDOM_PIECES if rng.random() < 0.3 else vocabulary) for _ in range(rng.randint(1, 40))]
+    return "".join(pieces).strip() or "啊"
+
+def format_ms(ms):
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+def random_track(rng, vocabulary):
+    """Return SRT content of random lines, with gaps and overlaps that exercise the track stages."""
+    blocks = []
+    start = rng.randint(0, 60000)
+
+    for i in range(rng.randint(2, 30)):
+        duration = rng.randint(200, 4000)
+        blocks.append(f"{i + 1}\n{format_ms(start)} --> {format_ms(start + duration)}\n{random_line(rng, vocabulary)}")
+        start += duration + rng.choice([-300, 0, 50, 250, 800, 2000])
+        start = max(start, 0)
+
+    return "\n\n".join(blocks)
+
+def corpus_files(corpus_directory=CORPUS_DIRECTORY):
+    return [os.path.join(corpus_directory, name) for name in sorted(os.listdir(corpus_directory)) if name.endswith(".srt")]
+
+def golden_path(input_file, corpus_directory=CORPUS_DIRECTORY):
+    return os.path.join(corpus_directory, GOLDEN_DIRECTORY, os.path.basename(input_file))
+
+def freeze_golden(corpus_directory=CORPUS_DIRECTORY):
+    """Write the current engine's output for the corpus and the golden random lines as the new reference."""
+    os.makedirs(os.path.join(corpus_directory, GOLDEN_DIRECTORY), exist_ok=True)
+    cleaner = Cleaner()
+
+    with quiet():
+        for input_file in corpus_files(corpus_directory):
+            cleaner.clean_file(input_file, golden_path(input_file, corpus_directory))
+
+        rng = random.Random(GOLDEN_LINES_SEED)
+        vocabulary = corpus_vocabulary(corpus_directory)
+        lines = [random_line(rng, vocabulary) for _ in range(GOLDEN_LINES_COUNT)]
+        golden_lines = [{"input": text, "output": reference_line(text)} for text in lines]
+
+    with open(os.path.join(corpus_directory, GOLDEN_DIRECTORY, GOLDEN_LINES), 'w', encoding='utf-8') as f:
+        json.dump(golden_lines, f, ensure_ascii=False, indent=0)
+
+def verify_engine(factory=Cleaner, corpus_directory=CORPUS_DIRECTORY, seed=None, lines=DEFAULT_LINES, tracks=DEFAULT_TRACKS):
+    """Run a candidate over the golden corpus and random input. Returns (checks run, list of divergences)."""
+    engine = factory()
+    divergences = []
+    checks = 0
+    rng = random.Random(seed)
+
+    with quiet():
+        for input_file in corpus_files(corpus_directory):
+            if not os.path.exists(golden_path(input_file, corpus_directory)):
+                continue
+
+            with open(input_file, encoding='utf-8') as f:
+                content = f.read()
+            with open(golden_path(input_file, corpus_directory), encoding='utf-8', newline='') as f:
+                expected = f.read()
+
+            checks += 1
+            found = track_divergence(engine, content, expected, os.path.basename(input_file))
+            if found:
+                divergences.append(found)
+
+        golden_lines_path = os.path.join(corpus_directory, GOLDEN_DIRECTORY, GOLDEN_LINES)
+        if os.path.exists(golden_lines_path):
+            with open(golden_lines_path, encoding='utf-8') as f:
+                for index, line in enumerate(json.load(f)):
+                    checks += 1
+                    found = line_divergence(engine, line["input"], line["output"], GOLDEN_LINES, index)
+                    if found:
+                        divergences.append(found)
+
+        vocabulary = corpus_vocabulary(corpus_directory)
+
+        for index in range(lines):
+            text = random_line(rng, vocabulary)
+            checks += 1
+            found = line_divergence(engine, text, reference_line(text), "random line", index, shrink=True)
+            if found:
+                divergences.append(found)
+
+        for index in range(tracks):
+            content = random_track(rng, vocabulary)
+            checks += 1
+            found = track_divergence(engine, content, list_to_text(Cleaner(cache_size=0).clean_track(text_to_list(content))),
+                                     f"random track {index}")
+            if found:
+                divergences.append(found)
+
+    return checks, divergences
+
+def run_verification(spec=None, corpus_directory=CORPUS_DIRECTORY, seed=None):
+    """Verify a candidate engine and print a report. Returns True if it matched everywhere."""
+    if seed is None:
+        seed = random.randrange(1 << 32)
+
+    print(f"Verifying engine {spec or 'Cleaner'} against {corpus_directory} (seed {seed})...")
+    engine = load_engine(spec)
+    if engine is Cleaner:
+        print("Warning: the random lines and tracks are cleaned by Cleaner's own rules for reference, "
+              "so only the golden corpus checks Cleaner.")
+    checks, divergences = verify_engine(engine, corpus_directory, seed)
+
+    for found in divergences[:MAX_REPORTED]:
+        print(found)
+    if len(divergences) > MAX_REPORTED:
+        print(f"... and {len(divergences) - MAX_REPORTED} more.")
+
+    print(f"Ran {checks} checks: {checks - len(divergences)} matched, {len(divergences)} diverged.")
+    return not divergences
@@ -0,0 +1,107 @@
+"""Helper functions for watching a folder for new or modified SRT files."""
+
+import os
+import sys
+import time
+import select
+import ctypes
+import ctypes.util
+from canto_subtitle_cleaner.library import find_srt_files
+
+POLL_INTERVAL = 0.5     # Seconds between directory scans
+SETTLE_TIME = 1.0       # Seconds a file's size and mtime must stay unchanged before it is processed
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+def open_inotify(directory):
+    """Return a non-blocking inotify file descriptor watching a directory, or None where inotify is unavailable."""
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+
+        if libc.inotify_add_watch(fd, os.fsencode(directory), IN_MASK) < 0:
+            os.close(fd)
+            return None
+
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+class directory_watcher:
+    """Find SRT files in a directory that are new or modified and have finished being written.
+
+    Scanning is the source of truth; inotify, where available, only wakes the watcher early.
+    """
+
+    def __init__(self, directory, recursive=False, include=None, exclude=None, settle_time=SETTLE_TIME):
+        self.directory = directory
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.settle_time = settle_time
+        self.pending = {}   # relative path -> ((size, mtime_ns), time first seen with that signature)
+        self.done = {}      # relative path -> (size, mtime_ns) when last handed out
+        self.ignored = set()
+        self.inotify_fd = open_inotify(directory)
+
+    def scan(self, now=None):
+        """Return the relative paths of files whose size and mtime have been stable for settle_time."""
+        now = time.monotonic() if now is None else now
+        ready = []
+
+        for srt_file in find_srt_files(self.directory, self.recursive, self.include, self.exclude):
+            if srt_file in self.ignored:
+                continue
+
+            try:
+                stat = os.stat(os.path.join(self.directory, *srt_file.split('/')))
+            except FileNotFoundError:
+                continue    # Removed between listing and stat
+
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self.done.get(srt_file) == signature:
+                continue
+
+            pending = self.pending.get(srt_file)
+            if pending is None or pending[0] != signature:
+                # New or still being written: restart the settle timer
+                self.pending[srt_file] = (signature, now)
+            elif now - pending[1] >= self.settle_time:
+                del self.pending[srt_file]
+                self.done[srt_file] = signature
+                ready.append(srt_file)
+
+        return ready
+
+    def ignore(self, srt_file):
+        """Never report a file, e.g. an output written back into the watched directory."""
+        self.ignored.add(srt_file)
+
+    def wait(self, timeout=POLL_INTERVAL):
+        """Sleep until the next scan is due, returning early if inotify reports a change."""
+        if self.inotify_fd is None:
+            time.sleep(timeout)
+            return
+
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.inotify_fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
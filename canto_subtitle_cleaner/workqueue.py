@@ -0,0 +1,222 @@
+"""A job queue in a SQLite file, so that workers on several machines can share one batch.
+
+One command enqueues the files of a directory tree, along with the cleaner options. Any number of
+workers, on any node that can reach the file, then claim jobs one at a time. A claim is a lease: a
+worker renews it while it cleans the file, and a job whose lease expires (its worker crashed or lost
+the node) goes back to the queue, up to MAX_ATTEMPTS claims. Results and errors are recorded per job.
+
+The cleaner options are stored as JSON, so a queue file never carries code to the workers. On network
+file systems, SQLite relies on the file system's locks; the default rollback journal is used, since
+write-ahead logging needs shared memory between the processes.
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import contextlib
+from canto_subtitle_cleaner.retime import retimer, to_ms
+
+LEASE_SECONDS = 60      # A worker that stops renewing its lease for this long is presumed dead
+MAX_ATTEMPTS = 3        # Claims of a job before it is failed, so a file that kills workers cannot stall the queue
+POLL_SECONDS = 1.0      # How often an idle worker checks for jobs whose lease expired
+BUSY_TIMEOUT = 60       # Seconds to wait for another process's write lock
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    input_file TEXT NOT NULL UNIQUE,
+    output_directory TEXT NOT NULL,
+    output_prefix TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    enqueued REAL,
+    finished REAL,
+    output TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def options_to_json(options):
+    """Cleaner options as JSON: add_offset and add_duration as milliseconds, which Cleaner also takes,
+    and the retimer as its parameters."""
+    options = dict(options)
+    for name in ("add_offset", "add_duration"):
+        options[name] = to_ms(options[name]) or None
+
+    retime = options.get("retime")
+    if retime is not None:
+        options["retime"] = {"offset_ms": retime.offset_ms, "scale": retime.scale,
+                             "anchors": retime.anchors, "duration_ms": retime.duration_ms}
+
+    return json.dumps(options)
+
+def options_from_json(text):
+    options = json.loads(text)
+
+    retime = options.get("retime")
+    if retime is not None:
+        options["retime"] = retimer(retime["offset_ms"], retime["scale"], [tuple(anchor) for anchor in retime["anchors"]],
+                                    retime["duration_ms"])
+
+    return options
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class job:
+    """A claimed job."""
+
+    def __init__(self, id, input_file, output_directory, output_prefix, attempts):
+        self.id = id
+        self.input_file = input_file
+        self.output_directory = output_directory
+        self.output_prefix = output_prefix
+        self.attempts = attempts
+
+class job_queue:
+    """Jobs in a SQLite file. Each call uses its own short transaction, so many processes can share the file."""
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode: transactions are started explicitly with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()    # The lease renewal thread shares the connection
+        self.connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Take the write lock up front, so that two workers never claim the same job."""
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def close(self):
+        self.connection.close()
+
+    def set_options(self, options):
+        """Store the cleaner options that every worker builds its cleaner from."""
+        with self.transaction() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO settings VALUES ('options', ?)", (options_to_json(options),))
+
+    def options(self):
+        row = self.connection.execute("SELECT value FROM settings WHERE name = 'options'").fetchone()
+        return options_from_json(row[0]) if row else {}
+
+    def enqueue(self, tasks):
+        """Add (input file, output directory, output prefix) tasks. A file that is already queued is queued
+        again if it has finished, and left alone while it is running. Returns the number of jobs queued."""
+        now = time.time()
+        queued = 0
+
+        with self.transaction() as cursor:
+            for input_file, output_directory, output_prefix in tasks:
+                cursor.execute("""
+                    INSERT INTO jobs (input_file, output_directory, output_prefix, status, enqueued) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (input_file) DO UPDATE SET
+                        output_directory = excluded.output_directory, output_prefix = excluded.output_prefix,
+                        status = excluded.status, attempts = 0, worker = NULL, lease_expires = NULL,
+                        enqueued = excluded.enqueued, finished = NULL, output = NULL, error = NULL
+                    WHERE status != ?""", (input_file, output_directory, output_prefix, PENDING, now, RUNNING))
+                queued += cursor.rowcount
+
+        return queued
+
+    def claim(self, worker):
+        """Lease the next pending job, or a running job whose lease expired, to a worker. Returns the job or None."""
+        now = time.time()
+
+        with self.transaction() as cursor:
+            # Jobs whose workers died on every attempt are failed rather than retried forever
+            cursor.execute("""
+                UPDATE jobs SET status = ?, finished = ?, error = 'Lease expired on every attempt; the last worker was ' || worker
+                WHERE status = ? AND lease_expires < ? AND attempts >= ?""", (FAILED, now, RUNNING, now, self.max_attempts))
+
+            row = cursor.execute("""
+                SELECT id, input_file, output_directory, output_prefix, attempts FROM jobs
+                WHERE status = ? OR (status = ? AND lease_expires < ?)
+                ORDER BY id LIMIT 1""", (PENDING, RUNNING, now)).fetchone()
+            if row is None:
+                return None
+
+            cursor.execute("UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                           (RUNNING, worker, now + self.lease_seconds, row[0]))
+
+        return job(*row[:4], row[4] + 1)
+
+    def renew(self, job, worker):
+        """Extend a worker's lease on a job. Returns False if the lease was lost to another worker."""
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?",
+                           (time.time() + self.lease_seconds, job.id, worker, RUNNING))
+            return cursor.rowcount == 1
+
+    def finish(self, job, worker, success, output="", error=None):
+        """Record a job's result. Ignored if the worker's lease expired and another worker took the job over."""
+        with self.transaction() as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = ?, finished = ?, output = ?, error = ?, lease_expires = NULL
+                WHERE id = ? AND worker = ? AND status = ?""",
+                           (DONE if success else FAILED, time.time(), output, error, job.id, worker, RUNNING))
+            return cursor.rowcount == 1
+
+    def release(self, job, worker):
+        """Give a job back to the queue without counting the attempt, e.g. when a worker is stopped."""
+        with self.transaction() as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, attempts = attempts - 1
+                WHERE id = ? AND worker = ? AND status = ?""", (PENDING, job.id, worker, RUNNING))
+            return cursor.rowcount == 1
+
+    def counts(self):
+        """The number of jobs per status."""
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return counts
+
+    def failures(self):
+        """(input file, error) for every failed job."""
+        return self.connection.execute("SELECT input_file, error FROM jobs WHERE status = ? ORDER BY id", (FAILED,)).fetchall()
+
+class lease_keeper:
+    """Renew a worker's lease on a job in the background while the job runs."""
+
+    def __init__(self, queue, job, worker):
+        self.queue = queue
+        self.job = job
+        self.worker = worker
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="lease_keeper", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        # Renew well before expiry, so that a slow renewal never lets the lease lapse
+        while not self.stopped.wait(self.queue.lease_seconds / 3):
+            if not self.queue.renew(self.job, self.worker):
+                return
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,117 @@
+"""Writers for the output formats, all fed from the same cleaned track.
+
+Each writer takes an iterable of (timecode, text), already sorted and free of overlaps, and writes
+it to a text stream one block at a time, so a streamed track is never held in memory.
+
+Formats:
+    srt     SubRip, as written by list_to_srt
+    vtt     WebVTT
+    ass     Advanced SubStation Alpha, with a single default style
+    jsonl   one JSON object per subtitle: index, start_ms, end_ms and text
+"""
+
+import os
+import json
+from canto_subtitle_cleaner.archive import open_text
+
+SRT = "srt"
+VTT = "vtt"
+ASS = "ass"
+JSONL = "jsonl"
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+WrapStyle: 2
+ScaledBorderAndShadow: yes
+PlayResX: 1920
+PlayResY: 1080
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Noto Sans CJK HK,64,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,3,0,2,60,60,50,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def write_srt(subtitles, stream, flush=False):
+    for i, (timecode, text) in enumerate(subtitles, 1):
+        # Blocks are separated by blank lines, with no trailing newline after the last block
+        if i > 1:
+            stream.write('\n\n')
+        stream.write(f'{i}\n{timecode}\n{text}')
+        if flush:
+            stream.flush()
+
+# WebVTT times use a full stop before the milliseconds
+def vtt_time(ms):
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+# Cue text may not contain "-->" or unescaped markup characters
+def vtt_text(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def write_vtt(subtitles, stream, flush=False):
+    stream.write("WEBVTT\n")
+    for timecode, text in subtitles:
+        stream.write(f"\n{vtt_time(timecode.start_ms)} --> {vtt_time(timecode.end_ms)}\n{vtt_text(text)}\n")
+        if flush:
+            stream.flush()
+
+# ASS times are H:MM:SS.cc, in centiseconds
+def ass_time(ms):
+    return f"{ms // 3600000}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms // 10 % 100:02d}"
+
+# Braces start override blocks and line breaks are written as \N
+def ass_text(text):
+    return text.replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+
+def write_ass(subtitles, stream, flush=False):
+    stream.write(ASS_HEADER)
+    for timecode, text in subtitles:
+        stream.write(f"Dialogue: 0,{ass_time(timecode.start_ms)},{ass_time(timecode.end_ms)},Default,,0,0,0,,{ass_text(text)}\n")
+        if flush:
+            stream.flush()
+
+def write_jsonl(subtitles, stream, flush=False):
+    for i, (timecode, text) in enumerate(subtitles, 1):
+        stream.write(json.dumps({"index": i, "start_ms": timecode.start_ms, "end_ms": timecode.end_ms, "text": text},
+                                ensure_ascii=False) + "\n")
+        if flush:
+            stream.flush()
+
+WRITERS = {
+    SRT: write_srt,
+    VTT: write_vtt,
+    ASS: write_ass,
+    JSONL: write_jsonl,
+}
+
+def parse_formats(spec):
+    """Parse "srt,vtt,ass,jsonl" into a list of formats, in the given order."""
+    formats = []
+
+    for name in spec.split(","):
+        name = name.strip().lower()
+        if not name or name in formats:
+            continue
+        if name not in WRITERS:
+            raise ValueError(f"Unknown output format: {name}. Use one of {', '.join(WRITERS)}.")
+        formats.append(name)
+
+    if not formats:
+        raise ValueError("No output formats given.")
+
+    return formats
+
+def format_path(output_file, name):
+    """SRT keeps the usual output name; other formats replace its extension."""
+    if name == SRT:
+        return output_file
+
+    return f"{os.path.splitext(output_file)[0]}.{name}"
+
+def write_track(subtitle_list, output_file, name=SRT, opener=open_text):
+    """Write a track to a file in the given format. opener opens it as text, compressing it by its suffix by default."""
+    with opener(output_file, 'w') as f:
+        WRITERS[name](subtitle_list, f)
@@ -1,6 +1,45 @@
+import os
+import io
+import sys
+import time
+import json
+import asyncio
+import gzip
+import zipfile
+import tarfile
+import socket
+import threading
+import http.client
+import shutil
+import tempfile
+import subprocess
+import contextlib
+import re
 import unittest
+import warnings
+import unittest.mock
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from canto_subtitle_cleaner import Cleaner, load, loads, dump, dumps
+from canto_subtitle_cleaner.__main__ import process_directory, process_file, process_stream, process_archive, enqueue_directory, run_worker
+from canto_subtitle_cleaner.watch import directory_watcher
+from canto_subtitle_cleaner.server import make_server, line_batcher
 from canto_subtitle_cleaner.parse import segments, is_question
-from canto_subtitle_cleaner.clean import clean_subtitle
+from canto_subtitle_cleaner.clean import clean_subtitle, iter_clean_subtitle, resub
+from canto_subtitle_cleaner.analyze import analyze_rules, pipeline_rules, witnesses, find_fusable_runs, fused_rule
+from canto_subtitle_cleaner.guard import audit_pattern, SAFE_STAGES, EXPONENTIAL, BACKREFERENCE, QUADRATIC
+from canto_subtitle_cleaner.verify import verify_engine
+from canto_subtitle_cleaner import charclass
+from canto_subtitle_cleaner import cleaner as cleaner_module
+from canto_subtitle_cleaner.srt import text_to_list, list_to_text
+from canto_subtitle_cleaner.retime import retimer, parse_time_ms, parse_fps
+from canto_subtitle_cleaner.overlap import resolve_overlaps
+from canto_subtitle_cleaner.writers import WRITERS
+from canto_subtitle_cleaner.archive import open_text
+from canto_subtitle_cleaner.metrics import prometheus_text, snapshot, write_metrics
+from canto_subtitle_cleaner.workqueue import job_queue
+from canto_subtitle_cleaner.aio import async_cleaner
+from canto_subtitle_cleaner.fastsrt import parse_timecode_line, fallback
 
 class TestParseFunctions(unittest.TestCase):
 
@@ -97,5 +136,1104 @@ class TestParseFunctions(unittest.TestCase):
         self.assertEqual(clean_subtitle("吼"), "")
         self.assertEqual(clean_subtitle("吓吼"), "吓吼")
 
+class TestCharclass(unittest.TestCase):
+
+    def test_flags_match_regexes(self):
+        # The tables replace these regexes, so they must agree on every character
+        patterns = [(charclass.DELIMITING, r'[，？！…。：；]'), (charclass.PUNCTUATION, r'[，？！…：；\s\-]'),
+                    (charclass.LATIN | charclass.DIGIT, r'[A-Za-z\d]'), (charclass.ASCII, r'[\x00-\x7F]'),
+                    (charclass.CJK, r'[\u4e00-\u9fff]')]
+
+        for i in range(0x10000):
+            flags = charclass.compute_flags(chr(i))
+            for flag, pattern in patterns:
+                self.assertEqual(flags & flag != 0, re.match(pattern, chr(i)) is not None, (hex(i), pattern))
+
+    def test_classify(self):
+        classes = charclass.classify("好，OK1")
+        self.assertEqual(len(classes), 5)
+        self.assertTrue(classes[0] & charclass.CJK and classes[0] & charclass.STANDALONE_START)
+        self.assertTrue(classes[1] & charclass.DELIMITING and classes[1] & charclass.PUNCTUATION)
+        self.assertEqual(classes[2], charclass.LATIN | charclass.ASCII)
+        self.assertEqual(classes[4], charclass.DIGIT | charclass.ASCII)
+
+class TestProcessDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.input_directory = tempfile.mkdtemp()
+        self.output_directory = tempfile.mkdtemp()
+        tests_directory = os.path.dirname(__file__)
+
+        for name in ("test.srt", "Doraemon_517-518.srt"):
+            shutil.copy(os.path.join(tests_directory, name), self.input_directory)
+
+        with open(os.path.join(self.input_directory, "broken.srt"), "wb") as f:
+            f.write(b"\xff\xfe not utf-8")
+
+    def tearDown(self):
+        shutil.rmtree(self.input_directory)
+        shutil.rmtree(self.output_directory)
+
+    def _run(self, jobs):
+        output_directory = os.path.join(self.output_directory, str(jobs))
+        os.mkdir(output_directory)
+
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            process_directory(self.input_directory, output_directory, "output_", jobs=jobs)
+
+        outputs = {}
+        for name in sorted(os.listdir(output_directory)):
+            with open(os.path.join(output_directory, name), encoding="utf-8") as f:
+                outputs[name] = f.read()
+
+        return outputs, log.getvalue()
+
+    def test_parallel_matches_serial(self):
+        serial_outputs, serial_log = self._run(1)
+        parallel_outputs, parallel_log = self._run(2)
+
+        self.assertEqual(sorted(serial_outputs), ["output_Doraemon_517-518.srt", "output_test.srt"])
+        self.assertEqual(serial_outputs, parallel_outputs)
+
+        # A broken file is reported in the summary without stopping the batch
+        for log in (serial_log, parallel_log):
+            self.assertIn("Processed 3 files: 2 succeeded, 1 failed.", log)
+            self.assertIn("broken.srt", log)
+
+    def test_recursive_scan_with_manifest(self):
+        nested_directory = os.path.join(self.input_directory, "season 2")
+        os.mkdir(nested_directory)
+        shutil.copy(os.path.join(self.input_directory, "test.srt"), nested_directory)
+        manifest_path = os.path.join(self.output_directory, "manifest.json")
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()) as log:
+                process_directory(self.input_directory, self.output_directory, "output_", recursive=True,
+                                  exclude=["broken.srt"], manifest_path=manifest_path)
+            return log.getvalue()
+
+        self.assertIn("Processed 3 files: 3 succeeded, 0 failed.", run())
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, "season 2", "output_test.srt")))
+
+        # Unchanged files are skipped on the next run; an edited file is cleaned again
+        self.assertIn("Skipped 3 unchanged files.", run())
+
+        with open(os.path.join(nested_directory, "test.srt"), "a", encoding="utf-8") as f:
+            f.write("\n\n99\n00:10:00,000 --> 00:10:01,000\n新嘅一句\n")
+
+        log = run()
+        self.assertIn("Processed 1 files: 1 succeeded, 0 failed.", log)
+        self.assertIn("Skipped 2 unchanged files.", log)
+
+    def test_ruleset_version_covers_every_module(self):
+        # A copy of the package, so that editing a module does not touch the tree under test
+        package_copy = os.path.join(self.output_directory, "canto_subtitle_cleaner")
+        shutil.copytree(os.path.dirname(cleaner_module.__file__), package_copy,
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        spec = importlib.util.spec_from_file_location("library_copy", os.path.join(package_copy, "library.py"))
+        library_copy = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(library_copy)
+        version = library_copy.ruleset_version()
+
+        for module in ["charclass.py", "overlap.py", "guard.py", "cleaner.py", "retime.py", "fastsrt.py"]:
+            with open(os.path.join(package_copy, module), "a", encoding="utf-8") as f:
+                f.write("\n# edited\n")
+            library_copy._ruleset_version = None
+            self.assertNotEqual(library_copy.ruleset_version(), version, module)
+            version = library_copy.ruleset_version()
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_directory = os.path.join(self.directory, "input")
+        self.output_directory = os.path.join(self.directory, "output")
+        self.queue_path = os.path.join(self.directory, "queue.db")
+        os.makedirs(os.path.join(self.input_directory, "season 2"))
+        tests_directory = os.path.dirname(__file__)
+
+        shutil.copy(os.path.join(tests_directory, "test.srt"), self.input_directory)
+        shutil.copy(os.path.join(tests_directory, "test.srt"), os.path.join(self.input_directory, "season 2"))
+        shutil.copy(os.path.join(tests_directory, "Doraemon_517-518.srt"), self.input_directory)
+        with open(os.path.join(self.input_directory, "broken.srt"), "wb") as f:
+            f.write(b"\xff\xfe not utf-8")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            enqueue_directory(self.queue_path, self.input_directory, self.output_directory, "output_",
+                              Cleaner(line_max_length=19), recursive=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_options_are_stored_as_json(self):
+        queue = job_queue(self.queue_path)
+        cleaner = Cleaner(retime=retimer(offset_ms=-1200, scale=1.04, anchors=[(1000, 2000)]), add_offset=1500, variants="standard,common")
+        queue.set_options(cleaner.options)
+
+        stored = queue.connection.execute("SELECT value FROM settings WHERE name = 'options'").fetchone()[0]
+        self.assertEqual(json.loads(stored)["retime"]["anchors"], [[1000, 2000]])
+        self.assertEqual(Cleaner(**queue.options()).retimer, cleaner.retimer)
+        queue.close()
+
+    def test_lease_expires_when_worker_dies(self):
+        queue = job_queue(self.queue_path, lease_seconds=0.05, max_attempts=2)
+        job = queue.claim("crashed")
+        self.assertEqual(queue.counts()["running"], 1)
+
+        # Another worker only takes the job over once the lease has expired
+        self.assertNotEqual(queue.claim("other").id, job.id)
+        time.sleep(0.1)
+        for other in iter(lambda: queue.claim("other"), None):
+            if other.id == job.id:
+                break
+        self.assertEqual((other.id, other.attempts), (job.id, 2))
+
+        # The late result of the crashed worker is ignored
+        self.assertFalse(queue.finish(job, "crashed", True))
+        self.assertTrue(queue.finish(other, "other", True))
+
+        # A job whose lease expires on every attempt is failed
+        queue.enqueue([(job.input_file, job.output_directory, job.output_prefix)])
+        queue.claim("crashed")
+        time.sleep(0.1)
+        queue.claim("crashed")
+        time.sleep(0.1)
+        queue.claim("other")
+        self.assertIn("Lease expired", dict(queue.failures())[job.input_file])
+        queue.close()
+
+    def test_workers(self):
+        # Two worker processes share the queue; each file is cleaned once, with the queued options
+        environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        command = [sys.executable, "-m", "canto_subtitle_cleaner", "--worker", self.queue_path]
+        workers = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=environment, text=True)
+                   for i in range(2)]
+        logs = [worker.communicate(timeout=300)[0] for worker in workers]
+
+        self.assertEqual(sum(log.count("File complete.") for log in logs), 3)
+        queue = job_queue(self.queue_path)
+        self.assertEqual(queue.counts(), {"pending": 0, "running": 0, "done": 3, "failed": 1})
+        self.assertIn("broken.srt", queue.failures()[0][0])
+        self.assertIn("Error cleaning SRT file", queue.failures()[0][1])
+        queue.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_file(os.path.join(self.input_directory, "test.srt"), self.directory, "expected_", Cleaner(line_max_length=19))
+        for output_file in ("output_test.srt", os.path.join("season 2", "output_test.srt")):
+            with open(os.path.join(self.output_directory, output_file), encoding="utf-8") as f, \
+                 open(os.path.join(self.directory, "expected_test.srt"), encoding="utf-8") as expected:
+                self.assertEqual(f.read(), expected.read())
+
+        # A finished queue has nothing left to claim
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            self.assertTrue(run_worker(self.queue_path, Cleaner()))
+        self.assertIn("finished 0 files", log.getvalue())
+
+class TestDirectoryWatcher(unittest.TestCase):
+
+    def test_debounce_partial_writes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            watcher = directory_watcher(directory, settle_time=1.0)
+            path = os.path.join(directory, "new.srt")
+
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("1\n00:00:01,000 --> 00:00:02,000\n")
+
+            self.assertEqual(watcher.scan(now=0.0), [])
+
+            # Still being written: the settle timer restarts
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("你好\n")
+            self.assertEqual(watcher.scan(now=0.8), [])
+            self.assertEqual(watcher.scan(now=1.5), [])
+
+            # Stable for the settle time: reported exactly once
+            self.assertEqual(watcher.scan(now=1.9), ["new.srt"])
+            self.assertEqual(watcher.scan(now=5.0), [])
+
+            # Modified again later: reported again once stable
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n2\n00:00:03,000 --> 00:00:04,000\n再見\n")
+            self.assertEqual(watcher.scan(now=6.0), [])
+            self.assertEqual(watcher.scan(now=7.0), ["new.srt"])
+            watcher.close()
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+class TestServer(unittest.TestCase):
+
+    def _check_server(self, server, connect):
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        def post(path, body):
+            connection = connect()
+            connection.request("POST", path, body.encode("utf-8"))
+            response = connection.getresponse()
+            result = response.status, response.read().decode("utf-8")
+            connection.close()
+            return result
+
+        try:
+            status, body = post("/clean/line", json.dumps({"text": "快啲啦快啲啦"}))
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body), {"text": "快啲啦…"})
+
+            # Concurrent clients are coalesced by the batcher but each gets its own answer
+            results = {}
+            def client(i):
+                results[i] = json.loads(post("/clean/lines", json.dumps({"lines": ["喂喂喂", f"第{i}個"]}))[1])["lines"]
+            clients = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+            for c in clients:
+                c.start()
+            for c in clients:
+                c.join()
+            self.assertEqual(results, {i: ["喂…", f"第{i}個"] for i in range(8)})
+
+            with open(os.path.join(os.path.dirname(__file__), "Doraemon_517-518.srt"), encoding="utf-8") as f:
+                status, body = post("/clean/srt", f.read())
+            self.assertEqual(status, 200)
+            self.assertTrue(body.startswith("1\n"))
+
+            self.assertEqual(post("/clean/lines", json.dumps({"lines": [1]}))[0], 400)
+
+            connection = connect()
+            connection.putrequest("POST", "/clean/line")
+            connection.putheader("Content-Length", "many")
+            connection.endheaders()
+            self.assertEqual(connection.getresponse().status, 400)
+            connection.close()
+
+            # Unexpected errors are answered with a 500, and the server keeps serving
+            with unittest.mock.patch.object(server.batcher.cleaner, "clean_lines", side_effect=RuntimeError("broken rule")), \
+                 contextlib.redirect_stderr(io.StringIO()):
+                status, body = post("/clean/line", json.dumps({"text": "喂喂喂"}))
+            self.assertEqual((status, json.loads(body)), (500, {"error": "RuntimeError: broken rule"}))
+            self.assertEqual(post("/clean/line", json.dumps({"text": "喂喂喂"}))[0], 200)
+
+            connection = connect()
+            connection.request("GET", "/stats")
+            stats = json.loads(connection.getresponse().read())
+            connection.close()
+            self.assertEqual(stats["requests"]["/clean/lines"]["count"], 8)
+            self.assertIn("p99_ms", stats["requests"]["/clean/line"])
+
+            connection = connect()
+            connection.request("GET", "/metrics")
+            metrics = connection.getresponse().read().decode("utf-8")
+            connection.close()
+            self.assertIn("canto_subtitle_cleaner_cache_misses_total ", metrics)
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.batcher.close()
+
+    def test_tcp(self):
+        server = make_server("127.0.0.1:0")
+        port = server.server_address[1]
+        self._check_server(server, lambda: http.client.HTTPConnection("127.0.0.1", port))
+
+    def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cleaner.sock")
+            server = make_server(f"unix:{path}")
+            self._check_server(server, lambda: UnixHTTPConnection(path))
+
+            # The stale socket is replaced, but any other file at the path is kept
+            server = make_server(f"unix:{path}")
+            server.server_close()
+            server.batcher.close()
+
+            other_path = os.path.join(directory, "notes.txt")
+            with open(other_path, "w", encoding="utf-8") as f:
+                f.write("keep me")
+            with self.assertRaises(FileExistsError):
+                make_server(f"unix:{other_path}")
+            with open(other_path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "keep me")
+
+    def test_batcher_coalesces_requests(self):
+        batcher = line_batcher(Cleaner())
+        first_call = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def clean_lines(lines):
+            calls.append(list(lines))
+            first_call.set()
+            release.wait()
+            return [f"<{line}>" for line in lines]
+
+        results = {}
+        def client(i, lines):
+            try:
+                results[i] = batcher.clean(lines)
+            except TypeError as e:
+                results[i] = e
+
+        with unittest.mock.patch.object(batcher.cleaner, "clean_lines", side_effect=clean_lines):
+            # The first request holds the batcher, so the next three wait in the queue together
+            clients = [threading.Thread(target=client, args=(0, ["一"]))]
+            clients[0].start()
+            first_call.wait()
+            for i, lines in enumerate([["二", "三"], ["三", "一"], [1]], start=1):
+                clients.append(threading.Thread(target=client, args=(i, lines)))
+                clients[-1].start()
+            while batcher.queue.qsize() < 3:
+                time.sleep(0.01)
+            release.set()
+            for c in clients:
+                c.join()
+        batcher.close()
+
+        self.assertEqual(calls, [["一"], ["二", "三", "一"]])
+        self.assertEqual(results[1], ["<二>", "<三>"])
+        self.assertEqual(results[2], ["<三>", "<一>"])
+        self.assertIsInstance(results[3], TypeError)
+        self.assertEqual((batcher.batches, batcher.lines), (2, 5))
+
+class TestStreaming(unittest.TestCase):
+
+    def test_stream_matches_file(self):
+        tests_directory = os.path.dirname(__file__)
+
+        # A stream can't be sorted without reading all of it, so this only holds for tracks already in order
+        with tempfile.TemporaryDirectory() as output_directory:
+            for name in ("Cardcaptor Sakura - 01.srt", "Doraemon_517-518.srt"):
+                input_file = os.path.join(tests_directory, name)
+                output = io.StringIO()
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    process_file(input_file, output_directory, "output_")
+                    with open(input_file, encoding="utf-8") as f:
+                        self.assertTrue(process_stream(f, output))
+
+                with open(os.path.join(output_directory, "output_" + name), encoding="utf-8") as f:
+                    self.assertEqual(output.getvalue(), f.read())
+
+    def test_blocks_written_before_end_of_input(self):
+        output = io.StringIO()
+
+        def input_lines():
+            for i in range(1, 6):
+                # Each block is final once the block after next starts, long before the input ends
+                if i == 5:
+                    self.assertTrue(output.getvalue().startswith("1\n00:00:01,000 --> 00:00:01,500\n第1句"))
+                for line in (f"{i}\n", f"00:00:0{i * 2 - 1},000 --> 00:00:0{i * 2 - 1},500\n", f"第{i}句\n", "\n"):
+                    yield line
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertTrue(process_stream(input_lines(), output))
+        self.assertTrue(output.getvalue().endswith("5\n00:00:09,000 --> 00:00:09,500\n第5句"))
+
+class TestCleaner(unittest.TestCase):
+
+    def test_clean_line(self):
+        cleaner = Cleaner()
+        self.assertEqual(cleaner.clean_line("快啲啦快啲啦"), clean_subtitle("快啲啦快啲啦"))
+        self.assertEqual(cleaner.clean_line("快啲啦快啲啦"), "快啲啦…")
+        self.assertEqual((cleaner.stats["cache_hits"], cleaner.stats["cache_misses"]), (1, 1))
+
+    def test_options(self):
+        text = "雖然話大家係親戚,不過,我哋其實只係遠房親戚,而佢哋就負責輪流照顧我。"
+        self.assertEqual(Cleaner(line_max_length=100).clean_line(text), "雖然話大家係親戚，不過，我哋其實只係遠房親戚，而佢哋就負責輪流照顧我")
+        self.assertEqual(Cleaner(revert_uncommon_conventions=True).clean_line("噉你係咪好開心啊"), "咁你係咪好開心呀")
+
+    def test_clean_many(self):
+        tests_directory = os.path.dirname(__file__)
+        input_files = [os.path.join(tests_directory, name) for name in ("test.srt", "Doraemon_517-518.srt", "missing.srt")]
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            output_files = [os.path.join(output_directory, os.path.basename(f)) for f in input_files]
+            cleaner = Cleaner()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                errors = cleaner.clean_many(input_files, output_files, jobs=2)
+
+            self.assertIsNone(errors[0])
+            self.assertIsNone(errors[1])
+            self.assertIsInstance(errors[2], FileNotFoundError)
+            self.assertEqual(cleaner.stats["files"], 2)
+            self.assertGreater(cleaner.stats["blocks_read"], 300)
+
+    def test_chunked_file_matches_serial(self):
+        input_file = os.path.join(os.path.dirname(__file__), "Doraemon_517-518.srt")
+
+        with tempfile.TemporaryDirectory() as output_directory, contextlib.redirect_stdout(io.StringIO()):
+            Cleaner().clean_file(input_file, os.path.join(output_directory, "serial.srt"))
+
+            # Lower the threshold so that the test file is split into chunks
+            with unittest.mock.patch.object(cleaner_module, "PARALLEL_MIN_LINES", 10):
+                cleaner = Cleaner()
+                cleaner.clean_file(input_file, os.path.join(output_directory, "chunked.srt"), jobs=2)
+
+            with open(os.path.join(output_directory, "serial.srt"), encoding="utf-8") as f:
+                serial = f.read()
+            with open(os.path.join(output_directory, "chunked.srt"), encoding="utf-8") as f:
+                chunked = f.read()
+
+        self.assertEqual(serial, chunked)
+        self.assertGreater(cleaner.stats["cache_misses"], 200)     # Counted in the workers
+
+class TestThreads(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), "Cardcaptor Sakura - 01.srt"), encoding="utf-8") as f:
+            self.lines = [text for timecode, text in text_to_list(f.read())]
+
+    def test_threaded_lines_match_serial(self):
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            expected = Cleaner(cache_size=0).clean_lines(self.lines)
+            cleaner = Cleaner(threads=4)
+            self.assertEqual(cleaner.clean_lines(self.lines), expected)
+
+        self.assertEqual(cleaner.stats["cache_hits"] + cleaner.stats["cache_misses"], len(set(self.lines)))
+
+    def test_shared_cleaner_across_threads(self):
+        # A cache smaller than the input keeps every thread evicting entries at once
+        cleaner = Cleaner(cache_size=16, trace=True)
+        results = []
+        errors = []
+
+        def clean():
+            try:
+                results.append(cleaner.clean_lines(self.lines))
+            except Exception as e:
+                errors.append(e)
+
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            expected = Cleaner(cache_size=0).clean_lines(self.lines)
+            threads = [threading.Thread(target=clean) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [expected] * 4)
+        self.assertEqual(cleaner.stats["cache_hits"] + cleaner.stats["cache_misses"], 4 * len(self.lines))
+        self.assertEqual(sum(calls for (file, stage), (seconds, calls) in cleaner.tracer.totals.items() if stage == "trim_subtitle"),
+                         cleaner.stats["cache_misses"])
+
+class TestAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.input_file = os.path.join(os.path.dirname(__file__), "Doraemon_517-518.srt")
+
+    def test_matches_clean_srt(self):
+        with open(self.input_file, encoding="utf-8") as f:
+            content = f.read()
+
+        async def clean(cleaner):
+            async with async_cleaner(cleaner, chunk_blocks=7) as aio:
+                # Several concurrent requests share the cleaner and its cache
+                results = await asyncio.gather(*[collect(aio.aclean_file(self.input_file)) for i in range(3)])
+                lines = await aio.aclean_lines(["快啲啦快啲啦", "我想食"])
+            return results, lines
+
+        async def collect(blocks):
+            return [block async for block in blocks]
+
+        for policy in ("trim", "merge"):
+            with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = Cleaner(overlap_policy=policy).clean_srt(content)
+                cleaner = Cleaner(overlap_policy=policy)
+                results, lines = asyncio.run(clean(cleaner))
+
+            for blocks in results:
+                self.assertEqual(dumps(blocks, fix_timecodes=False), expected)
+            self.assertEqual(lines, ["快啲啦…", "我想食"])
+            self.assertEqual(cleaner.stats["files"], 3)
+            self.assertGreater(cleaner.stats["cache_hits"], cleaner.stats["cache_misses"])
+
+    def test_concurrency_limit(self):
+        running = []
+        peak = []
+
+        def task(cleaner, delay):
+            running.append(delay)
+            peak.append(len(running))
+            time.sleep(delay)
+            running.pop()
+
+        async def run_all(executor):
+            async with async_cleaner(Cleaner(), executor, concurrency=2) as aio:
+                aio.warm = True
+                await asyncio.gather(*[aio.run(task, 0.01) for i in range(8)])
+
+        # The executor has room for all the calls, but only two run at once
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            asyncio.run(run_all(executor))
+        self.assertEqual(max(peak), 2)
+
+class TestRetimeBytes(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _compare(self, content, **options):
+        """Retime content with --no_clean through the byte-level path and the full parser."""
+        input_file = os.path.join(self.directory, "input.srt")
+        with open(input_file, "wb") as f:
+            f.write(content)
+
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fast = Cleaner(no_clean=True, **options)
+            fast_files = fast.retime_file(input_file, os.path.join(self.directory, "fast.srt"))
+            slow = Cleaner(no_clean=True, **options)
+            slow.write_variants(slow.clean_variants(slow.read_file(input_file)), os.path.join(self.directory, "slow.srt"))
+
+        with open(os.path.join(self.directory, "slow.srt"), "rb") as f:
+            expected = f.read()
+        if fast_files:
+            with open(fast_files[0], "rb") as f:
+                self.assertEqual(f.read(), expected)
+            self.assertEqual(fast.stats["blocks_read"], slow.stats["blocks_read"])
+
+        return fast_files, expected
+
+    def test_matches_full_parser(self):
+        with open(os.path.join(os.path.dirname(__file__), "Doraemon_517-518.srt"), "rb") as f:
+            content = f.read()
+        track = b"1\n00:00:01,000 --> 00:00:02,000\nA\n\n2\n00:00:01,500 --> 00:00:01,500\nB\n\n3\n00:00:01,800 --> 00:00:03,000\nC \n  \n"
+
+        for content, options in ((content, {"retime": retimer(offset_ms=-2500)}),
+                                 (content.replace(b"\n", b"\r\n") + b" \t\n\n", {"retime": retimer(scale=1.001), "overlap_policy": "merge"}),
+                                 (track, {})):
+            fast_files, expected = self._compare(content, **options)
+            self.assertTrue(fast_files)
+
+        # With --no_clean, the retiming options still apply; the malformed block is dropped
+        fast_files, expected = self._compare(track, retime=retimer(duration_ms=500), overlap_policy="shift")
+        self.assertEqual(expected, b"1\n00:00:01,000 --> 00:00:02,500\nA\n\n2\n00:00:02,501 --> 00:00:04,201\nC")
+
+    def test_falls_back(self):
+        for content in (b"1\n00:00:02,000 --> 00:00:03,000\nA\n\n2\n00:00:01,000 --> 00:00:01,500\nB\n",
+                        b"1\n0:00:01,5 --> 00:00:02,000\nA\n",
+                        "1\n00:00:01,000 --> 00:00:02,000\nA\u3000\n".encode("utf-8"),
+                        b"1\n00:00:01,000 --> 00:00:02,000\rA\n"):
+            fast_files, expected = self._compare(content)
+            self.assertIsNone(fast_files)
+
+        self.assertEqual(parse_timecode_line(b"01:02:03,456 --> 01:02:03,457").end_ms, 3723457)
+        self.assertIsNone(parse_timecode_line(b"00:00:02,000 --> 00:00:01,000"))
+        with self.assertRaises(fallback):
+            parse_timecode_line(b"00:61:00,000 --> 00:62:00,000")
+
+class TestStartup(unittest.TestCase):
+    # Import times depend on the machine, so the budget is relative to importing pycantonese in the same run.
+    # Absolute budgets are left to benchmarks/bench_startup.py --budget
+    HELP_BUDGET = 0.5   # Of the import time of pycantonese
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        shutil.copy(os.path.join(os.path.dirname(__file__), "test.srt"), self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _importtime(self, *args):
+        """Run python with -X importtime. Returns (total import time in ms, names of the modules imported)."""
+        environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run([sys.executable, "-X", "importtime", *args],
+                                cwd=self.directory, env=environment, capture_output=True, text=True, timeout=60)
+
+        matches = re.findall(r'^import time:\s*\d+\s*\|\s*(\d+)\s*\| (\s*)(\S+)$', result.stderr, re.MULTILINE)
+        # Nested imports are already counted in the cumulative time of the top-level import
+        total_us = sum(int(cumulative) for cumulative, indent, _ in matches if not indent)
+        return total_us / 1000, {module for _, _, module in matches}
+
+    def _imports(self, *args):
+        return self._importtime("-m", "canto_subtitle_cleaner", *args)[1]
+
+    def test_lazy_imports(self):
+        # Modes that never clean a line load neither the segmenter and rules nor the other modes' modules
+        for args in (["--help"], ["test.srt", "--no_clean"]):
+            modules = self._imports(*args)
+            self.assertIn("canto_subtitle_cleaner.cleaner", modules)
+            for module in ("pycantonese", "canto_subtitle_cleaner.clean", "canto_subtitle_cleaner.server", "sqlite3", "multiprocessing"):
+                self.assertFalse(module in modules, f"{args} imports {module}")
+
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "output_test.srt")))
+
+    def test_help_import_budget(self):
+        # The best of a few runs each, so that one slow run does not fail the test
+        help_ms = min(self._importtime("-m", "canto_subtitle_cleaner", "--help")[0] for i in range(3))
+        pycantonese_ms = min(self._importtime("-c", "import pycantonese")[0] for i in range(3))
+
+        self.assertLess(help_ms, pycantonese_ms * self.HELP_BUDGET,
+                        f"--help imports take {help_ms:.1f} ms, importing pycantonese takes {pycantonese_ms:.1f} ms")
+
+class TestGuard(unittest.TestCase):
+
+    def clean(self, cleaner, text):
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            result = cleaner.clean_line(text)
+        return result, caught
+
+    def test_audit_pattern(self):
+        self.assertEqual(audit_pattern("係([^，？]*?)前")[0], QUADRATIC)
+        self.assertEqual(audit_pattern(r"([一-鿿]{2,})\1+")[0], BACKREFERENCE)
+        self.assertEqual(audit_pattern("(a+)+")[0], EXPONENTIAL)
+        self.assertIsNone(audit_pattern("^a.*b"))
+        self.assertIsNone(audit_pattern("(嘻){2,}"))
+
+    def test_long_line_uses_safe_stages(self):
+        text = "係" * 600
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            *stages, (stage, expected) = iter_clean_subtitle(text, 21, SAFE_STAGES)
+
+        cleaner = Cleaner(cache_size=0)
+        result, caught = self.clean(cleaner, text)
+        self.assertEqual(result, expected)
+        self.assertEqual(cleaner.stats["safe_fallbacks"], 1)
+        self.assertTrue(any("safe" in str(warning.message) for warning in caught))
+
+    def test_line_budget(self):
+        cleaner = Cleaner(cache_size=0, line_budget_ms=1e-9)
+        result, caught = self.clean(cleaner, "你係咪想食飯呀")
+        self.assertEqual(cleaner.stats["safe_fallbacks"], 1)
+
+    def test_line_budget_results_are_not_cached(self):
+        cleaner = Cleaner(line_budget_ms=1e-9)
+        self.clean(cleaner, "你係咪想食飯呀")
+        self.assertNotIn("你係咪想食飯呀", cleaner.cache)
+
+        # Without the fallback, the full result is cached
+        cleaner.line_budget_ms = None
+        result, caught = self.clean(cleaner, "你係咪想食飯呀")
+        self.assertEqual(cleaner.cache["你係咪想食飯呀"], result)
+
+    def test_normal_lines_unchanged(self):
+        cleaner = Cleaner(cache_size=0, line_budget_ms=10000)
+        for text in ["你係咪想食飯呀", "佢哋喺度做乜嘢"]:
+            result, caught = self.clean(cleaner, text)
+            self.assertEqual(result, self.clean(Cleaner(cache_size=0, long_line_length=0), text)[0])
+        self.assertEqual(cleaner.stats["safe_fallbacks"], 0)
+
+class TestMetrics(unittest.TestCase):
+    TRACK = """1
+00:00:01,000 --> 00:00:02,000
+我想食
+
+2
+00:00:02,100 --> 00:00:03,000
+飯，你呢
+
+3
+00:00:03,100 --> bad
+壞咗
+
+4
+00:00:04,000 --> 00:00:05,000
+，
+
+5
+00:00:05,100 --> 00:00:06,000
+abcdefghijklmnopqrstuvwxyzabcdefgh
+"""
+
+    def setUp(self):
+        self.cleaner = Cleaner(metrics=True)
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.cleaner.clean_srt(self.TRACK)
+
+    def test_counters(self):
+        counters = snapshot(self.cleaner)["counters"]
+        self.assertEqual(counters["blocks_read"], 4)
+        self.assertEqual(counters["blocks_malformed"], 1)
+        self.assertEqual(counters["blocks_dropped"], 1)
+        self.assertEqual(counters["chars_pulled_back"], 1)
+        self.assertEqual(counters["linebreak_fallbacks"], 1)
+
+    def test_prometheus_text(self):
+        text = prometheus_text(self.cleaner)
+        self.assertIn('canto_subtitle_cleaner_blocks_dropped_total{reason="malformed"} 1\n', text)
+        self.assertIn('canto_subtitle_cleaner_stage_seconds_count{stage="linebreak"} 4\n', text)
+        self.assertIn('canto_subtitle_cleaner_stage_seconds_bucket{stage="linebreak",le="+Inf"} 4\n', text)
+
+    def test_snapshot_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.jsonl")
+            write_metrics(self.cleaner, path)
+            write_metrics(self.cleaner, path)
+            with open(path, encoding="utf-8") as f:
+                snapshots = [json.loads(line) for line in f]
+
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual(snapshots[0]["stages"]["parse"]["count"], 1)
+
+class TestAnalyzeRules(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.result = analyze_rules()
+
+    def test_duplicates(self):
+        duplicates = {(r.table, r.pattern.pattern): earlier.table for r, earlier in self.result.duplicates}
+        self.assertEqual(duplicates[("CANTONESE_ERROR_RULES", "喺到")], "CANTONESE_ERROR_RULES")
+        self.assertEqual(duplicates[("MISC_CONVENTION_RULES", "^難道")], "REPLACE_STANDARD_CHINESE_RULES")
+
+    def test_dead_rules(self):
+        dead = {(r.table, r.pattern.pattern): cause for r, inputs, cause in self.result.dead}
+        self.assertIn("REPLACE_STANDARD_CHINESE_RULES", dead[("MISC_CONVENTION_RULES", "^難道")])
+        # Rules that fire on the corpus are never reported dead
+        for r, inputs, cause in self.result.dead:
+            self.assertEqual(self.result.corpus_matches[r.position], 0)
+
+    def test_witnesses(self):
+        r = next(r for r in pipeline_rules() if r.pattern.pattern == r"(?<=[，\n])放心喇")
+        self.assertTrue(all(r.pattern.search(text) for text in witnesses(r)))
+        self.assertIn("佢話，放心喇喎", witnesses(r))
+
+    def test_fused_runs_match_sequential(self):
+        runs = find_fusable_runs(pipeline_rules())
+        run = next(run for run in runs if run[0].table == "STANDARDIZE_CHARS_HK_RULES")
+        pattern, repl = fused_rule(run)
+        text = "我地同佢地喺床上說爲咩"
+        self.assertEqual(pattern.sub(repl, text), resub(text, [(r.pattern, r.repl) for r in run]))
+        self.assertTrue(all(counterexample is None for run, counterexample in self.result.fusable))
+
+class TestRetime(unittest.TestCase):
+    TRACK = "1\n00:00:01,000 --> 00:00:02,000\n一\n\n2\n00:00:10,000 --> 00:00:12,500\n二\n\n3\n00:01:00,000 --> 00:01:01,000\n三"
+
+    def test_parse(self):
+        self.assertEqual(parse_time_ms("-00:00:01,5"), -1500)
+        self.assertEqual(parse_time_ms("01:02:03,004"), 3723004)
+        self.assertEqual(parse_time_ms("02:03"), 123000)
+        self.assertAlmostEqual(parse_fps("25:23.976"), 25 / 23.976)
+        self.assertRaises(ValueError, parse_time_ms, "1:2:3:4")
+
+    def test_offset_and_scale(self):
+        subtitle_list = retimer(offset_ms=-4500, scale=2).apply(text_to_list(self.TRACK))
+
+        # The first block ends before 0:00 and is dropped
+        self.assertEqual([str(timecode) for timecode, text in subtitle_list],
+                         ["00:00:15,500 --> 00:00:20,500", "00:01:55,500 --> 00:01:57,500"])
+
+    def test_sync_points(self):
+        # Stretch the first 10 seconds to 20, then run at normal speed 10 seconds later
+        subtitle_list = retimer(anchors=[(0, 0), (10000, 20000), (60000, 70000)]).apply(text_to_list(self.TRACK))
+        self.assertEqual([str(timecode) for timecode, text in subtitle_list],
+                         ["00:00:02,000 --> 00:00:04,000", "00:00:20,000 --> 00:00:22,500", "00:01:10,000 --> 00:01:11,000"])
+        self.assertRaises(ValueError, retimer, anchors=[(0, 1000), (1000, 500)])
+
+    def test_add_offset_matches_retime(self):
+        offset = Cleaner(add_offset="00:00:02,000", add_duration=250).clean_track(text_to_list(self.TRACK))
+        retimed = Cleaner(retime=retimer(offset_ms=2000, duration_ms=250)).clean_track(text_to_list(self.TRACK))
+        self.assertEqual(list_to_text(offset), list_to_text(retimed))
+        self.assertIn("00:00:03,000 --> 00:00:04,250", list_to_text(offset))
+
+class TestOverlaps(unittest.TestCase):
+    # Out of order, with a chain of overlaps: A overlaps B and C
+    TRACK = ("1\n00:00:02,000 --> 00:00:03,000\nB\n\n2\n00:00:01,000 --> 00:00:04,000\nA\n\n"
+             "3\n00:00:03,500 --> 00:00:05,000\nC\n\n4\n00:00:06,000 --> 00:00:07,000\nD")
+
+    def resolve(self, policy):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return [(str(timecode), text) for timecode, text in resolve_overlaps(text_to_list(self.TRACK), policy)]
+
+    def test_trim(self):
+        self.assertEqual(self.resolve("trim"), [("00:00:01,000 --> 00:00:01,999", "A"), ("00:00:02,000 --> 00:00:03,000", "B"),
+                                                ("00:00:03,500 --> 00:00:05,000", "C"), ("00:00:06,000 --> 00:00:07,000", "D")])
+
+    def test_merge(self):
+        self.assertEqual(self.resolve("merge"), [("00:00:01,000 --> 00:00:05,000", "A\nB\nC"), ("00:00:06,000 --> 00:00:07,000", "D")])
+
+    def test_shift(self):
+        self.assertEqual(self.resolve("shift"), [("00:00:01,000 --> 00:00:04,000", "A"), ("00:00:04,001 --> 00:00:05,001", "B"),
+                                                 ("00:00:05,002 --> 00:00:06,502", "C"), ("00:00:06,503 --> 00:00:07,503", "D")])
+
+    def test_readable_keeps_merged_blocks(self):
+        track = ("1\n00:00:01,500 --> 00:00:01,800\nC\n\n2\n00:00:01,000 --> 00:00:04,000\nA\n\n"
+                 "3\n00:00:01,200 --> 00:00:02,000\nB\n\n4\n00:00:03,800 --> 00:00:06,000\nD")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            trimmed, readable = ([(str(timecode), text) for timecode, text in resolve_overlaps(text_to_list(track), policy)]
+                                 for policy in ("trim", "readable"))
+
+        # Trim cuts every block short of the next, however short that leaves it
+        self.assertEqual(trimmed, [("00:00:01,000 --> 00:00:01,199", "A"), ("00:00:01,200 --> 00:00:01,499", "B"),
+                                   ("00:00:01,500 --> 00:00:01,800", "C"), ("00:00:03,800 --> 00:00:06,000", "D")])
+
+        # Trimming A would leave it 199ms, so B is merged into it; C, out of order, lands inside the
+        # merged block and joins it, and D starts after it instead of cutting it short
+        self.assertEqual(readable, [("00:00:01,000 --> 00:00:04,000", "A\nB\nC"), ("00:00:04,001 --> 00:00:06,000", "D")])
+
+class TestVariants(unittest.TestCase):
+
+    def test_variants_match_separate_runs(self):
+        with open(os.path.join(os.path.dirname(__file__), "Cardcaptor Sakura - 01.srt"), encoding="utf-8") as f:
+            content = f.read()
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            rules_file = os.path.join(output_directory, "rules.json")
+            with open(rules_file, "w", encoding="utf-8") as f:
+                json.dump([["係", "系"]], f)
+
+            output_file = os.path.join(output_directory, "out.srt")
+            cleaner = Cleaner(variants=f"standard,common,custom={rules_file}")
+            paths = cleaner.write_variants(cleaner.clean_variants(text_to_list(content)), output_file)
+            self.assertEqual(paths, [output_file, os.path.join(output_directory, "out.common.srt"),
+                                     os.path.join(output_directory, "out.custom.srt")])
+
+            outputs = {}
+            for path in paths:
+                with open(path, encoding="utf-8") as f:
+                    outputs[path] = f.read()
+
+        standard = list_to_text(Cleaner().clean_track(text_to_list(content)))
+        common = list_to_text(Cleaner(revert_uncommon_conventions=True).clean_track(text_to_list(content)))
+        self.assertEqual(outputs[paths[0]], standard)
+        self.assertEqual(outputs[paths[1]], common)
+        self.assertNotIn("係", outputs[paths[2]])
+        self.assertEqual(outputs[paths[2]], standard.replace("係", "系"))
+
+    def test_unknown_variant(self):
+        with self.assertRaises(ValueError):
+            Cleaner(variants="standard,traditional")
+
+class TestLoadsDumps(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(os.path.dirname(__file__), "Doraemon_517-518.srt"), encoding="utf-8") as f:
+            self.content = f.read()
+        self.expected = list_to_text(text_to_list(self.content))
+
+    def test_loads(self):
+        data = self.content.encode("utf-8")
+        for content in (self.content, data, bytearray(data), memoryview(data)):
+            self.assertEqual(dumps(loads(content)), self.expected)
+
+        with self.assertRaises(UnicodeDecodeError):
+            loads(b"1\n00:00:01,000 --> 00:00:02,000\n\xff")
+
+    def test_file_objects(self):
+        self.assertEqual(dumps(load(io.StringIO(self.content))), self.expected)
+        binary = io.BytesIO(self.content.encode("utf-8"))
+        self.assertEqual(dumps(load(binary)), self.expected)
+        self.assertFalse(binary.closed)
+
+        text, binary = io.StringIO(), io.BytesIO()
+        dump(loads(self.content), text)
+        dump(loads(self.content), binary)
+        self.assertEqual(text.getvalue(), self.expected)
+        self.assertEqual(binary.getvalue().decode("utf-8"), self.expected)
+
+    def test_clean_srt(self):
+        with tempfile.TemporaryDirectory() as output_directory:
+            output_file = os.path.join(output_directory, "out.srt")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                Cleaner().clean_file(os.path.join(os.path.dirname(__file__), "Doraemon_517-518.srt"), output_file)
+                cleaned = Cleaner().clean_srt(memoryview(self.content.encode("utf-8")))
+            with open(output_file, encoding="utf-8") as f:
+                self.assertEqual(cleaned, f.read())
+
+class TestWriters(unittest.TestCase):
+    TRACK = "1\n00:00:01,000 --> 00:00:02,500\n<你> & {我}\n\n2\n01:02:03,004 --> 01:02:04,000\n好\n嘢"
+
+    def write(self, name):
+        stream = io.StringIO()
+        WRITERS[name](text_to_list(self.TRACK), stream)
+        return stream.getvalue()
+
+    def test_srt(self):
+        self.assertEqual(self.write("srt"), list_to_text(text_to_list(self.TRACK)))
+
+    def test_vtt(self):
+        self.assertEqual(self.write("vtt"), "WEBVTT\n\n00:00:01.000 --> 00:00:02.500\n&lt;你&gt; &amp; {我}\n"
+                                            "\n01:02:03.004 --> 01:02:04.000\n好\n嘢\n")
+
+    def test_ass(self):
+        events = self.write("ass").split("[Events]\n")[1].splitlines()
+        self.assertEqual(events[1:], ["Dialogue: 0,0:00:01.00,0:00:02.50,Default,,0,0,0,,<你> & \\{我\\}",
+                                      "Dialogue: 0,1:02:03.00,1:02:04.00,Default,,0,0,0,,好\\N嘢"])
+
+    def test_jsonl(self):
+        self.assertEqual([json.loads(line) for line in self.write("jsonl").splitlines()],
+                         [{"index": 1, "start_ms": 1000, "end_ms": 2500, "text": "<你> & {我}"},
+                          {"index": 2, "start_ms": 3723004, "end_ms": 3724000, "text": "好\n嘢"}])
+
+    def test_formats_from_one_track(self):
+        input_file = os.path.join(os.path.dirname(__file__), "test.srt")
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            cleaner = Cleaner(formats="srt,vtt,jsonl")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                Cleaner().clean_file(input_file, os.path.join(output_directory, "srt_only.srt"))
+                paths = cleaner.write_variants(cleaner.clean_variants(cleaner.read_file(input_file)),
+                                               os.path.join(output_directory, "all.srt"))
+
+            self.assertEqual([os.path.basename(path) for path in paths], ["all.srt", "all.vtt", "all.jsonl"])
+            with open(paths[0], encoding="utf-8") as f, open(os.path.join(output_directory, "srt_only.srt"), encoding="utf-8") as g:
+                srt_content = f.read()
+                self.assertEqual(srt_content, g.read())
+            with open(paths[2], encoding="utf-8") as f:
+                self.assertEqual([json.loads(line)["text"] for line in f], [text for timecode, text in text_to_list(srt_content)])
+
+class TestArchives(unittest.TestCase):
+
+    def setUp(self):
+        self.input_file = os.path.join(os.path.dirname(__file__), "test.srt")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("ignore")
+            Cleaner().clean_file(self.input_file, os.path.join(self.directory.name, "expected.srt"))
+        with open(os.path.join(self.directory.name, "expected.srt"), encoding="utf-8") as f:
+            self.expected = f.read()
+
+    def test_compressed_file(self):
+        compressed_file = os.path.join(self.directory.name, "test.srt.gz")
+        with open(self.input_file, "rb") as f, gzip.open(compressed_file, "wb") as g:
+            g.write(f.read())
+
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("ignore")
+            self.assertTrue(process_file(compressed_file, self.directory.name, "plain_"))
+            self.assertTrue(process_file(compressed_file, self.directory.name, "packed_", Cleaner(compress="xz")))
+
+        with open(os.path.join(self.directory.name, "plain_test.srt"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), self.expected)
+        with open_text(os.path.join(self.directory.name, "packed_test.srt.xz")) as f:
+            self.assertEqual(f.read(), self.expected)
+
+    def test_archive_to_archive(self):
+        input_archive = os.path.join(self.directory.name, "pack.zip")
+        with zipfile.ZipFile(input_archive, "w") as archive:
+            archive.write(self.input_file, "s1/e1.srt")
+            with open(self.input_file, "rb") as f:
+                archive.writestr("s1/e2.srt.gz", gzip.compress(f.read()))
+            archive.writestr("s1/notes.txt", "not a subtitle")
+
+        output_archive = os.path.join(self.directory.name, "out.tar.gz")
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("ignore")
+            process_archive(input_archive, output_prefix="output_", cleaner=Cleaner(), jobs=2, archive_path=output_archive)
+
+        with tarfile.open(output_archive) as archive:
+            self.assertEqual(archive.getnames(), ["s1/output_e1.srt", "s1/output_e2.srt"])
+            for name in archive.getnames():
+                self.assertEqual(archive.extractfile(name).read().decode("utf-8"), self.expected)
+
+    def test_unsafe_member_names(self):
+        # Members that would be written outside the output directory are skipped
+        absolute_directory = os.path.join(self.directory.name, "abs")
+        output_directory = os.path.join(self.directory.name, "out")
+        with open(self.input_file, "rb") as f:
+            content = f.read()
+
+        for input_archive in (os.path.join(self.directory.name, "pack.zip"), os.path.join(self.directory.name, "pack.tar")):
+            if input_archive.endswith(".zip"):
+                with zipfile.ZipFile(input_archive, "w") as archive:
+                    for name in ("../x.srt", absolute_directory + "/x.srt", "s1/../e1.srt"):
+                        archive.writestr(zipfile.ZipInfo(name), content)
+            else:
+                with tarfile.open(input_archive, "w") as archive:
+                    for name in ("../x.srt", absolute_directory + "/x.srt", "s1/../e1.srt"):
+                        info = tarfile.TarInfo(name)
+                        info.size = len(content)
+                        archive.addfile(info, io.BytesIO(content))
+
+            with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()) as log:
+                warnings.simplefilter("ignore")
+                process_archive(input_archive, output_directory, "output_", Cleaner())
+
+            self.assertEqual(log.getvalue().count("Error: unsafe member name"), 2)
+            self.assertEqual(os.listdir(output_directory), ["output_e1.srt"])
+            self.assertEqual(sorted(os.listdir(self.directory.name)), ["expected.srt", "out", os.path.basename(input_archive)])
+            shutil.rmtree(output_directory)
+            os.remove(input_archive)
+
+class TestTracing(unittest.TestCase):
+
+    def test_trace_file(self):
+        input_file = os.path.join(os.path.dirname(__file__), "test.srt")
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            cleaner = Cleaner(trace=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(process_file(input_file, output_directory, cleaner=cleaner))
+
+        events = cleaner.tracer.chrome_trace()["traceEvents"]
+        spans = {event["name"] for event in events if event["ph"] == "X" and event["tid"] == 0}
+        aggregated = {event["name"] for event in events if event["ph"] == "X" and event["tid"] == 1}
+
+        self.assertTrue({"file", "parse", "clean_subtitle", "write"} <= spans)
+        self.assertTrue({"clean_punctuation", "linebreak", "trim_subtitle"} <= aggregated)
+        self.assertTrue(all(event["args"]["file"] == input_file for event in events if event["ph"] == "X"))
+
+        summary = cleaner.tracer.summary()
+        self.assertIn("linebreak", summary)
+        self.assertIn("test.srt", summary)
+
+# A candidate engine with a bug in one stage: ASCII commas in place of full-width ones
+class CommaCleaner(Cleaner):
+
+    def iter_clean_line(self, text):
+        for stage, text in super().iter_clean_line(text):
+            yield stage, text.replace("，", ",")
+
+    def clean_line(self, text):
+        return super().clean_line(text).replace("，", ",")
+
+class TestVerifyEngine(unittest.TestCase):
+
+    def test_current_engine_matches_golden_corpus(self):
+        checks, divergences = verify_engine(seed=0, lines=50, tracks=3)
+        self.assertGreater(checks, 300)
+        self.assertEqual([str(found) for found in divergences], [])
+
+    def test_diverging_stage_is_reported(self):
+        checks, divergences = verify_engine(CommaCleaner, seed=0, lines=50, tracks=3)
+        sources = {found.source for found in divergences}
+
+        self.assertIn("Doraemon_517-518.srt", sources)
+        self.assertIn("random line", sources)
+
+        # The first stage that writes a full-width comma is the one reported
+        doraemon = next(found for found in divergences if found.source == "Doraemon_517-518.srt")
+        self.assertEqual(doraemon.stage, "clean_punctuation")
+        self.assertEqual(doraemon.index, 6)
+        self.assertTrue({found.stage for found in divergences} <= {"clean_punctuation", "clean_question_final_particles"})
+
+        # Random lines are shrunk to a few characters that still show the difference
+        shrunk = next(found for found in divergences if found.source == "random line")
+        self.assertIn("，", shrunk.expected)
+        self.assertLessEqual(len(shrunk.input_text), 5)
+
+    def test_missing_corpus(self):
+        # An installed package has no tests/ corpus: a missing --corpus is an error, not a crash
+        environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in ("--verify-engine", "--analyze-rules"):
+                result = subprocess.run([sys.executable, "-m", "canto_subtitle_cleaner", mode, "--corpus", "missing"],
+                                        cwd=directory, env=environment, capture_output=True, text=True, timeout=60)
+
+                self.assertEqual(result.returncode, 1, mode)
+                self.assertTrue(result.stdout.startswith("Error: The corpus directory"), mode)
+                self.assertEqual(result.stderr, "", mode)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file